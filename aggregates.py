@@ -0,0 +1,204 @@
+from sqlalchemy import delete, func, insert, literal, select
+from extensions import db
+from models import Review, Rating, BainRating, Restaurant, RestaurantSummary
+
+BAIN_PROVIDER = 'Bain'
+SUMMARY_BATCH_SIZE = 500  # places per DELETE/INSERT of refresh_restaurant_summary
+
+
+def _dialect_name():
+    return db.session.get_bind().dialect.name
+
+
+def _upsert_statement(table):
+    """INSERT that adds the new count/sum onto an existing row for the same google_maps_id"""
+    dialect = _dialect_name()
+    if dialect == 'mysql':
+        from sqlalchemy.dialects.mysql import insert as dialect_insert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    stmt = dialect_insert(table)
+    new = stmt.inserted if dialect == 'mysql' else stmt.excluded
+
+    count = table.c.ratings_count + new.ratings_count
+    total = table.c.ratings_sum + new.ratings_sum
+    # ratings_avg goes first: MySQL applies ON DUPLICATE KEY assignments in order,
+    # so it must be computed before ratings_count/ratings_sum are overwritten
+    assignments = [
+        ('ratings_avg', total * 1.0 / count),
+        ('ratings_count', count),
+        ('ratings_sum', total),
+    ]
+    if dialect == 'mysql':
+        return stmt.on_duplicate_key_update(assignments)
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c.google_maps_id],
+        set_=dict(assignments)
+    )
+
+
+class RatingDeltas:
+    """Per-place rating count/sum changes collected while reviews are written.
+
+    Feed it review rows (dicts with google_maps_id, place_name, provider and
+    review_rating), then call apply() in the same transaction as the review
+    inserts. ratings and bain_ratings are updated with one upsert each, so the
+    cost is proportional to the places touched, not the size of reviews.
+    """
+
+    def __init__(self):
+        self.all = {}
+        self.bain = {}
+
+    def add(self, google_maps_id, place_name, review_rating, provider):
+        if google_maps_id is None or review_rating is None:
+            return
+        buckets = (self.all, self.bain) if provider == BAIN_PROVIDER else (self.all,)
+        for bucket in buckets:
+            entry = bucket.setdefault(google_maps_id, [place_name, 0, 0])
+            entry[1] += 1
+            entry[2] += int(review_rating)
+
+    def add_row(self, row):
+        self.add(row.get('google_maps_id'), row.get('place_name'), row.get('review_rating'), row.get('provider'))
+
+    __call__ = add_row
+
+    @property
+    def google_maps_ids(self):
+        return set(self.all)
+
+    @staticmethod
+    def _rows(bucket):
+        return [
+            {
+                'google_maps_id': google_maps_id,
+                'place_name': place_name,
+                'ratings_count': count,
+                'ratings_sum': total,
+                'ratings_avg': round(total / count, 4)
+            }
+            for google_maps_id, (place_name, count, total) in bucket.items()
+        ]
+
+    def apply(self, ratings=None, bain_ratings=None):
+        """Upsert the collected deltas into ratings and bain_ratings, returning the changed place ids.
+
+        The tables default to the live ones; a reseed passes its shadow copies.
+        """
+        ratings = Rating.__table__ if ratings is None else ratings
+        bain_ratings = BainRating.__table__ if bain_ratings is None else bain_ratings
+        for table, bucket in ((ratings, self.all), (bain_ratings, self.bain)):
+            if bucket:
+                db.session.execute(_upsert_statement(table), self._rows(bucket))
+        return self.google_maps_ids
+
+    def clear(self):
+        """Forget applied deltas, for writers that apply once per commit"""
+        self.all = {}
+        self.bain = {}
+
+
+def rebuild_ratings(reviews=None, ratings=None, bain_ratings=None):
+    """Recompute ratings and bain_ratings from reviews inside the current transaction.
+
+    Used after a reseed, where every place changes anyway. Rows are replaced
+    with DELETE and INSERT ... SELECT instead of DROP/CREATE, so the tables
+    never disappear and readers keep the old rows until the commit. The
+    tables default to the live ones; a reseed passes its shadow copies.
+    """
+    reviews = Review.__table__ if reviews is None else reviews
+    columns = ['google_maps_id', 'place_name', 'ratings_count', 'ratings_sum', 'ratings_avg']
+    targets = ((Rating.__table__ if ratings is None else ratings, None),
+               (BainRating.__table__ if bain_ratings is None else bain_ratings, BAIN_PROVIDER))
+    for table, provider in targets:
+        query = select(
+            reviews.c.google_maps_id,
+            func.max(reviews.c.place_name),
+            func.count(reviews.c.review_rating),
+            func.sum(reviews.c.review_rating),
+            func.avg(reviews.c.review_rating)
+        ).where(
+            reviews.c.review_rating.isnot(None),
+            reviews.c.google_maps_id.isnot(None)
+        ).group_by(reviews.c.google_maps_id)
+        if provider:
+            query = query.where(reviews.c.provider == provider)
+
+        db.session.execute(delete(table))
+        db.session.execute(insert(table).from_select(columns, query))
+
+
+def rebuild_all_restaurants(reviews=None, restaurants=None):
+    """The makerestaurants procedure: one restaurant_type 'all' row per reviewed place"""
+    reviews = Review.__table__ if reviews is None else reviews
+    restaurants = Restaurant.__table__ if restaurants is None else restaurants
+    query = select(
+        reviews.c.google_maps_id,
+        func.max(reviews.c.place_name),
+        func.max(reviews.c.place_address),
+        literal('all')
+    ).where(reviews.c.google_maps_id.isnot(None)).group_by(reviews.c.google_maps_id)
+
+    db.session.execute(delete(restaurants).where(restaurants.c.restaurant_type == 'all'))
+    db.session.execute(insert(restaurants).from_select(
+        ['google_maps_id', 'place_name', 'place_address', 'restaurant_type'], query))
+
+
+def _summary_selects(restaurants, ratings, bain_ratings):
+    """(typed rows, 'all' rows) of restaurant_summary as SELECTs over restaurants and both ratings tables"""
+    joined = restaurants.outerjoin(ratings, ratings.c.google_maps_id == restaurants.c.google_maps_id).outerjoin(
+        bain_ratings, bain_ratings.c.google_maps_id == restaurants.c.google_maps_id)
+    typed = select(
+        restaurants.c.google_maps_id,
+        restaurants.c.restaurant_type,
+        restaurants.c.place_name,
+        restaurants.c.place_address,
+        func.coalesce(ratings.c.ratings_count, 0),
+        ratings.c.ratings_avg,
+        func.coalesce(bain_ratings.c.ratings_count, 0),
+        bain_ratings.c.ratings_avg
+    ).select_from(joined).where(restaurants.c.restaurant_type != 'all')
+    # ratings are per place, so MAX only picks the one value out of the group
+    every = select(
+        restaurants.c.google_maps_id,
+        literal('all'),
+        func.max(restaurants.c.place_name),
+        func.max(restaurants.c.place_address),
+        func.coalesce(func.max(ratings.c.ratings_count), 0),
+        func.max(ratings.c.ratings_avg),
+        func.coalesce(func.max(bain_ratings.c.ratings_count), 0),
+        func.max(bain_ratings.c.ratings_avg)
+    ).select_from(joined).group_by(restaurants.c.google_maps_id)
+    return typed, every
+
+
+def refresh_restaurant_summary(google_maps_ids=None, restaurants=None, ratings=None, bain_ratings=None, summary=None):
+    """Rewrite the restaurant_summary rows of the given places, or of every place, inside the current transaction.
+
+    Call it after restaurants/ratings changed, with the places that changed
+    (RatingDeltas.apply() returns them). The tables default to the live ones;
+    a reseed passes its shadow copies.
+    """
+    restaurants = Restaurant.__table__ if restaurants is None else restaurants
+    ratings = Rating.__table__ if ratings is None else ratings
+    bain_ratings = BainRating.__table__ if bain_ratings is None else bain_ratings
+    summary = RestaurantSummary.__table__ if summary is None else summary
+    columns = ['google_maps_id', 'restaurant_type', 'place_name', 'place_address',
+               'ratings_count', 'ratings_avg', 'bain_ratings_count', 'bain_ratings_avg']
+
+    if google_maps_ids is None:
+        db.session.execute(delete(summary))
+        for query in _summary_selects(restaurants, ratings, bain_ratings):
+            db.session.execute(insert(summary).from_select(columns, query))
+        return
+
+    google_maps_ids = sorted(google_maps_id for google_maps_id in google_maps_ids if google_maps_id is not None)
+    for start in range(0, len(google_maps_ids), SUMMARY_BATCH_SIZE):
+        chunk = google_maps_ids[start:start + SUMMARY_BATCH_SIZE]
+        db.session.execute(delete(summary).where(summary.c.google_maps_id.in_(chunk)))
+        for query in _summary_selects(restaurants, ratings, bain_ratings):
+            db.session.execute(insert(summary).from_select(
+                columns, query.where(restaurants.c.google_maps_id.in_(chunk))))
@@ -1,11 +1,23 @@
-from apify_client import ApifyClient
 from flask import Blueprint, jsonify, json, request, current_app
 from functools import wraps
-from datetime import datetime
+from datetime import datetime, timezone
+import os
 from extensions import db
 import json
-from models import Review, Restaurant
+from models import IngestCheckpoint
 from apify_client.errors import ApifyApiError
+from apify_api.bulk_ingest import bulk_insert_reviews, RestaurantTypeCollector
+from apify_api.jobs import submit_job, job_status
+from apify_api.dataset_files import iter_dataset_file
+from apify_api.dataset_reader import iter_dataset_items
+from apify_api.orchestration import orchestrate_restaurant_type_runs
+from apify_api.runs import get_apify_client, restaurant_type_run_input, start_actor_run
+from aggregates import RatingDeltas, rebuild_ratings, refresh_restaurant_summary
+from rankings import refresh_restaurant_scores
+from pa_api.response_cache import invalidate_response_cache
+from data_version import bump_data_version
+from pa_api.search_index import index_new_reviews, rebuild_search_index
+from shadow_tables import ShadowReseed
 
 apify_endpoints = Blueprint('apify_endpoints', __name__)
 
@@ -25,7 +37,14 @@ def clean_database():
     """Helper function to clean the database"""
     try:
         db.session.execute(db.text(current_app.config['DB_PROCEDURE_CLEAR_DB']))
+        db.session.query(IngestCheckpoint).delete()  # the reviews they point past are gone
+        rebuild_ratings()  # only the kept Bain reviews remain
+        refresh_restaurant_summary()
+        refresh_restaurant_scores()
+        rebuild_search_index()
+        bump_data_version()
         db.session.commit()
+        invalidate_response_cache()
         return True, "Successfully cleaned the database"
     except Exception as e:
         db.session.rollback()
@@ -33,7 +52,7 @@ def clean_database():
 
 def get_run_status(run_id):
     """Helper function to get Apify run status"""
-    client = ApifyClient(current_app.config['APIFY_API_KEY'])
+    client = get_apify_client()
     try:
         run_client = client.run(run_id)
         run_info = run_client.get()
@@ -53,15 +72,14 @@ def get_run_status(run_id):
 @apify_endpoints.route('/start-run')
 @require_apify_api_key
 def start_run():
-    client = ApifyClient(current_app.config['APIFY_API_KEY'])
+    client = get_apify_client()
     file_path = current_app.config['FILE_BASE'] + 'json/apify_run_inputs.json'
     with open(file_path, 'r') as f:
         run_input = json.load(f)
     run_input['maxCrawledPlaces'] = 200 # we want more places for the 'All restaurants' run
 
-    actor_run = client.actor(current_app.config['APIFY_RESTAURANT_REVIEW_URI']).start(run_input=run_input)
-    run_id = actor_run["id"]
-    return f"""<div>Reviews scraping run started with ID: {run_id} at {datetime.now().strftime("%H:%M:%S")}</div>
+    run_id = start_actor_run(client, run_input)
+    return f"""<div>Reviews scraping run started with ID: {run_id} at {datetime.now().strftime('%H:%M:%S')}</div>
         <div>visit <a target='_blank' href='{request.host_url}apify/wait-run?run={run_id}'>
         {request.host_url}apify/wait-run?run={run_id}</a> for status update</div>""", 200
 
@@ -76,13 +94,77 @@ def wait_run():
     if error:
         return error
 
-    return f"Run status: {status} for run: {run_id} at {datetime.now().strftime("%H:%M:%S")}<div><a href='.'>refresh</a> this page for status updates</div>"
+    return f"Run status: {status} for run: {run_id} at {datetime.now().strftime('%H:%M:%S')}<div><a href='.'>refresh</a> this page for status updates</div>"
+
+def job_queued_response(job_id, description):
+    """Plain HTML pointer to the status page of a queued ingestion job"""
+    return f"""<div>{description} queued as job {job_id} at {datetime.now().strftime('%H:%M:%S')}</div>
+        <div>visit <a target='_blank' href='{request.host_url}apify/jobs/{job_id}'>
+        {request.host_url}apify/jobs/{job_id}</a> for progress</div>""", 202
+
+def get_dataset_id(client, run_id):
+    run_info = client.run(run_id).get()
+    if not run_info or not run_info.get('defaultDatasetId'):  # this is all apify protocol
+        raise ValueError(f"Error retrieving run with ID '{run_id}'.")
+    return run_info['defaultDatasetId']
+
+def ingest_seed_run(progress, run_id):
+    """Job body for pop-db: load a seed run into shadow tables, then swap them in for the live ones.
+
+    Readers keep the previous dataset until the swap. Bain reviews and the
+    restaurant_type tags are kept, and so is every review written during the
+    reseed; every other review, the ratings and the 'all' restaurants are
+    replaced.
+    """
+    client = get_apify_client()
+    dataset_id = get_dataset_id(client, run_id)
+
+    progress.phase('preparing shadow tables')
+    reseed = ShadowReseed()
+    try:
+        reseed.create()
+        db.session.commit()
+
+        progress.phase('inserting')
+        stats = bulk_insert_reviews(iter_dataset_items(client, dataset_id), table=reseed.reviews,
+                                    on_batch=progress.ingest_batch,
+                                    commit_every=current_app.config.get('INGEST_CHECKPOINT_BATCHES'))
+        progress.update(force=True, items_fetched=stats.items, rows_written=stats.rows)
+        current_app.logger.info("pop-db ingest stats: %s", stats.to_dict())
+
+        progress.phase('aggregating')
+        reseed.build_derived()
+        db.session.commit()
+
+        progress.phase('catching up')
+        reseed.catch_up()  # reviews and type tags written while the shadows were loading
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        reseed.drop()
+        db.session.commit()
+        raise
+
+    # On MySQL the RENAME commits on its own: the new tables are live from here
+    # and a failure below leaves them in place, so the data version is bumped
+    # right after it. Elsewhere the swap commits together with the bump.
+    progress.phase('swapping')
+    reseed.swap()
+    rebuild_search_index()
+    db.session.query(IngestCheckpoint).delete()
+    bump_data_version()
+    db.session.commit()
+
+    if reseed.catch_up(swapped=True):  # MySQL: writes committed between the catch-up and the RENAME
+        index_new_reviews()
+        bump_data_version()
+        db.session.commit()
+    invalidate_response_cache()
+    return f"Successfully added {stats.rows} reviews to database ({stats.rows_per_sec:.0f} rows/sec)"
 
 @apify_endpoints.route('/pop-db', methods=['GET', 'POST'])
 @require_apify_api_key
 def pop_db():
-
-    review_count = 0
     if request.method == 'POST':
         run_id = request.json.get('runId') if request.is_json else None
     else:
@@ -90,35 +172,15 @@ def pop_db():
 
     if run_id is None:
         return "Bad Request: runId parameter required"
-    client = ApifyClient(current_app.config['APIFY_API_KEY'])
-    run_client = client.run(run_id)
-    run_info = run_client.get()
-    if run_info['status'] != "SUCCEEDED":
-        return f"Data is not ready for run with ID {run_id}, run status is '{run_info['status']}'"
-
-    # Clean out database first
-    success, clean_msg = clean_database()
-    if not success:
-        return clean_msg
-
-    if run_info and 'defaultDatasetId' in run_info and run_info['defaultDatasetId']:  # this is all apify protocol
-        for review in client.dataset(run_info["defaultDatasetId"]).iterate_items():
-            new_review = Review.from_apify_data(review)
-            db.session.add(new_review)
-            review_count += 1
-        try:
-            db.session.commit()
-            db.session.expire_all()
-            db.session.execute(db.text(current_app.config['DB_PROCEDURE_MAKE_RATINGS']))
-            db.session.execute(db.text(current_app.config['DB_PROCEDURE_MAKE_RESTAURANTS']))
-            db.session.commit()
-            msg=f"Successfully added {review_count} reviews to database"
-        except Exception as e:
-            db.session.rollback()
-            msg=f"Error adding reviews: {e}"
-    else:
-        msg= f"Error retrieving run with ID '{run_id}'."
-    return msg
+
+    status, error = get_run_status(run_id)
+    if error:
+        return error
+    if status != "SUCCEEDED":
+        return f"Data is not ready for run with ID {run_id}, run status is '{status}'"
+
+    job_id = submit_job('pop-db', ingest_seed_run, run_id=run_id)
+    return job_queued_response(job_id, f"Database reseed from run {run_id}")
 
 @apify_endpoints.route('/start-restaurant-type-run')
 @require_apify_api_key
@@ -127,18 +189,8 @@ def start_restaurant_type_run ():
     if not restaurant_type:
         return "Error: 'restaurant_type' query parameter is required", 400
 
-    client = ApifyClient(current_app.config['APIFY_API_KEY'])
-    file_path = current_app.config['FILE_BASE'] + 'json/apify_run_inputs.json'
-    with open(file_path, 'r') as f:
-        run_input = json.load(f)
-
-    # Override with the type from query string
-    run_input['restaurant_type'] = restaurant_type
-    run_input['keywords'] = [restaurant_type]
-
-    actor_run = client.actor(current_app.config['APIFY_RESTAURANT_REVIEW_URI']).start(run_input=run_input)
-    run_id = actor_run["id"]
-    return f"""<div>Reviews scraping run started for {restaurant_type} restaurants with ID: {run_id} at {datetime.now().strftime("%H:%M:%S")}</div>
+    run_id = start_actor_run(get_apify_client(), restaurant_type_run_input(restaurant_type))
+    return f"""<div>Reviews scraping run started for {restaurant_type} restaurants with ID: {run_id} at {datetime.now().strftime('%H:%M:%S')}</div>
         <div>visit <a target='_blank' href='{request.host_url}apify/wait-reviews?run={run_id}&restaurant_type={restaurant_type}'>
         {request.host_url}apify/wait-restaurant-type-run?run={run_id}&restaurant_type={restaurant_type}</a> for status update</div>""", 200
 
@@ -157,7 +209,7 @@ def wait_restaurant_type_run():
     if error:
         return error
 
-    status_html = f"""<div>Run status: {status} for {restaurant_type} restaurants (run: {run_id}) at {datetime.now().strftime("%H:%M:%S")}</div>"""
+    status_html = f"""<div>Run status: {status} for {restaurant_type} restaurants (run: {run_id}) at {datetime.now().strftime('%H:%M:%S')}</div>"""
 
     if status == "SUCCEEDED":
         status_html += f"""<div style='margin-top: 10px; padding: 10px; background-color: #d4edda; border: 1px solid #c3e6cb; border-radius: 4px;'>
@@ -170,13 +222,64 @@ def wait_restaurant_type_run():
 
     return status_html
 
+def ingest_restaurant_type_run(progress, run_id, restaurant_type):
+    """Job body for pop-restaurant-type: add a cuisine run's reviews and tag its places"""
+    client = get_apify_client()
+    return ingest_restaurant_type_dataset(progress, client, get_dataset_id(client, run_id), restaurant_type)
+
+def get_checkpoint(dataset_id, restaurant_type):
+    checkpoint = db.session.get(IngestCheckpoint, (dataset_id, restaurant_type))
+    if checkpoint is None:
+        checkpoint = IngestCheckpoint(dataset_id=dataset_id, restaurant_type=restaurant_type, items_committed=0,
+                                      rows_written=0)
+        db.session.add(checkpoint)
+    return checkpoint
+
+def ingest_restaurant_type_dataset(progress, client, dataset_id, restaurant_type):
+    """Insert one cuisine dataset, tag its places and update the aggregates.
+
+    Every INGEST_CHECKPOINT_BATCHES batches the work so far is committed with
+    the dataset offset reached, so running the same dataset again resumes
+    there instead of starting over; reviews already stored are skipped anyway.
+    """
+    checkpoint = get_checkpoint(dataset_id, restaurant_type)
+    start = checkpoint.items_committed
+    rows_before = checkpoint.rows_written
+    progress.phase(f'resuming at item {start}' if start else 'inserting')
+    restaurants = RestaurantTypeCollector(restaurant_type)
+    rating_deltas = RatingDeltas()
+
+    def commit_progress(stats):
+        # Add restaurant type entries, one lookup and one insert per commit
+        tagged = set(restaurants.places)
+        restaurants.upsert()
+        changed = tagged | rating_deltas.apply()
+        refresh_restaurant_summary(changed)
+        refresh_restaurant_scores(changed)
+        rating_deltas.clear()
+        index_new_reviews()
+        bump_data_version()
+        checkpoint.items_committed = start + stats.items
+        checkpoint.rows_written = rows_before + stats.rows
+
+    stats = bulk_insert_reviews(iter_dataset_items(client, dataset_id, offset=start), on_item=restaurants,
+                                on_row=rating_deltas, on_batch=progress.ingest_batch,
+                                commit_every=current_app.config.get('INGEST_CHECKPOINT_BATCHES'),
+                                before_commit=commit_progress)
+    progress.update(force=True, items_fetched=stats.items, rows_written=stats.rows)
+
+    progress.phase('aggregating')
+    commit_progress(stats)
+    restaurant_added_count, restaurant_skipped_count = restaurants.upsert()
+    checkpoint.completed_at = datetime.now(timezone.utc)
+    current_app.logger.info("pop-restaurant-type ingest stats: %s", stats.to_dict())
+    db.session.commit()
+    invalidate_response_cache()
+    return f"Successfully added {stats.rows} reviews ({stats.duplicates} already stored) and {restaurant_added_count} {restaurant_type} restaurants (skipped {restaurant_skipped_count} duplicates)"
+
 @apify_endpoints.route('/pop-restaurant-type', methods=['GET', 'POST'])
 @require_apify_api_key
 def pop_restaurant_type():
-    review_count = 0
-    restaurant_added_count = 0
-    restaurant_skipped_count = 0
-
     if request.method == 'POST':
         run_id = request.json.get('runId') if request.is_json else None
         restaurant_type = request.json.get('restaurant_type') if request.is_json else None
@@ -189,54 +292,57 @@ def pop_restaurant_type():
     if restaurant_type is None:
         return "Bad Request: restaurant_type parameter required"
 
-    client = ApifyClient(current_app.config['APIFY_API_KEY'])
-    run_client = client.run(run_id)
-    run_info = run_client.get()
-    if run_info['status'] != "SUCCEEDED":
-        return f"Data is not ready for run with ID {run_id}, run status is '{run_info['status']}'"
-
-    if run_info and 'defaultDatasetId' in run_info and run_info['defaultDatasetId']:
-        for review in client.dataset(run_info["defaultDatasetId"]).iterate_items():
-            new_review=Review.from_apify_data(review)
-            db.session.add(new_review)
-            review_count += 1
-
-            # Add restaurant type entry
-            google_maps_id = review.get("googleMapsPlaceId")
-            place_name = review.get("placeName", "")
-            place_address = review.get("placeAddress", "")
-
-            existing = Restaurant.query.filter_by(
-                google_maps_id=google_maps_id,
-                restaurant_type=restaurant_type
-            ).first()
-
-            if not existing:
-                new_restaurant_with_type = Restaurant(
-                    google_maps_id=google_maps_id,
-                    place_name=place_name,
-                    place_address=place_address,
-                    restaurant_type=restaurant_type,
-                )
-                db.session.add(new_restaurant_with_type)
-                restaurant_added_count += 1
-            else:
-                restaurant_skipped_count += 1
-
-        try:
-            db.session.commit()
-            db.session.expire_all()
-            db.session.execute(db.text(current_app.config['DB_PROCEDURE_MAKE_RATINGS']))
-            db.session.commit()
-
-            msg = f"Successfully added {review_count} reviews and {restaurant_added_count} {restaurant_type} restaurants (skipped {restaurant_skipped_count} duplicates)"
-        except Exception as e:
-            db.session.rollback()
-            msg = f"Error adding data: {e}"
+    status, error = get_run_status(run_id)
+    if error:
+        return error
+    if status != "SUCCEEDED":
+        return f"Data is not ready for run with ID {run_id}, run status is '{status}'"
+
+    job_id = submit_job('pop-restaurant-type', ingest_restaurant_type_run, run_id=run_id,
+                        restaurant_type=restaurant_type)
+    return job_queued_response(job_id, f"{restaurant_type} restaurants from run {run_id}")
+
+def ingest_restaurant_types(progress, restaurant_types):
+    """Job body for pop-restaurant-types: run, wait for and ingest several cuisines concurrently"""
+    states = orchestrate_restaurant_type_runs(progress, restaurant_types, ingest=ingest_restaurant_type_dataset)
+    summary = "; ".join(f"{s.restaurant_type}: {s.message or s.error}" for s in states)
+    failed = [s.restaurant_type for s in states if s.error]
+    current_app.logger.info("pop-restaurant-types runs: %s", [s.to_dict() for s in states])
+    if failed:
+        raise RuntimeError(f"{len(failed)} of {len(states)} restaurant types failed ({', '.join(failed)}). {summary}")
+    return summary
+
+# start-restaurant-type-run, wait-restaurant-type-run and pop-restaurant-type in one job, for many types at once
+@apify_endpoints.route('/pop-restaurant-types', methods=['GET', 'POST'])
+@require_apify_api_key
+def pop_restaurant_types():
+    if request.method == 'POST':
+        restaurant_types = request.json.get('restaurant_types') if request.is_json else None
     else:
-        msg = f"Error retrieving run with ID '{run_id}'."
-
-    return msg
+        restaurant_types = request.args.get('restaurant_types')
+        restaurant_types = restaurant_types.split(',') if restaurant_types else None
+
+    if not isinstance(restaurant_types, list) or not all(isinstance(t, str) for t in restaurant_types):
+        return "Bad Request: restaurant_types parameter required (a list, or comma separated)", 400
+    restaurant_types = list(dict.fromkeys(t.strip() for t in restaurant_types if t.strip()))
+    if not restaurant_types:
+        return "Bad Request: restaurant_types parameter required (a list, or comma separated)", 400
+
+    job_id = submit_job('pop-restaurant-types', ingest_restaurant_types, restaurant_types=restaurant_types)
+    return job_queued_response(job_id, f"Runs for {', '.join(restaurant_types)} restaurants")
+
+@apify_endpoints.route('/jobs/<job_id>')
+def get_job(job_id):
+    status = job_status(job_id)
+    if status is None:
+        return jsonify({
+            'success': False,
+            'error': 'Job not found'
+        }), 404
+    return jsonify({
+        'success': True,
+        'data': status
+    }), 200
 
 @apify_endpoints.route('/clean-db', methods=['POST'])
 @require_apify_api_key
@@ -246,7 +352,6 @@ def clean_db():
 
 @apify_endpoints.route('/test-pop')
 def test_pop():
-    review_count=0
     reviews = [
   {
     "placeName": "Maison Selby",
@@ -303,45 +408,71 @@ def test_pop():
     "authorName": "Arthur Z"
   }
 ]
-    for review in reviews:
-        new_review = Review.from_apify_data(review)
-        db.session.add(new_review)
-        review_count += 1
     try:
-        db.session.commit()
-        msg=f"Successfully added {review_count} reviews to database"
+        stats = ingest_reviews(reviews)
+        msg=f"Successfully added {stats.rows} reviews to database"
     except Exception as e:
-        db.session.rollback()
         msg=f"Error adding reviews: {e}"
 
     return msg
 
+def resolve_dataset_file(name):
+    """Path of a dataset export under FILE_BASE/json/, or None if name points outside it"""
+    json_dir = os.path.realpath(os.path.join(current_app.config['FILE_BASE'] or '.', 'json'))
+    path = os.path.realpath(os.path.join(json_dir, name))
+    return path if os.path.commonpath([json_dir, path]) == json_dir else None
+
+def ingest_reviews(items, commit_every=None):
+    """Write Apify review items to reviews, committing every commit_every batches and at the end.
+
+    Ratings, summary, scores, the search index and the data version are
+    brought up to date before each commit, so readers never see reviews
+    without their aggregates; the response cache is invalidated afterwards.
+    """
+    rating_deltas = RatingDeltas()
+
+    def sync_derived_data(stats=None):
+        changed = rating_deltas.apply()
+        refresh_restaurant_summary(changed)
+        refresh_restaurant_scores(changed)
+        rating_deltas.clear()
+        index_new_reviews()
+        bump_data_version()
+
+    try:
+        stats = bulk_insert_reviews(items, on_row=rating_deltas, commit_every=commit_every,
+                                    before_commit=sync_derived_data)
+        sync_derived_data()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    finally:
+        # earlier intervals may already be committed
+        invalidate_response_cache()
+    return stats
+
+def load_dataset_file(path):
+    """Stream a dataset export into reviews, committing every FILE_LOAD_COMMIT_BATCHES batches"""
+    return ingest_reviews(iter_dataset_file(path), current_app.config.get('FILE_LOAD_COMMIT_BATCHES'))
+
 @apify_endpoints.route('/pop-file')
 def pop_file():
-    file_path = current_app.config['FILE_BASE'] + 'json/search.json'
-    review_count=0
+    file_name = request.args.get('file', 'search.json')
+    file_path = resolve_dataset_file(file_name)
+    if file_path is None:
+        return f"Error: '{file_name}' is outside the json directory." #}, 400
     try:
-        with open(file_path, 'r') as search_resuls_file:
-            reviews = json.load(search_resuls_file)
+        stats = load_dataset_file(file_path)
     except FileNotFoundError:
-        return "Error: The file 'search.json' was not found." #}, 404
-    except json.JSONDecodeError:
-        return "Error: Could not decode JSON from the file." #}, 500
-    except Exception as e:
-        return f"An unexpected error occurred: {e}" #}, 500
-
-    for review in reviews:
-        new_review = Review.from_apify_data(review)
-        db.session.add(new_review)
-        review_count += 1
-    try:
-        db.session.commit()
-        msg=f"Successfully added {review_count} reviews to database"
+        return f"Error: The file '{file_name}' was not found." #}, 404
+    except (ValueError, OSError, EOFError) as e:
+        return f"Error: Could not decode JSON from the file: {e}" #}, 500
     except Exception as e:
-        db.session.rollback()
-        msg=f"Error adding reviews: {e}"
+        return f"Error adding reviews: {e}" #}, 500
 
-    return msg
+    current_app.logger.info("pop-file ingest stats: %s", stats.to_dict())
+    return f"Successfully added {stats.rows} reviews to database ({stats.rows_per_sec:.0f} rows/sec)"
 
 @apify_endpoints.route('/health')
 def health():
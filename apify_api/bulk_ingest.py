@@ -0,0 +1,214 @@
+import time
+from itertools import islice
+from flask import current_app
+from sqlalchemy import insert, select
+from extensions import db
+from models import Review, Restaurant
+
+DEFAULT_BATCH_SIZE = 500
+
+
+def batched(items, batch_size):
+    """Yield lists of up to batch_size items without materialising the whole iterable"""
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+class IngestStats:
+    """Row counts and timings collected while a dataset is being written"""
+
+    def __init__(self):
+        self.items = 0  # dataset items read, including duplicates
+        self.rows = 0  # reviews inserted
+        self.duplicates = 0
+        self.batches = []
+        self.started = time.perf_counter()
+        self.finished = None
+
+    def record_batch(self, rows, seconds, items=None):
+        items = rows if items is None else items
+        self.items += items
+        self.rows += rows
+        self.duplicates += items - rows
+        self.batches.append({'batch': len(self.batches) + 1, 'rows': rows, 'seconds': round(seconds, 4)})
+
+    def finish(self):
+        self.finished = time.perf_counter()
+        return self
+
+    @property
+    def elapsed(self):
+        return (self.finished or time.perf_counter()) - self.started
+
+    @property
+    def rows_per_sec(self):
+        return self.rows / self.elapsed if self.elapsed > 0 else 0.0
+
+    def to_dict(self):
+        return {
+            'items': self.items,
+            'rows': self.rows,
+            'duplicates': self.duplicates,
+            'elapsed_seconds': round(self.elapsed, 4),
+            'rows_per_sec': round(self.rows_per_sec, 1),
+            'batches': self.batches
+        }
+
+
+def _insert_new_reviews_statement(table):
+    """INSERT that skips rows whose review_key is already stored"""
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'mysql':
+        from sqlalchemy.dialects.mysql import insert as dialect_insert
+        stmt = dialect_insert(table)
+        return stmt.on_duplicate_key_update(review_key=stmt.inserted.review_key)  # no-op update
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    return dialect_insert(table).on_conflict_do_nothing()
+
+
+def new_review_rows(rows, table=None):
+    """rows without the ones whose review_key repeats earlier in the batch or is already stored"""
+    table = Review.__table__ if table is None else table
+    unique = {}
+    unkeyed = []
+    for row in rows:
+        key = row.get('review_key')
+        if key is None:
+            unkeyed.append(row)
+        else:
+            unique.setdefault(key, row)
+    if unique:
+        existing = set(db.session.execute(
+            select(table.c.review_key).where(table.c.review_key.in_(list(unique)))).scalars())
+        for key in existing:
+            del unique[key]
+    # a concurrent writer committing one of these keys before our INSERT is
+    # still skipped by the INSERT, but would have been passed to on_row
+    return unkeyed + list(unique.values())
+
+
+class BulkReviewWriter:
+    """Streams Apify dataset items into the reviews table in executemany batches.
+
+    Items are converted to plain column dicts with Review.apify_row, so no ORM
+    objects are built. Each batch is a single INSERT executed with a parameter
+    list. Reviews already stored (same review_key) are dropped with one lookup
+    per batch, and the INSERT itself skips conflicts, so re-running a dataset
+    adds nothing; on_row only sees the rows actually inserted.
+
+    By default nothing is committed here and the caller owns the transaction;
+    with commit_every the writer commits after every that many batches,
+    calling before_commit(stats) first so derived data and checkpoints can be
+    brought up to date in the same transaction. The final partial interval is
+    left to the caller. table defaults to reviews; a reseed writes into its
+    shadow copy instead.
+    """
+
+    def __init__(self, batch_size=None, on_item=None, on_row=None, on_batch=None, commit_every=None,
+                 before_commit=None, table=None):
+        self.table = Review.__table__ if table is None else table
+        self.batch_size = batch_size or current_app.config.get('INGEST_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+        self.on_item = on_item
+        self.on_row = on_row
+        self.on_batch = on_batch
+        self.commit_every = commit_every
+        self.before_commit = before_commit
+        self.commits = 0
+        self.stats = IngestStats()
+
+    def rows(self, items):
+        for item in items:
+            if self.on_item:
+                self.on_item(item)
+            yield Review.apify_row(item)
+
+    def write_batch(self, rows):
+        started = time.perf_counter()
+        items = len(rows)
+        rows = new_review_rows(rows, self.table)
+        if rows:
+            db.session.execute(_insert_new_reviews_statement(self.table), rows)
+        if self.on_row:
+            for row in rows:
+                self.on_row(row)
+        self.stats.record_batch(len(rows), time.perf_counter() - started, items)
+        if self.on_batch:
+            self.on_batch(self.stats)
+        if self.commit_every and len(self.stats.batches) % self.commit_every == 0:
+            if self.before_commit:
+                self.before_commit(self.stats)
+            db.session.commit()
+            self.commits += 1
+
+    def write(self, items):
+        for rows in batched(self.rows(items), self.batch_size):
+            self.write_batch(rows)
+        return self.stats.finish()
+
+
+def bulk_insert_reviews(items, batch_size=None, on_item=None, on_row=None, on_batch=None, commit_every=None,
+                        before_commit=None, table=None):
+    """Insert an iterable of Apify review items in batches, returning IngestStats"""
+    return BulkReviewWriter(batch_size=batch_size, on_item=on_item, on_row=on_row, on_batch=on_batch,
+                            commit_every=commit_every, before_commit=before_commit, table=table).write(items)
+
+
+class RestaurantTypeCollector:
+    """Collects distinct places for one restaurant_type while reviews stream past.
+
+    Use an instance as the on_item hook of BulkReviewWriter, then call upsert()
+    once the reviews are written: existing (google_maps_id, restaurant_type)
+    keys are fetched in a single query and only the missing places are inserted
+    in one batch. Counts match the old per-review lookup, where every review of
+    an already-tagged place counted as skipped.
+    """
+
+    def __init__(self, restaurant_type):
+        self.restaurant_type = restaurant_type
+        self.places = {}
+        self.items_seen = 0
+        self.added = 0
+
+    def __call__(self, review):
+        self.items_seen += 1
+        google_maps_id = review.get("googleMapsPlaceId")
+        if google_maps_id not in self.places:
+            self.places[google_maps_id] = (review.get("placeName", ""), review.get("placeAddress", ""))
+
+    def existing_ids(self):
+        if not self.places:
+            return set()
+        query = select(Restaurant.google_maps_id).where(
+            Restaurant.restaurant_type == self.restaurant_type,
+            Restaurant.google_maps_id.in_(list(self.places))
+        )
+        return set(db.session.execute(query).scalars())
+
+    def upsert(self):
+        """Insert the missing restaurant-type rows, returning (added, skipped) so far.
+
+        May be called again after more items, e.g. at every periodic commit.
+        """
+        existing = self.existing_ids()
+        rows = [
+            {
+                'google_maps_id': google_maps_id,
+                'place_name': place_name,
+                'place_address': place_address,
+                'restaurant_type': self.restaurant_type
+            }
+            for google_maps_id, (place_name, place_address) in self.places.items()
+            if google_maps_id not in existing
+        ]
+        if rows:
+            db.session.execute(insert(Restaurant.__table__), rows)
+        self.added += len(rows)
+        self.places = {}
+        return self.added, self.items_seen - self.added
@@ -0,0 +1,113 @@
+import gzip
+import json
+
+GZIP_MAGIC = b'\x1f\x8b'
+DEFAULT_CHUNK_SIZE = 64 * 1024  # characters read per refill of the parse buffer
+WHITESPACE = ' \t\r\n'
+
+
+def _skip_whitespace(buffer, position):
+    while position < len(buffer) and buffer[position] in WHITESPACE:
+        position += 1
+    return position
+
+
+def iter_json_array(stream, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield the elements of a top-level JSON array from a text stream, one at a time.
+
+    The stream is read in chunks and each element is decoded with
+    JSONDecoder.raw_decode as soon as it is complete, so memory holds one
+    chunk plus the element being parsed rather than the whole document.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    eof = False
+
+    def refill():
+        # drop what has been consumed so the buffer never outgrows chunk + element
+        nonlocal buffer, position, eof
+        chunk = stream.read(chunk_size)
+        buffer = buffer[position:] + chunk
+        position = 0
+        eof = not chunk
+
+    def next_token():
+        nonlocal position
+        while True:
+            position = _skip_whitespace(buffer, position)
+            if position < len(buffer):
+                return buffer[position]
+            if eof:
+                raise ValueError("Unexpected end of JSON array")
+            refill()
+
+    if next_token() != '[':
+        raise ValueError("Expected a JSON array")
+    position += 1
+
+    if next_token() == ']':
+        return
+    while True:
+        next_token()  # raw_decode does not skip leading whitespace
+        while True:
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                refill()
+                continue
+            if end == len(buffer) and not eof:
+                refill()  # a number or literal may continue in the next chunk
+                continue
+            break
+        position = end
+        yield item
+
+        token = next_token()
+        position += 1
+        if token == ']':
+            return
+        if token != ',':
+            raise ValueError(f"Expected ',' or ']' in JSON array, found {token!r}")
+
+
+def iter_ndjson(stream):
+    """Yield one decoded value per non-blank line of a newline-delimited JSON stream"""
+    for line_number, line in enumerate(stream, 1):
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Invalid JSON on line {line_number}: {e}") from e
+
+
+def open_dataset_file(path):
+    """Text stream over a dataset export, decompressing it if it is gzipped"""
+    with open(path, 'rb') as f:
+        magic = f.read(2)
+    if magic == GZIP_MAGIC:
+        return gzip.open(path, 'rt', encoding='utf-8-sig')
+    return open(path, 'r', encoding='utf-8-sig')
+
+
+def iter_dataset_file(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield the items of an Apify dataset export in constant memory.
+
+    Accepts a JSON array (Apify's default download format) or NDJSON, either
+    of them optionally gzip-compressed. The format is detected from the
+    content, not the file name.
+    """
+    with open_dataset_file(path) as stream:
+        first = stream.read(1)
+        while first and first in WHITESPACE:
+            first = stream.read(1)
+        if not first:
+            return
+        stream.seek(0)
+        items = iter_json_array(stream, chunk_size) if first == '[' else iter_ndjson(stream)
+        for item in items:
+            if not isinstance(item, dict):
+                raise ValueError(f"Expected dataset items to be JSON objects, found {type(item).__name__}")
+            yield item
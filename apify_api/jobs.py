@@ -0,0 +1,141 @@
+import json
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from threading import Lock
+from flask import current_app
+from sqlalchemy import update
+from extensions import db
+from models import IngestJob
+from query_diagnostics import query_scope
+
+_executor = None
+_executor_lock = Lock()
+_live_progress = {}  # job id -> latest progress values of jobs running in this process
+
+
+def _get_executor(max_workers):
+    """Lazily create the process-wide pool, so each gunicorn worker builds its own after fork"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ingest-job')
+        return _executor
+
+
+def _utcnow():
+    return datetime.now(timezone.utc)
+
+
+class JobProgress:
+    """Handle given to a running job for reporting its phase and counters.
+
+    Progress is kept in a per-process registry and, on backends that allow a
+    second writer while the job's data transaction is open (MySQL), also
+    written to ingest_jobs on its own connection so other workers can see it.
+    Counter writes are throttled to INGEST_JOB_PROGRESS_SECONDS; phase changes
+    are always written. SQLite only gets the start and final job states.
+    """
+
+    def __init__(self, job_id, min_interval=1.0):
+        self.job_id = job_id
+        self.min_interval = min_interval
+        self.values = {}
+        self.persist_live = db.engine.dialect.name != 'sqlite'
+        self._last_write = 0.0
+
+    def write(self, **values):
+        with db.engine.begin() as conn:
+            conn.execute(update(IngestJob.__table__).where(IngestJob.__table__.c.id == self.job_id).values(**values))
+        self._last_write = time.monotonic()
+
+    def _publish(self, force):
+        _live_progress[self.job_id] = dict(self.values)
+        if self.persist_live and (force or time.monotonic() - self._last_write >= self.min_interval):
+            self.write(**self.values)
+
+    def phase(self, phase):
+        # pop-restaurant-types prefixes the restaurant type; never let a long one fail the job's progress write
+        self.values['phase'] = phase[:IngestJob.__table__.c.phase.type.length]
+        self._publish(force=True)
+
+    def update(self, force=False, **counters):
+        self.values.update(counters)
+        self._publish(force)
+
+    def ingest_batch(self, stats):
+        """on_batch hook for BulkReviewWriter"""
+        self.update(items_fetched=stats.items, rows_written=stats.rows)
+
+
+def _run_job(app, job_id, fn, params):
+    with app.app_context():
+        progress = JobProgress(job_id, app.config.get('INGEST_JOB_PROGRESS_SECONDS', 1.0))
+        progress.write(status='running', started_at=_utcnow())
+        try:
+            with query_scope(f"job {fn.__name__} {job_id}"):
+                message = fn(progress, **params)
+            counters = {k: v for k, v in progress.values.items() if k != 'phase'}
+            progress.write(status='succeeded', phase='done', message=message, finished_at=_utcnow(), **counters)
+        except Exception as e:
+            db.session.rollback()
+            app.logger.exception("Ingest job %s failed", job_id)
+            progress.write(status='failed', error=str(e), finished_at=_utcnow(), **progress.values)
+        finally:
+            _live_progress.pop(job_id, None)
+            db.session.remove()
+
+
+def submit_job(kind, fn, **params):
+    """Record a queued job and hand it to the ingest pool, returning the job id.
+
+    fn is called as fn(progress, **params) inside an app context and returns the
+    success message; any exception marks the job failed. With INGEST_JOB_WORKERS
+    set to 0 the job runs inline before this returns.
+    """
+    job = IngestJob(id=uuid.uuid4().hex, kind=kind, params=json.dumps(params), status='queued', phase='queued',
+                    items_fetched=0, rows_written=0)
+    db.session.add(job)
+    db.session.commit()
+
+    app = current_app._get_current_object()
+    workers = app.config.get('INGEST_JOB_WORKERS', 2)
+    if workers > 0:
+        _get_executor(workers).submit(_run_job, app, job.id, fn, params)
+    else:
+        _run_job(app, job.id, fn, params)
+    return job.id
+
+
+def job_status(job_id):
+    """Serializable view of a job row, or None if the id is unknown"""
+    job = db.session.get(IngestJob, job_id)
+    if job is None:
+        return None
+    db.session.refresh(job)
+    live = _live_progress.get(job_id, {}) if job.status == 'running' else {}
+
+    started = job.started_at
+    finished = job.finished_at
+    if started is not None:
+        end = finished or _utcnow().replace(tzinfo=None if started.tzinfo is None else timezone.utc)
+        elapsed = round((end - started).total_seconds(), 3)
+    else:
+        elapsed = None
+
+    return {
+        'job_id': job.id,
+        'kind': job.kind,
+        'params': json.loads(job.params) if job.params else {},
+        'status': job.status,
+        'phase': live.get('phase', job.phase),
+        'items_fetched': live.get('items_fetched', job.items_fetched or 0),
+        'rows_written': live.get('rows_written', job.rows_written or 0),
+        'elapsed_seconds': elapsed,
+        'message': job.message,
+        'error': job.error,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'started_at': started.isoformat() if started else None,
+        'finished_at': finished.isoformat() if finished else None
+    }
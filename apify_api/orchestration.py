@@ -0,0 +1,149 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from threading import Lock
+from flask import current_app
+from extensions import db
+from query_diagnostics import query_scope
+from apify_api.runs import get_apify_client, restaurant_type_run_input, start_actor_run, wait_for_run
+
+
+class RunState:
+    """Where one restaurant_type's actor run is in the start -> wait -> ingest pipeline"""
+
+    def __init__(self, restaurant_type):
+        self.restaurant_type = restaurant_type
+        self.run_id = None
+        self.status = 'starting'
+        self.message = None
+        self.error = None
+
+    def to_dict(self):
+        return {key: getattr(self, key) for key in ('restaurant_type', 'run_id', 'status', 'message', 'error')}
+
+
+class SharedProgress:
+    """Thread-safe view of one JobProgress for several concurrent run ingestions.
+
+    Each run reports through its own handle (same interface as JobProgress);
+    counters are summed across runs before they reach the job.
+    """
+
+    def __init__(self, progress):
+        self.progress = progress
+        self._lock = Lock()
+        self._counters = {}  # restaurant_type -> {items_fetched, rows_written}
+
+    def phase(self, phase):
+        with self._lock:
+            self.progress.phase(phase)
+
+    def update(self, restaurant_type, force=False, **counters):
+        with self._lock:
+            self._counters.setdefault(restaurant_type, {}).update(counters)
+            totals = {}
+            for values in self._counters.values():
+                for key, value in values.items():
+                    totals[key] = totals.get(key, 0) + value
+            self.progress.update(force=force, **totals)
+
+    def for_run(self, restaurant_type):
+        return RunProgress(self, restaurant_type)
+
+
+class RunProgress:
+    def __init__(self, shared, restaurant_type):
+        self.shared = shared
+        self.restaurant_type = restaurant_type
+
+    def phase(self, phase):
+        self.shared.phase(f"{self.restaurant_type}: {phase}")
+
+    def update(self, force=False, **counters):
+        self.shared.update(self.restaurant_type, force=force, **counters)
+
+    def ingest_batch(self, stats):
+        self.update(items_fetched=stats.items, rows_written=stats.rows)
+
+
+def _write_concurrency(config):
+    """Concurrent dataset ingestions; SQLite has a single writer, so it gets one"""
+    if db.engine.dialect.name == 'sqlite':
+        return 1
+    return max(1, config.get('INGEST_WRITE_CONCURRENCY', 2))
+
+
+def orchestrate_restaurant_type_runs(progress, restaurant_types, ingest):
+    """Start one actor run per restaurant_type, then ingest each dataset as soon as its run succeeds.
+
+    Runs are started and polled concurrently (APIFY_MAX_CONCURRENT_RUNS
+    threads, polling with exponential backoff); datasets are written by a
+    separate pool of INGEST_WRITE_CONCURRENCY threads, each in its own app
+    context and session, calling ingest(progress, client, dataset_id,
+    restaurant_type) which commits its own transaction. Returns the RunStates.
+    """
+    app = current_app._get_current_object()
+    config = app.config
+    states = [RunState(restaurant_type) for restaurant_type in restaurant_types]
+    shared = SharedProgress(progress)
+
+    def start(state):
+        with app.app_context():
+            state.run_id = start_actor_run(get_apify_client(), restaurant_type_run_input(state.restaurant_type))
+            state.status = 'running'
+        return state
+
+    def wait_for(state):
+        with app.app_context():
+            run_info = wait_for_run(get_apify_client(), state.run_id,
+                                    initial_delay=config.get('APIFY_POLL_INITIAL_SECONDS', 5.0),
+                                    max_delay=config.get('APIFY_POLL_MAX_SECONDS', 60.0),
+                                    timeout=config.get('APIFY_RUN_TIMEOUT_SECONDS'))
+        state.status = run_info['status']
+        return run_info
+
+    def ingest_run(state, dataset_id):
+        with app.app_context():
+            try:
+                with query_scope(f"ingest {state.restaurant_type} {state.run_id}"):
+                    state.message = ingest(shared.for_run(state.restaurant_type), get_apify_client(), dataset_id,
+                                           state.restaurant_type)
+                state.status = 'ingested'
+            except Exception as e:
+                db.session.rollback()
+                state.status, state.error = 'ingest failed', str(e)
+            finally:
+                db.session.remove()
+
+    run_threads = max(1, min(len(states), config.get('APIFY_MAX_CONCURRENT_RUNS', 8)))
+    with ThreadPoolExecutor(max_workers=run_threads, thread_name_prefix='apify-run') as runs, \
+            ThreadPoolExecutor(max_workers=_write_concurrency(config), thread_name_prefix='apify-ingest') as writers:
+        shared.phase(f"starting {len(states)} runs")
+        waiting = {}
+        for state, future in [(state, runs.submit(start, state)) for state in states]:
+            try:
+                future.result()
+            except Exception as e:
+                state.status, state.error = 'start failed', str(e)
+                continue
+            waiting[runs.submit(wait_for, state)] = state
+
+        ingesting = []
+        while waiting:
+            shared.phase(f"waiting for {len(waiting)} runs, {len(ingesting)} ingesting")
+            done, _ = wait(waiting, return_when=FIRST_COMPLETED)
+            for future in done:
+                state = waiting.pop(future)
+                try:
+                    run_info = future.result()
+                except Exception as e:
+                    state.status, state.error = 'wait failed', str(e)
+                    continue
+                if run_info['status'] != 'SUCCEEDED':
+                    state.error = f"run finished with status {run_info['status']}"
+                    continue
+                state.status = 'ingesting'
+                ingesting.append(writers.submit(ingest_run, state, run_info['defaultDatasetId']))
+
+        shared.phase(f"ingesting {sum(1 for f in ingesting if not f.done())} datasets")
+        for future in ingesting:
+            future.result()
+    return states
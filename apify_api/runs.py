@@ -0,0 +1,53 @@
+import json
+import time
+from apify_client import ApifyClient
+from flask import current_app
+
+TERMINAL_STATUSES = ('SUCCEEDED', 'FAILED', 'ABORTED', 'TIMED-OUT')
+
+
+def get_apify_client():
+    """Apify client for the configured API key.
+
+    APIFY_CLIENT_FACTORY, when set, is called with the key instead of
+    ApifyClient, so tests and benchmarks can run against a local fake.
+    """
+    config = current_app.config
+    factory = config.get('APIFY_CLIENT_FACTORY') or ApifyClient
+    return factory(config['APIFY_API_KEY'])
+
+
+def restaurant_type_run_input(restaurant_type):
+    """Actor input for a cuisine run: apify_run_inputs.json with the type as the search keyword"""
+    file_path = current_app.config['FILE_BASE'] + 'json/apify_run_inputs.json'
+    with open(file_path, 'r') as f:
+        run_input = json.load(f)
+    run_input['restaurant_type'] = restaurant_type
+    run_input['keywords'] = [restaurant_type]
+    return run_input
+
+
+def start_actor_run(client, run_input):
+    """Start the review scraper actor, returning the run id"""
+    actor_run = client.actor(current_app.config['APIFY_RESTAURANT_REVIEW_URI']).start(run_input=run_input)
+    return actor_run['id']
+
+
+def wait_for_run(client, run_id, initial_delay=5.0, max_delay=60.0, timeout=None, sleep=time.sleep):
+    """Poll a run until it reaches a terminal status, backing off between polls.
+
+    The delay starts at initial_delay and doubles up to max_delay. Returns the
+    final run info; raises TimeoutError if timeout seconds pass first.
+    """
+    deadline = time.monotonic() + timeout if timeout else None
+    delay = initial_delay
+    while True:
+        run_info = client.run(run_id).get()
+        if run_info is None:
+            raise ValueError(f"Error retrieving run with ID '{run_id}'.")
+        if run_info['status'] in TERMINAL_STATUSES:
+            return run_info
+        if deadline is not None and time.monotonic() + delay > deadline:
+            raise TimeoutError(f"Run {run_id} still {run_info['status']} after {timeout:g} seconds")
+        sleep(delay)
+        delay = min(delay * 2, max_delay)
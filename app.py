@@ -4,6 +4,10 @@ import os
 from flask import Flask
 import config
 from extensions import db
+from data_version import register_data_version_events
+from metrics import init_metrics
+from query_diagnostics import init_query_diagnostics
+from pa_api.review_store import init_review_store
 from config import DevelopmentConfig, ProductionConfig
 from pathlib import Path
 
@@ -26,6 +30,10 @@ def create_app(config_object=None):
             app.config.from_object(ProductionConfig)
 
     db.init_app(app)  # Initialize db with your Flask app
+    register_data_version_events()  # commits that bumped the data version drop this process's cached one
+    init_metrics(app)  # request timing, SQL counts and GET /metrics
+    init_query_diagnostics(app)  # slow-query log and repeated-query detector
+    init_review_store(app)  # columnar copy of reviews for the analytics reads, if preloading is on
 
     # Blueprints
     from apify_api.apify_endpoints import apify_endpoints
@@ -38,6 +46,15 @@ def create_app(config_object=None):
     app.register_blueprint(capture_review, url_prefix='/reviews')
     app.register_blueprint(deploy_app, url_prefix='/')
 
+    # CLI: flask --app app migrate / explain-endpoints / refresh-scores
+    from migrations import migrate_command
+    from query_plans import explain_endpoints_command
+    from rankings import refresh_scores_command
+
+    app.cli.add_command(migrate_command)
+    app.cli.add_command(explain_endpoints_command)
+    app.cli.add_command(refresh_scores_command)
+
     print("\n=== Registered Routes ===")
     for rule in app.url_map.iter_rules():
         print(f"{rule.endpoint}: {rule.rule} {rule.methods}")
@@ -0,0 +1,142 @@
+"""Benchmark of sequential vs prefetched Apify dataset reads against a local stand-in API.
+
+    python -m benchmarks.dataset_fetch --items 20k --latency-ms 50 --write-ms 20 --windows 2 4 8
+
+A ThreadingHTTPServer serves GET /v2/datasets/<id>/items like the Apify API,
+sleeping --latency-ms per page; the real ApifyClient talks to it through
+api_url. The consumer sleeps --write-ms per page to stand in for the DB writer,
+so the gain from overlapping network and database time is visible.
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from apify_client import ApifyClient
+from apify_api.bulk_ingest import batched
+from apify_api.dataset_reader import DEFAULT_PAGE_SIZE, PrefetchingDatasetReader
+from benchmarks.run import parse_scale
+from benchmarks.synthetic import synthetic_reviews
+
+DATASET_ID = 'benchmark-dataset'
+
+
+class StubApifyServer:
+    """Local HTTP server answering dataset item requests with a fixed latency per request"""
+
+    def __init__(self, items, latency_seconds):
+        self.items = items
+        self.latency_seconds = latency_seconds
+        self.requests = 0
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def api_url(self):
+        host, port = self.server.server_address
+        return f'http://{host}:{port}'
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path != f'/v2/datasets/{DATASET_ID}/items':
+                    self.send_error(404)
+                    return
+                stub.requests += 1
+                query = parse_qs(url.query)
+                offset = int(query.get('offset', ['0'])[0])
+                limit = int(query.get('limit', [str(len(stub.items))])[0])
+                body = json.dumps(stub.items[offset:offset + limit]).encode('utf-8')
+                time.sleep(stub.latency_seconds)
+
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.send_header('x-apify-pagination-total', str(len(stub.items)))
+                self.send_header('x-apify-pagination-offset', str(offset))
+                self.send_header('x-apify-pagination-limit', str(limit))
+                self.send_header('x-apify-pagination-count', str(min(limit, max(0, len(stub.items) - offset))))
+                self.send_header('x-apify-pagination-desc', '')
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def consume(items, page_size, write_seconds):
+    """Drain items in writer-sized batches, sleeping write_seconds per batch; returns the item count"""
+    count = 0
+    for batch in batched(items, page_size):
+        time.sleep(write_seconds)
+        count += len(batch)
+    return count
+
+
+def bench_dataset_fetch(item_count, latency_seconds, write_seconds, windows, page_size=DEFAULT_PAGE_SIZE, seed=0):
+    """Seconds to read and "write" item_count items sequentially and with each prefetch window"""
+    items = list(synthetic_reviews(item_count, seed=seed))
+    results = []
+    with StubApifyServer(items, latency_seconds) as server:
+        client = ApifyClient('benchmark', api_url=server.api_url, max_retries=1)
+        dataset = client.dataset(DATASET_ID)
+        readers = [('sequential', lambda: dataset.iterate_items())]
+        readers += [(f'prefetch-{window}', lambda window=window: PrefetchingDatasetReader(dataset, page_size, window))
+                    for window in windows]
+
+        for name, reader in readers:
+            started = time.perf_counter()
+            count = consume(reader(), page_size, write_seconds)
+            seconds = time.perf_counter() - started
+            if count != item_count:
+                raise RuntimeError(f"{name} read {count} of {item_count} items")
+            results.append({
+                'benchmark': 'dataset_fetch',
+                'name': name,
+                'scale': item_count,
+                'ms': round(seconds * 1000, 3),
+                'items_per_sec': round(item_count / seconds, 1)
+            })
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', type=parse_scale, default=parse_scale('20k'))
+    parser.add_argument('--latency-ms', type=float, default=50.0, help='simulated round trip per page')
+    parser.add_argument('--write-ms', type=float, default=20.0, help='simulated DB write time per page')
+    parser.add_argument('--windows', nargs='+', type=int, default=[2, 4, 8], help='prefetch windows to try')
+    parser.add_argument('--page-size', type=int, default=DEFAULT_PAGE_SIZE)
+    parser.add_argument('--output', help='write the results as JSON')
+    args = parser.parse_args(argv)
+
+    results = bench_dataset_fetch(args.items, args.latency_ms / 1000, args.write_ms / 1000, args.windows,
+                                  args.page_size)
+    sequential = results[0]['ms']
+    for result in results:
+        print(f"{result['name']:<12} {result['ms']:>10.1f} ms {result['items_per_sec']:>10.0f} items/s "
+              f"({sequential / result['ms']:.2f}x)")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'results': results}, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,228 @@
+"""Benchmarks for the ingestion and read hot paths.
+
+    python -m benchmarks.run --scales 1k 10k 100k --output results.json
+    python -m benchmarks.run --scales 10k --baseline previous.json
+
+Every scale gets a fresh database (BENCHMARK_DATABASE_URI, in-memory SQLite by
+default; every table is dropped) seeded through the real pop-db and
+pop-restaurant-type endpoints, with Apify replaced by a synthetic dataset.
+"""
+import argparse
+import json
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+import sqlalchemy
+from app import create_app
+from config import BenchmarkConfig
+from extensions import db
+from models import Review
+from pa_api.response_cache import invalidate_response_cache
+from query_plans import sample_endpoint_paths
+from apify_api.jobs import job_status
+from benchmarks.synthetic import REVIEWS_PER_PLACE, SyntheticApifyClient, synthetic_reviews
+
+DEFAULT_SCALES = ('1k', '10k')
+FULL_LISTING_MAX_SCALE = 100_000  # unpaginated listings of everything are skipped above this
+TYPE_RUN_FRACTION = 10  # pop-restaurant-type loads scale / 10 reviews
+RESTAURANT_TYPE = 'Italian'
+
+
+def parse_scale(value):
+    """1000, 10k, 1M -> int"""
+    match = re.fullmatch(r'(\d+)([kKmM]?)', value.strip())
+    if not match:
+        raise argparse.ArgumentTypeError(f"invalid scale: {value}")
+    number, suffix = int(match.group(1)), match.group(2).lower()
+    return number * {'': 1, 'k': 1_000, 'm': 1_000_000}[suffix]
+
+
+def summarize(samples):
+    """Latency summary in milliseconds of a list of durations in seconds"""
+    ms = sorted(sample * 1000 for sample in samples)
+    return {
+        'runs': len(ms),
+        'min_ms': round(ms[0], 3),
+        'mean_ms': round(statistics.fmean(ms), 3),
+        'p50_ms': round(statistics.median(ms), 3),
+        'p95_ms': round(ms[min(len(ms) - 1, int(round(0.95 * (len(ms) - 1))))], 3),
+        'max_ms': round(ms[-1], 3)
+    }
+
+
+def bench_from_apify_data(scale, seed):
+    items = list(synthetic_reviews(scale, seed=seed))
+    started = time.perf_counter()
+    for item in items:
+        Review.from_apify_data(item)
+    elapsed = time.perf_counter() - started
+    return {
+        'benchmark': 'from_apify_data',
+        'name': 'Review.from_apify_data',
+        'ms': round(elapsed * 1000, 3),
+        'items': scale,
+        'items_per_sec': round(scale / elapsed, 1),
+        'us_per_item': round(elapsed / scale * 1e6, 3)
+    }
+
+
+def _run_ingest(client, path, payload, name, items):
+    started = time.perf_counter()
+    response = client.post(path, json=payload)
+    elapsed = time.perf_counter() - started
+
+    match = re.search(r'/apify/jobs/(\w+)', response.get_data(as_text=True))
+    status = job_status(match.group(1)) if match else None
+    if response.status_code != 202 or status is None or status['status'] != 'succeeded':
+        raise RuntimeError(f"{name} failed: {status['error'] if status else response.get_data(as_text=True)}")
+    return {
+        'benchmark': 'ingest',
+        'name': name,
+        'ms': round(elapsed * 1000, 3),
+        'items': items,
+        'rows_written': status['rows_written'],
+        'items_per_sec': round(items / elapsed, 1)
+    }
+
+
+def bench_ingest(client, datasets, scale, seed):
+    """Seed through pop-db, then add a cuisine run that overlaps a fifth of the places"""
+    datasets[f'seed-{scale}'] = lambda: synthetic_reviews(scale, seed=seed)
+    seed_result = _run_ingest(client, '/apify/pop-db', {'runId': f'seed-{scale}'}, 'pop-db', scale)
+
+    type_items = max(1, scale // TYPE_RUN_FRACTION)
+    type_places = max(1, scale // REVIEWS_PER_PLACE // 5)
+    datasets[f'type-{scale}'] = lambda: synthetic_reviews(type_items, places=type_places, seed=seed + 1)
+    type_result = _run_ingest(client, '/apify/pop-restaurant-type',
+                              {'runId': f'type-{scale}', 'restaurant_type': RESTAURANT_TYPE},
+                              'pop-restaurant-type', type_items)
+    return [seed_result, type_result]
+
+
+def endpoint_paths(scale):
+    paths = sample_endpoint_paths() + [
+        '/reviews/reviews?limit=50',
+        '/reviews/search_reviews?keyword=tiramisu&scope=all',
+        '/reviews/search_ratings?keyword=pasta&scope=all',
+    ]
+    if scale <= FULL_LISTING_MAX_SCALE:
+        paths += ['/reviews/reviews', '/reviews/ratings', '/reviews/reviews?format=ndjson']
+    return paths
+
+
+def bench_endpoint(app, client, path, repeats):
+    """Time a GET with the response cache off (database path) and on (cache hits)"""
+    results = []
+    for cached in (False, True):
+        app.config['RESPONSE_CACHE_ENABLED'] = cached
+        invalidate_response_cache()
+        response = client.get(path)  # warm-up; fills the cache when it is on
+        size = len(response.get_data())
+        samples = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            response = client.get(path)
+            response.get_data()
+            samples.append(time.perf_counter() - started)
+        summary = summarize(samples)
+        results.append(dict({
+            'benchmark': 'endpoint_cached' if cached else 'endpoint',
+            'name': path,
+            'ms': summary['p50_ms'],
+            'status': response.status_code,
+            'bytes': size
+        }, **summary))
+    return results
+
+
+def run_scale(scale, repeats, seed):
+    app = create_app(BenchmarkConfig)
+    datasets = {}
+    results = []
+    app.config['APIFY_CLIENT_FACTORY'] = SyntheticApifyClient(datasets)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        client = app.test_client()
+
+        results.append(bench_from_apify_data(scale, seed))
+        results += bench_ingest(client, datasets, scale, seed)
+        for path in endpoint_paths(scale):
+            results += bench_endpoint(app, client, path, repeats)
+
+        db.session.remove()
+        db.engine.dispose()
+    for result in results:
+        result['scale'] = scale
+    return results
+
+
+def environment(args):
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except Exception:
+        commit = None
+    return {
+        'commit': commit,
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'sqlalchemy': sqlalchemy.__version__,
+        'database': sqlalchemy.engine.make_url(BenchmarkConfig.SQLALCHEMY_DATABASE_URI).get_backend_name(),
+        'repeats': args.repeats,
+        'seed': args.seed
+    }
+
+
+def compare(baseline, results, threshold):
+    """(key, before_ms, after_ms, change) for results present in both runs, worst change first"""
+    before = {(r['scale'], r['benchmark'], r['name']): r['ms'] for r in baseline['results']}
+    changes = []
+    for result in results:
+        key = (result['scale'], result['benchmark'], result['name'])
+        if key in before and before[key] > 0:
+            changes.append((key, before[key], result['ms'], result['ms'] / before[key] - 1))
+    changes.sort(key=lambda change: -change[3])
+    regressions = [change for change in changes if change[3] > threshold]
+    return changes, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scales', nargs='+', type=parse_scale, default=[parse_scale(s) for s in DEFAULT_SCALES],
+                        help='review counts, e.g. 1k 10k 100k 1M')
+    parser.add_argument('--repeats', type=int, default=5, help='timed requests per endpoint')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='benchmark-results.json')
+    parser.add_argument('--baseline', help='earlier results file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='slowdown reported as a regression')
+    args = parser.parse_args(argv)
+
+    results = []
+    for scale in args.scales:
+        print(f"benchmarking {scale} reviews...", file=sys.stderr)
+        results += run_scale(scale, args.repeats, args.seed)
+
+    report = {'environment': environment(args), 'results': results}
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"wrote {len(results)} results to {args.output}", file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            changes, regressions = compare(json.load(f), results, args.threshold)
+        for (scale, benchmark, name), before_ms, after_ms, change in changes:
+            flag = ' REGRESSION' if change > args.threshold else ''
+            print(f"{scale:>9} {benchmark:<16} {name:<70} {before_ms:>10.2f} -> {after_ms:>10.2f} ms "
+                  f"({change:+.0%}){flag}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,102 @@
+import random
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+
+# provider mix and reviews-per-place roughly follow json/search.json
+PROVIDERS = ('google-maps', 'facebook', 'tripadvisor')
+PROVIDER_WEIGHTS = (0.73, 0.16, 0.11)
+REVIEWS_PER_PLACE = 50
+
+NAME_WORDS = ('Maison', 'Bistro', 'Trattoria', 'Kitchen', 'Grill', 'Osteria', 'Cafe', 'Sushi', 'Brasserie',
+              'Taverna', 'Steakhouse', 'Noodle', 'House', 'Garden', 'Table', 'Oyster', 'Bar', 'Selby', 'Nodo',
+              'Blue', 'Golden', 'Little', 'Queen', 'King', 'Harbour', 'Annex', 'Ossington', 'Dundas')
+STREETS = ('Queen St E', 'Queen St W', 'King St W', 'Sherbourne St', 'Dundas St W', 'Ossington Ave',
+           'Yonge St', 'Bloor St W', 'Austin Terrace', 'College St')
+FIRST_NAMES = ('Pam', 'Alita', 'Rachel', 'Georgii', 'Gustavo', 'Kathy', 'Arthur', 'Cathy', 'Jessica', 'Mark',
+               'Victoria', 'Priya', 'Wei', 'Omar', 'Sofia', 'Liam')
+# Zipf-like weights so full-text searches see both common and rare terms
+REVIEW_WORDS = ('the', 'food', 'service', 'great', 'was', 'and', 'staff', 'dinner', 'pasta', 'wine', 'table',
+                'delicious', 'server', 'atmosphere', 'menu', 'dessert', 'cozy', 'rude', 'slow', 'amazing',
+                'oyster', 'steak', 'sushi', 'birthday', 'reservation', 'patio', 'cocktails', 'brunch', 'tiramisu',
+                'risotto', 'souffle', 'omakase', 'charcuterie', 'sommelier')
+REVIEW_WORD_WEIGHTS = tuple(1.0 / (rank + 1) for rank in range(len(REVIEW_WORDS)))
+EPOCH = datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+
+def synthetic_place(rng, number):
+    name = f"{rng.choice(NAME_WORDS)} {rng.choice(NAME_WORDS)} {number}"
+    return {
+        'googleMapsPlaceId': f"ChIJsynthetic{number:010d}",
+        'placeName': name,
+        'placeAlternateNames': [],
+        'placeUrl': f"https://www.example.com/places/{number}",
+        'placeAddress': f"{rng.randint(1, 2000)} {rng.choice(STREETS)}, Toronto, ON, Canada"
+    }
+
+
+def synthetic_reviews(count, places=None, seed=0, first_place=0):
+    """Yield count Apify dataset items shaped like json/search.json, deterministic for a given seed.
+
+    Reviews are spread over places (default count / REVIEWS_PER_PLACE) numbered
+    from first_place, so two generators with overlapping ranges share places
+    the way a cuisine run overlaps the seed run.
+    """
+    rng = random.Random(seed)
+    places = places or max(1, count // REVIEWS_PER_PLACE)
+    place_cache = {}
+    for number in range(count):
+        place_number = first_place + rng.randrange(places)
+        place = place_cache.get(place_number)
+        if place is None:
+            place = place_cache[place_number] = synthetic_place(random.Random(place_number), place_number)
+
+        words = rng.choices(REVIEW_WORDS, weights=REVIEW_WORD_WEIGHTS, k=rng.randint(5, 80))
+        provider = rng.choices(PROVIDERS, weights=PROVIDER_WEIGHTS)[0]
+        review_date = EPOCH + timedelta(seconds=rng.randrange(5 * 365 * 24 * 3600))
+        yield dict(
+            place,
+            provider=provider,
+            reviewId=f"{seed}-{number}",
+            reviewUrl=f"https://www.example.com/reviews/{seed}-{number}",
+            reviewTitle=' '.join(words[:3]).capitalize() if provider == 'tripadvisor' else None,
+            reviewText=' '.join(words).capitalize() + '.',
+            reviewDate=review_date.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+            reviewRating=rng.choices((1, 2, 3, 4, 5, None), weights=(5, 5, 10, 25, 50, 5))[0],
+            authorName=f"{rng.choice(FIRST_NAMES)} {chr(ord('A') + rng.randrange(26))}"
+        )
+
+
+class SyntheticApifyClient:
+    """Stands in for ApifyClient: every run id has SUCCEEDED and names a registered dataset.
+
+    datasets maps a run/dataset id to a zero-argument callable returning the
+    items, so large datasets are generated lazily while they are ingested.
+    """
+
+    def __init__(self, datasets):
+        self.datasets = datasets
+
+    def __call__(self, token=None):
+        return self
+
+    def run(self, run_id):
+        return _SyntheticRun(run_id)
+
+    def dataset(self, dataset_id):
+        return _SyntheticDataset(self.datasets[dataset_id])
+
+
+class _SyntheticRun:
+    def __init__(self, run_id):
+        self.run_id = run_id
+
+    def get(self):
+        return {'id': self.run_id, 'status': 'SUCCEEDED', 'defaultDatasetId': self.run_id}
+
+
+class _SyntheticDataset:
+    def __init__(self, items):
+        self.items = items
+
+    def iterate_items(self, offset=0):
+        return islice(self.items(), offset, None)
@@ -25,11 +25,17 @@ DROP PROCEDURE IF EXISTS makeratings;
 DROP PROCEDURE IF EXISTS makerestaurants;
 
 -- Drop tables created by procedures
+DROP TABLE IF EXISTS restaurant_scores;
+DROP TABLE IF EXISTS restaurant_summary;
 DROP TABLE IF EXISTS bain_ratings;
 DROP TABLE IF EXISTS ratings;
 DROP TABLE IF EXISTS restaurants;
 DROP TABLE IF EXISTS reviews_bup;
 DROP TABLE IF EXISTS reviews_bain;
+DROP TABLE IF EXISTS ingest_jobs;
+DROP TABLE IF EXISTS ingest_checkpoints;
+DROP TABLE IF EXISTS data_versions;
+DROP TABLE IF EXISTS schema_migrations;
 
 -- Drop main table last
 DROP TABLE IF EXISTS reviews;
@@ -55,10 +61,128 @@ CREATE TABLE `reviews` (
   `ignore_for_rating` TINYINT(1) DEFAULT NULL,
   `ignore_for_insufficient` TINYINT(1) DEFAULT NULL,
   `selected_as_top_rating` TINYINT(1) DEFAULT NULL,
+  `review_key` VARCHAR(40) DEFAULT NULL,  -- SHA-1 of (google_maps_id, provider, author_name, review_date), NULL for Bain reviews
   PRIMARY KEY (`id`),
   INDEX idx_google_maps_id (`google_maps_id`),
   INDEX idx_provider (`provider`),
-  INDEX idx_rating (`review_rating`)
+  INDEX idx_rating (`review_rating`),
+  INDEX ix_reviews_place_date (`google_maps_id`, `review_date`),
+  INDEX ix_reviews_provider_place (`provider`, `google_maps_id`),
+  UNIQUE INDEX ux_reviews_review_key (`review_key`),
+  FULLTEXT INDEX ft_reviews_search (`place_name`, `place_address`, `review_title`, `review_text`)  -- scope=all searches
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb3;
+
+-- ============================================
+-- CREATE DERIVED TABLES
+-- ============================================
+-- These are refilled by the procedures below and by the app (DELETE + INSERT,
+-- never DROP), so readers never hit a missing table during a rebuild.
+-- ratings/bain_ratings keep a running count and sum per place, which lets the
+-- app add new reviews incrementally in the same transaction as the insert.
+
+CREATE TABLE `restaurants` (
+  `google_maps_id` VARCHAR(128) NOT NULL,
+  `place_name` VARCHAR(255) NOT NULL,
+  `place_address` VARCHAR(255) DEFAULT NULL,
+  `restaurant_type` VARCHAR(50) NOT NULL,
+  PRIMARY KEY (`google_maps_id`, `restaurant_type`),
+  INDEX ix_restaurants_type_name (`restaurant_type`, `place_name`, `google_maps_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb3;
+
+CREATE TABLE `ratings` (
+  `google_maps_id` VARCHAR(128) NOT NULL,
+  `place_name` VARCHAR(255) DEFAULT NULL,
+  `ratings_count` BIGINT NOT NULL DEFAULT 0,
+  `ratings_sum` BIGINT NOT NULL DEFAULT 0,
+  `ratings_avg` DECIMAL(7,4) DEFAULT NULL,
+  PRIMARY KEY (`google_maps_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb3;
+
+CREATE TABLE `bain_ratings` (
+  `google_maps_id` VARCHAR(128) NOT NULL,
+  `place_name` VARCHAR(255) DEFAULT NULL,
+  `ratings_count` BIGINT NOT NULL DEFAULT 0,
+  `ratings_sum` BIGINT NOT NULL DEFAULT 0,
+  `ratings_avg` DECIMAL(7,4) DEFAULT NULL,
+  PRIMARY KEY (`google_maps_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb3;
+
+-- Read model of the ratings endpoints: one row per restaurants row plus an
+-- 'all' row per place, with both ratings folded in; kept current by the app
+CREATE TABLE `restaurant_summary` (
+  `google_maps_id` VARCHAR(128) NOT NULL,
+  `restaurant_type` VARCHAR(50) NOT NULL,
+  `place_name` VARCHAR(255) DEFAULT NULL,
+  `place_address` VARCHAR(255) DEFAULT NULL,
+  `ratings_count` BIGINT NOT NULL DEFAULT 0,
+  `ratings_avg` DECIMAL(7,4) DEFAULT NULL,
+  `bain_ratings_count` BIGINT NOT NULL DEFAULT 0,
+  `bain_ratings_avg` DECIMAL(7,4) DEFAULT NULL,
+  PRIMARY KEY (`google_maps_id`, `restaurant_type`),
+  INDEX ix_restaurant_summary_type_name (`restaurant_type`, `place_name`, `google_maps_id`),
+  INDEX ix_restaurant_summary_type_avg (`restaurant_type`, `ratings_avg`, `google_maps_id`),
+  INDEX ix_restaurant_summary_type_count (`restaurant_type`, `ratings_count`, `google_maps_id`),
+  INDEX ix_restaurant_summary_type_bain_avg (`restaurant_type`, `bain_ratings_avg`, `google_maps_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb3;
+
+-- Shrinkage-adjusted ranking score per restaurants row plus an 'all' row per
+-- place (rankings.py); /reviews/top scans ix_restaurant_scores_type_score backwards
+CREATE TABLE `restaurant_scores` (
+  `google_maps_id` VARCHAR(128) NOT NULL,
+  `restaurant_type` VARCHAR(50) NOT NULL,
+  `place_name` VARCHAR(255) DEFAULT NULL,
+  `score` DOUBLE NOT NULL,
+  `ratings_count` BIGINT NOT NULL DEFAULT 0,
+  `weighted_avg` DOUBLE DEFAULT NULL,
+  PRIMARY KEY (`google_maps_id`, `restaurant_type`),
+  INDEX ix_restaurant_scores_type_score (`restaurant_type`, `score`, `google_maps_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb3;
+
+-- Monotonic version of the review data, bumped by every app write path;
+-- drives the ETags of the /reviews read endpoints
+CREATE TABLE `data_versions` (
+  `name` VARCHAR(50) NOT NULL,
+  `version` BIGINT NOT NULL DEFAULT 0,
+  PRIMARY KEY (`name`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb3;
+
+-- Background ingestion jobs queued by /apify/pop-db and /apify/pop-restaurant-type
+CREATE TABLE `ingest_jobs` (
+  `id` VARCHAR(32) NOT NULL,
+  `kind` VARCHAR(50) NOT NULL,
+  `params` TEXT,
+  `status` VARCHAR(20) NOT NULL DEFAULT 'queued',
+  `phase` VARCHAR(255) DEFAULT NULL,
+  `items_fetched` INT DEFAULT 0,
+  `rows_written` INT DEFAULT 0,
+  `message` TEXT,
+  `error` TEXT,
+  `created_at` DATETIME DEFAULT NULL,
+  `started_at` DATETIME DEFAULT NULL,
+  `finished_at` DATETIME DEFAULT NULL,
+  PRIMARY KEY (`id`),
+  INDEX idx_status (`status`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb3;
+
+-- Dataset offset committed so far per restaurant_type ingestion, for resuming
+CREATE TABLE `ingest_checkpoints` (
+  `dataset_id` VARCHAR(64) NOT NULL,
+  `restaurant_type` VARCHAR(50) NOT NULL,
+  `items_committed` INT NOT NULL DEFAULT 0,
+  `rows_written` INT NOT NULL DEFAULT 0,
+  `updated_at` DATETIME DEFAULT NULL,
+  `completed_at` DATETIME DEFAULT NULL,
+  PRIMARY KEY (`dataset_id`, `restaurant_type`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb3;
+
+-- Versions applied by `flask --app app migrate` (migrations.py); the tables
+-- above already match the latest migration, so running it after a build only
+-- records the versions
+CREATE TABLE `schema_migrations` (
+  `version` INT NOT NULL,
+  `description` VARCHAR(255) NOT NULL,
+  `applied_at` DATETIME DEFAULT NULL,
+  PRIMARY KEY (`version`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb3;
 
 -- ============================================
@@ -67,48 +191,52 @@ CREATE TABLE `reviews` (
 
 DELIMITER //
 
--- Procedure to create restaurants table from reviews
+-- Procedure to refill restaurants table from reviews
 CREATE PROCEDURE makerestaurants()
 BEGIN
-    DROP TABLE IF EXISTS restaurants;
-    CREATE TABLE restaurants AS
+    DELETE FROM restaurants WHERE restaurant_type = 'all';
+    INSERT INTO restaurants (google_maps_id, place_name, place_address, restaurant_type)
     SELECT
         reviews.google_maps_id AS google_maps_id,
         MAX(reviews.place_name) AS place_name,
         MAX(reviews.place_address) AS place_address,
         'all' AS restaurant_type
     FROM reviews
-    GROUP BY reviews.google_maps_id
-    ORDER BY MAX(reviews.place_name);
+    WHERE reviews.google_maps_id IS NOT NULL
+    GROUP BY reviews.google_maps_id;
 END //
 
--- Procedure to create ratings table from all reviews
+-- Procedure to refill ratings table from all reviews
 CREATE PROCEDURE makeratings()
 BEGIN
-    DROP TABLE IF EXISTS ratings;
-    CREATE TABLE ratings AS
+    DELETE FROM ratings;
+    INSERT INTO ratings (google_maps_id, place_name, ratings_count, ratings_sum, ratings_avg)
     SELECT
         reviews.google_maps_id,
         MAX(reviews.place_name) AS place_name,
         COUNT(reviews.review_rating) AS ratings_count,
+        SUM(reviews.review_rating) AS ratings_sum,
         AVG(reviews.review_rating) AS ratings_avg
     FROM reviews
     WHERE reviews.review_rating IS NOT NULL
+      AND reviews.google_maps_id IS NOT NULL
     GROUP BY reviews.google_maps_id;
 END //
 
--- Procedure to create Bain-specific ratings table
+-- Procedure to refill Bain-specific ratings table
 CREATE PROCEDURE makebainratings()
 BEGIN
-    DROP TABLE IF EXISTS bain_ratings;
-    CREATE TABLE bain_ratings AS
+    DELETE FROM bain_ratings;
+    INSERT INTO bain_ratings (google_maps_id, place_name, ratings_count, ratings_sum, ratings_avg)
     SELECT
         reviews.google_maps_id,
         MAX(reviews.place_name) AS place_name,
         COUNT(reviews.review_rating) AS ratings_count,
+        SUM(reviews.review_rating) AS ratings_sum,
         AVG(reviews.review_rating) AS ratings_avg
     FROM reviews
     WHERE reviews.review_rating IS NOT NULL
+      AND reviews.google_maps_id IS NOT NULL
       AND reviews.provider = 'Bain'
     GROUP BY reviews.google_maps_id;
 END //
@@ -118,8 +246,8 @@ CREATE PROCEDURE cleardb()
 BEGIN
     DROP TABLE IF EXISTS reviews_bup;
     CREATE TABLE reviews_bup AS SELECT * FROM reviews;
-    DROP TABLE IF EXISTS ratings;
-    DROP TABLE IF EXISTS restaurants;
+    DELETE FROM ratings;
+    DELETE FROM restaurants;
     DELETE FROM reviews WHERE provider != 'Bain';
 END //
 
@@ -18,10 +18,48 @@ class Config:
     SQLALCHEMY_ENGINE_OPTIONS = {'pool_recycle': 280}
     APIFY_API_KEY = os.getenv('APIFY_API_KEY')
     APIFY_RESTAURANT_REVIEW_URI = os.getenv('APIFY_RESTAURANT_REVIEW_URI')
-    DB_PROCEDURE_BAIN_RATING = os.getenv('DB_PROCEDURE_BAIN_RATING')
     DB_PROCEDURE_CLEAR_DB = os.getenv('DB_PROCEDURE_CLEAR_DB')
-    DB_PROCEDURE_MAKE_RATINGS= os.getenv('DB_PROCEDURE_MAKE_RATINGS')
-    DB_PROCEDURE_MAKE_RESTAURANTS= os.getenv('DB_PROCEDURE_MAKE_RESTAURANTS')
+    INGEST_BATCH_SIZE = int(os.getenv('INGEST_BATCH_SIZE', 500))  # rows per executemany INSERT
+    INGEST_JOB_WORKERS = int(os.getenv('INGEST_JOB_WORKERS', 2))  # background ingestion threads, 0 runs inline
+    INGEST_JOB_PROGRESS_SECONDS = 1.0  # minimum gap between job progress writes
+    INGEST_WRITE_CONCURRENCY = int(os.getenv('INGEST_WRITE_CONCURRENCY', 2))  # datasets written at once by pop-restaurant-types
+    APIFY_MAX_CONCURRENT_RUNS = int(os.getenv('APIFY_MAX_CONCURRENT_RUNS', 8))  # actor runs started/polled at once
+    APIFY_POLL_INITIAL_SECONDS = 5.0  # first gap between run status polls, doubling each time
+    APIFY_POLL_MAX_SECONDS = 60.0
+    APIFY_RUN_TIMEOUT_SECONDS = int(os.getenv('APIFY_RUN_TIMEOUT_SECONDS', 3 * 3600))
+    APIFY_DATASET_PAGE_SIZE = 1000  # items per dataset page request
+    APIFY_DATASET_PREFETCH_PAGES = int(os.getenv('APIFY_DATASET_PREFETCH_PAGES', 4))  # pages fetched ahead of the DB writer, 0 reads sequentially
+    APIFY_CLIENT_FACTORY = None  # callable(api_key) used instead of ApifyClient, e.g. a local fake
+    INGEST_CHECKPOINT_BATCHES = int(os.getenv('INGEST_CHECKPOINT_BATCHES', 20))  # pop-restaurant-type commits and checkpoints after this many batches
+    FILE_LOAD_COMMIT_BATCHES = int(os.getenv('FILE_LOAD_COMMIT_BATCHES', 20))  # pop-file commits after this many batches
+    RESPONSE_CACHE_ENABLED = os.getenv('RESPONSE_CACHE_ENABLED', 'true').lower() == 'true'
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', 256))
+    RESPONSE_CACHE_TTL_SECONDS = int(os.getenv('RESPONSE_CACHE_TTL_SECONDS', 300))
+    LISTING_SNAPSHOTS_ENABLED = os.getenv('LISTING_SNAPSHOTS_ENABLED', 'true').lower() == 'true'  # pre-encoded full listings
+    LISTING_SNAPSHOT_MAX_ENTRIES = 64  # (endpoint, restaurant_type) snapshots held per worker
+    LISTING_SNAPSHOT_DIR = os.getenv('LISTING_SNAPSHOT_DIR')  # shared by the workers of one host; unset keeps them in memory only
+    LISTING_SNAPSHOT_PRERENDER = True  # re-render the held snapshots in the background after each write
+    SUBMIT_REVIEWS_MAX_BATCH = 5000  # reviews accepted by one POST /reviews/submit-reviews
+    REVIEW_STORE_BACKEND = os.getenv('REVIEW_STORE_BACKEND', 'auto')  # auto (NumPy when installed) or array
+    REVIEW_STORE_PRELOAD = os.getenv('REVIEW_STORE_PRELOAD', 'false').lower() == 'true'  # load at startup instead of first use
+    ANALYTICS_WINDOW_DAYS = (90, 365)  # trailing windows of /reviews/analytics, in days up to today (UTC)
+    RANKING_BAIN_WEIGHT = float(os.getenv('RANKING_BAIN_WEIGHT', 2.0))  # weight of a Bain review against one scraped review
+    RANKING_HALF_LIFE_DAYS = float(os.getenv('RANKING_HALF_LIFE_DAYS', 365))  # review weight halves every this many days, 0 disables decay
+    RANKING_PRIOR_WEIGHT = float(os.getenv('RANKING_PRIOR_WEIGHT', 10))  # reviews' worth of the overall average every score starts from
+    TOP_MAX_LIMIT = 100  # restaurants returned by one /reviews/top
+    REVIEWS_PAGE_SIZE = 50  # default limit when only a cursor is given
+    REVIEWS_MAX_PAGE_SIZE = 500
+    STREAM_YIELD_PER = 500  # rows fetched per round trip by format=ndjson/json-stream
+    SEARCH_BACKEND = os.getenv('SEARCH_BACKEND', 'auto')  # auto, mysql, fts5 or memory
+    SEARCH_MAX_RESULTS = 500  # review matches considered per full-text search
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'  # per-request timings on /metrics
+    QUERY_DIAGNOSTICS_ENABLED = os.getenv('QUERY_DIAGNOSTICS_ENABLED', 'false').lower() == 'true'
+    SLOW_QUERY_SECONDS = float(os.getenv('SLOW_QUERY_SECONDS', 0.5))  # statements at least this slow are logged with EXPLAIN
+    REPEATED_QUERY_LIMIT = int(os.getenv('REPEATED_QUERY_LIMIT', 20))  # same statement shape more often per request/job is flagged
+    QUERY_DIAGNOSTICS_BUFFER_SIZE = 500  # findings kept for /admin/query-diagnostics
+    # the findings hold raw SQL and EXPLAIN output; without this the endpoint answers 404
+    QUERY_DIAGNOSTICS_ENDPOINT_ENABLED = os.getenv('QUERY_DIAGNOSTICS_ENDPOINT_ENABLED', 'false').lower() == 'true'
+    DATA_VERSION_POLL_SECONDS = float(os.getenv('DATA_VERSION_POLL_SECONDS', 2.0))  # how stale another worker's writes may look
 
 class DevelopmentConfig(Config):
     DEBUG = True
@@ -35,4 +73,16 @@ class TestingConfig(Config):
     TESTING = True
     FILE_BASE = '/tmp/test_files/'
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'  # ✅ In-memory DB
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
\ No newline at end of file
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    INGEST_JOB_WORKERS = 0  # run ingestion jobs inline so tests see the finished job
+    LISTING_SNAPSHOTS_ENABLED = False  # tests of the response cache read the listings; test_listing_snapshots turns it on
+    LISTING_SNAPSHOT_PRERENDER = False
+    QUERY_DIAGNOSTICS_ENDPOINT_ENABLED = True
+class BenchmarkConfig(Config):
+    FILE_BASE = ''
+    SQLALCHEMY_DATABASE_URI = os.getenv('BENCHMARK_DATABASE_URI', 'sqlite:///:memory:')  # scratch db, tables are dropped
+    APIFY_API_KEY = 'benchmark'  # ApifyClient is replaced by a synthetic dataset
+    INGEST_JOB_WORKERS = 0
+    LISTING_SNAPSHOT_PRERENDER = False  # no background requests racing the timed ones
+    # create_all() builds no stored procedures; on a fresh database this has the same effect
+    DB_PROCEDURE_CLEAR_DB = "DELETE FROM reviews WHERE provider != 'Bain'"
@@ -0,0 +1,62 @@
+import time
+from flask import current_app
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.orm import Session
+from extensions import db
+from models import DataVersion
+
+REVIEW_DATA = 'reviews'  # covers reviews, restaurants and both ratings tables
+PENDING_BUMP = 'data_version_bumped'  # session.info key: app whose cached version the next commit drops
+
+_session_events_registered = False
+
+
+def _forget_cached_version(session):
+    app = session.info.pop(PENDING_BUMP, None)
+    if app is not None:
+        app.extensions.pop('data_version', None)
+
+
+def _discard_pending_bump(session):
+    session.info.pop(PENDING_BUMP, None)
+
+
+def register_data_version_events():
+    """Listen for commits and rollbacks of every session once; create_app calls it"""
+    global _session_events_registered
+    if not _session_events_registered:
+        event.listen(Session, 'after_commit', _forget_cached_version)
+        event.listen(Session, 'after_rollback', _discard_pending_bump)
+        _session_events_registered = True
+
+
+def bump_data_version():
+    """Increment the review data version inside the current transaction.
+
+    Call this from every write path before it commits, so the new version
+    becomes visible together with the data. This process re-reads the version
+    right after the commit (nothing changes if the transaction rolls back);
+    other workers pick it up within DATA_VERSION_POLL_SECONDS.
+    """
+    table = DataVersion.__table__
+    result = db.session.execute(
+        update(table).where(table.c.name == REVIEW_DATA).values(version=table.c.version + 1)
+    )
+    if result.rowcount == 0:
+        db.session.execute(insert(table).values(name=REVIEW_DATA, version=1))
+
+    db.session().info[PENDING_BUMP] = current_app._get_current_object()
+
+
+def current_data_version():
+    """Latest committed data version, read from the database at most once per poll interval"""
+    app = current_app._get_current_object()
+    now = time.monotonic()
+    cached = app.extensions.get('data_version')
+    if cached is not None and now - cached[1] < app.config.get('DATA_VERSION_POLL_SECONDS', 2.0):
+        return cached[0]
+
+    table = DataVersion.__table__
+    version = db.session.execute(select(table.c.version).where(table.c.name == REVIEW_DATA)).scalar() or 0
+    app.extensions['data_version'] = (version, now)
+    return version
@@ -0,0 +1,216 @@
+import json
+import time
+from threading import Lock
+from flask import Response, current_app, g, has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100, 250)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+
+HISTOGRAMS = (
+    ('http_request_duration_seconds', 'Wall time from request start to the last response byte', DURATION_BUCKETS),
+    ('http_request_db_seconds', 'Time spent executing SQL statements per request', DURATION_BUCKETS),
+    ('http_request_db_statements', 'SQL statements executed per request', STATEMENT_BUCKETS),
+    ('http_request_serialization_seconds', 'Time spent encoding JSON per request', DURATION_BUCKETS),
+    ('http_response_size_bytes', 'Response body size', BYTES_BUCKETS),
+)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for position, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[position] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """Per-process request metrics, rendered in the Prometheus text exposition format.
+
+    Each gunicorn worker keeps its own registry; Prometheus sums the series
+    when it scrapes every worker, or a single-worker deployment exposes them all.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self.requests = {}  # (endpoint, method, status) -> count
+        self.histograms = {}  # (metric, endpoint) -> Histogram
+
+    def observe(self, metric, endpoint, value):
+        key = (metric, endpoint)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            buckets = next(buckets for name, _, buckets in HISTOGRAMS if name == metric)
+            histogram = self.histograms[key] = Histogram(buckets)
+        histogram.observe(value)
+
+    def observe_request(self, endpoint, method, status, state, response_bytes):
+        with self._lock:
+            key = (endpoint, method, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self.observe('http_request_duration_seconds', endpoint, time.perf_counter() - state.started)
+            self.observe('http_request_db_seconds', endpoint, state.db_seconds)
+            self.observe('http_request_db_statements', endpoint, state.db_statements)
+            self.observe('http_request_serialization_seconds', endpoint, state.serialization_seconds)
+            self.observe('http_response_size_bytes', endpoint, response_bytes)
+
+    def render(self):
+        lines = ['# HELP http_requests_total Requests handled, by endpoint, method and status',
+                 '# TYPE http_requests_total counter']
+        with self._lock:
+            for (endpoint, method, status), count in sorted(self.requests.items()):
+                lines.append(f'http_requests_total{{endpoint="{endpoint}",method="{method}",status="{status}"}} {count}')
+            for metric, help_text, _ in HISTOGRAMS:
+                lines += [f'# HELP {metric} {help_text}', f'# TYPE {metric} histogram']
+                for (name, endpoint), histogram in sorted(self.histograms.items()):
+                    if name != metric:
+                        continue
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        lines.append(f'{metric}_bucket{{endpoint="{endpoint}",le="{bound:g}"}} {count}')
+                    lines.append(f'{metric}_bucket{{endpoint="{endpoint}",le="+Inf"}} {histogram.count}')
+                    lines.append(f'{metric}_sum{{endpoint="{endpoint}"}} {histogram.sum:.6f}')
+                    lines.append(f'{metric}_count{{endpoint="{endpoint}"}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+
+class RequestMetrics:
+    """Counters for the request being handled, kept on flask.g"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_statements = 0
+        self.db_seconds = 0.0
+        self.serialization_seconds = 0.0
+
+
+def current_request_metrics():
+    return g.get('request_metrics') if has_request_context() else None
+
+
+def add_serialization_time(seconds):
+    state = current_request_metrics()
+    if state is not None:
+        state.serialization_seconds += seconds
+
+
+def timed_dumps(obj):
+    """json.dumps that counts towards the request's serialization time"""
+    started = time.perf_counter()
+    encoded = json.dumps(obj)
+    add_serialization_time(time.perf_counter() - started)
+    return encoded
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider (jsonify) with encoding time added to the request metrics"""
+
+    def dumps(self, obj, **kwargs):
+        started = time.perf_counter()
+        encoded = super().dumps(obj, **kwargs)
+        add_serialization_time(time.perf_counter() - started)
+        return encoded
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+_statement_observers = []
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - conn.info['query_started'].pop()
+    state = current_request_metrics()
+    if state is not None:
+        state.db_statements += 1
+        state.db_seconds += seconds
+    for observer in _statement_observers:
+        observer(statement, parameters, seconds, executemany)
+
+
+def _handle_error(context):
+    # after_cursor_execute does not run for a failed statement
+    started = context.connection.info.get('query_started') if context.connection is not None else None
+    if started:
+        started.pop()
+
+
+_engine_events_registered = False
+
+
+def _register_engine_events():
+    """Time every statement of every engine; metrics ignore statements outside a request"""
+    global _engine_events_registered
+    if not _engine_events_registered:
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+        _engine_events_registered = True
+
+
+def add_statement_observer(observer):
+    """Call observer(statement, parameters, seconds, executemany) after every SQL statement"""
+    _register_engine_events()
+    if observer not in _statement_observers:
+        _statement_observers.append(observer)
+
+
+def _observed_body(body, on_finish):
+    """Pass a streamed body through, reporting its size once it is exhausted or closed"""
+    size = 0
+    try:
+        for chunk in body:
+            size += len(chunk) if isinstance(chunk, bytes) else len(chunk.encode('utf-8'))
+            yield chunk
+    finally:
+        on_finish(size)
+
+
+def get_metrics_registry(app=None):
+    app = app or current_app
+    return app.extensions.setdefault('metrics', MetricsRegistry())
+
+
+def init_metrics(app):
+    """Instrument every request of app and serve the results on GET /metrics"""
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+    registry = get_metrics_registry(app)
+    app.json = TimedJSONProvider(app)
+    _register_engine_events()
+
+    @app.before_request
+    def start_request_metrics():
+        g.request_metrics = RequestMetrics()
+
+    @app.after_request
+    def record_request_metrics(response):
+        state = g.get('request_metrics')
+        if state is None:
+            return response
+        endpoint = request.endpoint or 'unmatched'
+        method, status = request.method, response.status_code
+
+        if response.is_streamed:
+            # the body is produced after this hook returns: record once it has been sent
+            response.response = _observed_body(
+                response.response, lambda size: registry.observe_request(endpoint, method, status, state, size))
+        else:
+            registry.observe_request(endpoint, method, status, state, response.calculate_content_length() or 0)
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,380 @@
+from collections import namedtuple
+import click
+from sqlalchemy import MetaData, Table, and_, bindparam, delete, func, inspect, insert, or_, select, text, update
+from flask.cli import with_appcontext
+from extensions import db
+from models import IngestCheckpoint, RestaurantScore, RestaurantSummary, Review, SchemaMigration
+from pa_api.search_index import SEARCHED_COLUMNS, MysqlFulltextSearchBackend, build_search_index
+
+Migration = namedtuple('Migration', ['version', 'description', 'steps'])
+
+
+class DeleteUnkeyedRows:
+    """Before AddPrimaryKey: delete rows with a NULL key column and merge rows sharing a key, as CTAS tables hold"""
+
+    def __init__(self, table, columns):
+        self.table = table
+        self.columns = columns
+
+    def __str__(self):
+        return f"rows with a NULL or repeated {self.table}({', '.join(self.columns)}) removed"
+
+    def apply(self, connection):
+        table = Table(self.table, MetaData(), autoload_with=connection)
+        keys = [table.c[name] for name in self.columns]
+        others = [column for column in table.columns if column.name not in self.columns]
+        deleted = connection.execute(delete(table).where(or_(*(key.is_(None) for key in keys)))).rowcount
+        repeated = connection.execute(select(*keys).group_by(*keys).having(func.count() > 1)).all()
+        for values in repeated:
+            # one row per key, each column's largest value, as the makeratings GROUP BY picked them
+            match = and_(*(key == value for key, value in zip(keys, values)))
+            merged = connection.execute(select(*keys, *(func.max(column).label(column.name) for column in others))
+                                        .where(match).group_by(*keys)).mappings().one()
+            connection.execute(delete(table).where(match))
+            connection.execute(insert(table).values(dict(merged)))
+        return bool(deleted or repeated)
+
+
+class AddPrimaryKey:
+    """Give a table built with CREATE TABLE ... AS SELECT its primary key, unless it already has one"""
+
+    def __init__(self, table, columns):
+        self.table = table
+        self.columns = columns
+
+    def __str__(self):
+        return f"primary key {self.table}({', '.join(self.columns)})"
+
+    def apply(self, connection):
+        inspector = inspect(connection)
+        if inspector.get_pk_constraint(self.table).get('constrained_columns'):
+            return False
+        columns = ', '.join(self.columns)
+        if connection.dialect.name == 'sqlite':
+            # SQLite cannot add a primary key to an existing table; a unique
+            # index gives the same uniqueness and key lookups
+            name = f'pk_{self.table}'
+            if name in {index['name'] for index in inspector.get_indexes(self.table)}:
+                return False
+            connection.execute(text(f"CREATE UNIQUE INDEX {name} ON {self.table} ({columns})"))
+        else:
+            connection.execute(text(f"ALTER TABLE {self.table} ADD PRIMARY KEY ({columns})"))
+        return True
+
+
+class AddIndex:
+    """CREATE INDEX, skipped when an index of that name already exists on the table"""
+
+    def __init__(self, name, table, columns, unique=False):
+        self.name = name
+        self.table = table
+        self.columns = columns
+        self.unique = unique
+
+    def __str__(self):
+        return f"{'unique ' if self.unique else ''}index {self.name} on {self.table}({', '.join(self.columns)})"
+
+    def apply(self, connection):
+        if self.name in {index['name'] for index in inspect(connection).get_indexes(self.table)}:
+            return False
+        unique = 'UNIQUE ' if self.unique else ''
+        connection.execute(text(f"CREATE {unique}INDEX {self.name} ON {self.table} ({', '.join(self.columns)})"))
+        return True
+
+
+class AddFulltextIndex:
+    """MySQL FULLTEXT index, unless it exists; other databases keep their search index outside the table"""
+
+    def __init__(self, name, table, columns):
+        self.name = name
+        self.table = table
+        self.columns = columns
+
+    def __str__(self):
+        return f"fulltext index {self.name} on {self.table}({', '.join(self.columns)})"
+
+    def apply(self, connection):
+        if connection.dialect.name != 'mysql':
+            return False
+        if self.name in {index['name'] for index in inspect(connection).get_indexes(self.table)}:
+            return False
+        connection.execute(text(f"ALTER TABLE {self.table} ADD FULLTEXT INDEX {self.name} ({', '.join(self.columns)})"))
+        return True
+
+
+class BuildSearchIndex:
+    """Create and fill the search backend's own index (the SQLite FTS5 table), unless it exists"""
+
+    def __str__(self):
+        return "search index built"
+
+    def apply(self, connection):
+        return build_search_index()
+
+
+class WidenColumn:
+    """Lengthen a VARCHAR column, unless it is already at least that long (SQLite does not enforce lengths)"""
+
+    def __init__(self, table, column, length, nullable=True):
+        self.table = table
+        self.column = column
+        self.length = length
+        self.nullable = nullable
+
+    def __str__(self):
+        return f"column {self.table}.{self.column} VARCHAR({self.length})"
+
+    def apply(self, connection):
+        dialect = connection.dialect.name
+        if dialect == 'sqlite':
+            return False
+        column = next(c for c in inspect(connection).get_columns(self.table) if c['name'] == self.column)
+        if (getattr(column['type'], 'length', None) or 0) >= self.length:
+            return False
+        if dialect == 'mysql':
+            null = '' if self.nullable else ' NOT NULL'
+            connection.execute(text(f"ALTER TABLE {self.table} MODIFY {self.column} VARCHAR({self.length}){null}"))
+        else:
+            connection.execute(text(f"ALTER TABLE {self.table} ALTER COLUMN {self.column} TYPE VARCHAR({self.length})"))
+        return True
+
+
+class AddColumn:
+    """ALTER TABLE ... ADD COLUMN, unless the column exists"""
+
+    def __init__(self, table, column, ddl_type):
+        self.table = table
+        self.column = column
+        self.ddl_type = ddl_type
+
+    def __str__(self):
+        return f"column {self.table}.{self.column} {self.ddl_type}"
+
+    def apply(self, connection):
+        if self.column in {column['name'] for column in inspect(connection).get_columns(self.table)}:
+            return False
+        connection.execute(text(f"ALTER TABLE {self.table} ADD COLUMN {self.column} {self.ddl_type}"))
+        return True
+
+
+class CreateTable:
+    """CREATE TABLE for a model table that is missing"""
+
+    def __init__(self, table):
+        self.table = table
+
+    def __str__(self):
+        return f"table {self.table.name}"
+
+    def apply(self, connection):
+        if inspect(connection).has_table(self.table.name):
+            return False
+        self.table.create(connection)
+        return True
+
+
+class BackfillReviewKeys:
+    """Compute review_key for scraped reviews stored before the column existed"""
+
+    batch_size = 1000
+
+    def __str__(self):
+        return "review_key backfilled"
+
+    def apply(self, connection):
+        table = Review.__table__
+        set_key = update(table).where(table.c.id == bindparam('review_id')).values(review_key=bindparam('key'))
+        changed = False
+        last_id = 0
+        while True:
+            rows = connection.execute(
+                select(table.c.id, table.c.google_maps_id, table.c.provider, table.c.author_name, table.c.review_date)
+                .where(table.c.review_key.is_(None), table.c.id > last_id,
+                       (table.c.provider.is_(None)) | (table.c.provider != 'Bain'))
+                .order_by(table.c.id).limit(self.batch_size)).all()
+            if not rows:
+                return changed
+            connection.execute(set_key, [
+                {'review_id': row.id,
+                 'key': Review.make_review_key(row.google_maps_id, row.provider, row.author_name, row.review_date)}
+                for row in rows
+            ])
+            last_id = rows[-1].id
+            changed = True
+
+
+class BackfillRatingSums:
+    """Rebuild ratings and bain_ratings from reviews when rows lack the ratings_sum the running upserts add onto"""
+
+    def __str__(self):
+        return "ratings and bain_ratings rebuilt with ratings_sum"
+
+    def apply(self, connection):
+        stale = False
+        for table in ('ratings', 'bain_ratings'):
+            stale = stale or connection.execute(text(
+                f"SELECT 1 FROM {table} WHERE ratings_sum IS NULL OR (ratings_sum = 0 AND ratings_count > 0) "
+                "LIMIT 1")).first() is not None
+        if not stale:
+            return False
+        from aggregates import rebuild_ratings
+        rebuild_ratings()
+        return True
+
+
+class DeleteDuplicateReviews:
+    """Keep the first stored copy of every review_key, then rebuild what was counted from the copies"""
+
+    def __str__(self):
+        return "duplicate reviews deleted, ratings and search index rebuilt"
+
+    def apply(self, connection):
+        # the derived table lets MySQL read reviews in a DELETE from reviews
+        result = connection.execute(text(
+            "DELETE FROM reviews WHERE review_key IS NOT NULL AND id NOT IN ("
+            "SELECT id FROM (SELECT MIN(id) AS id FROM reviews WHERE review_key IS NOT NULL GROUP BY review_key) keep)"))
+        if not result.rowcount:
+            return False
+        from aggregates import rebuild_ratings, refresh_restaurant_summary
+        from data_version import bump_data_version
+        from pa_api.search_index import rebuild_search_index
+        rebuild_ratings()
+        if inspect(connection).has_table(RestaurantSummary.__tablename__):
+            refresh_restaurant_summary()
+        if inspect(connection).has_table(RestaurantScore.__tablename__):
+            from rankings import refresh_restaurant_scores
+            refresh_restaurant_scores()
+        rebuild_search_index()
+        bump_data_version()
+        return True
+
+
+class FillRestaurantSummary:
+    """Build restaurant_summary from restaurants and the ratings tables while it is still empty"""
+
+    def __str__(self):
+        return "restaurant_summary filled"
+
+    def apply(self, connection):
+        table = RestaurantSummary.__table__
+        if connection.execute(select(table.c.google_maps_id).limit(1)).first() is not None:
+            return False
+        from aggregates import refresh_restaurant_summary
+        refresh_restaurant_summary()
+        return connection.execute(select(table.c.google_maps_id).limit(1)).first() is not None
+
+
+class FillRestaurantScores:
+    """Compute restaurant_scores from reviews and restaurants while it is still empty"""
+
+    def __str__(self):
+        return "restaurant_scores filled"
+
+    def apply(self, connection):
+        table = RestaurantScore.__table__
+        if connection.execute(select(table.c.google_maps_id).limit(1)).first() is not None:
+            return False
+        from rankings import refresh_restaurant_scores
+        refresh_restaurant_scores()
+        return connection.execute(select(table.c.google_maps_id).limit(1)).first() is not None
+
+
+# Append new migrations at the end with the next version; never edit one that has shipped.
+# Steps are idempotent, so databases created by db.create_all() or a current
+# build_database.sql only get the versions recorded.
+MIGRATIONS = (
+    Migration(1, 'primary keys and running sums on the derived tables', (
+        # the makeratings/makebainratings CTAS tables had count and average only
+        AddColumn('ratings', 'ratings_sum', 'BIGINT NOT NULL DEFAULT 0'),
+        AddColumn('bain_ratings', 'ratings_sum', 'BIGINT NOT NULL DEFAULT 0'),
+        BackfillRatingSums(),
+        DeleteUnkeyedRows('restaurants', ('google_maps_id', 'restaurant_type')),
+        AddPrimaryKey('restaurants', ('google_maps_id', 'restaurant_type')),
+        DeleteUnkeyedRows('ratings', ('google_maps_id',)),
+        AddPrimaryKey('ratings', ('google_maps_id',)),
+        DeleteUnkeyedRows('bain_ratings', ('google_maps_id',)),
+        AddPrimaryKey('bain_ratings', ('google_maps_id',)),
+    )),
+    Migration(2, 'composite indexes for the restaurant/review read paths', (
+        # restaurant_type filter + ORDER BY place_name, google_maps_id (listings, keyset pages, searches)
+        AddIndex('ix_restaurants_type_name', 'restaurants', ('restaurant_type', 'place_name', 'google_maps_id')),
+        # JOIN on google_maps_id, reviews read newest first
+        AddIndex('ix_reviews_place_date', 'reviews', ('google_maps_id', 'review_date')),
+        # provider filter, and the provider EXISTS of the keyset page
+        AddIndex('ix_reviews_provider_place', 'reviews', ('provider', 'google_maps_id')),
+    )),
+    Migration(3, 'review natural keys and ingestion checkpoints', (
+        AddColumn('reviews', 'review_key', 'VARCHAR(40)'),
+        BackfillReviewKeys(),
+        DeleteDuplicateReviews(),
+        AddIndex('ux_reviews_review_key', 'reviews', ('review_key',), unique=True),
+        CreateTable(IngestCheckpoint.__table__),
+    )),
+    Migration(4, 'restaurant_summary read model for the ratings endpoints', (
+        CreateTable(RestaurantSummary.__table__),
+        FillRestaurantSummary(),
+    )),
+    Migration(5, 'restaurant_scores ranking table for /reviews/top', (
+        CreateTable(RestaurantScore.__table__),
+        FillRestaurantScores(),
+    )),
+    Migration(6, 'restaurant_summary indexes for /reviews/top by average, count and Bain average', (
+        AddIndex('ix_restaurant_summary_type_avg', 'restaurant_summary',
+                 ('restaurant_type', 'ratings_avg', 'google_maps_id')),
+        AddIndex('ix_restaurant_summary_type_count', 'restaurant_summary',
+                 ('restaurant_type', 'ratings_count', 'google_maps_id')),
+        AddIndex('ix_restaurant_summary_type_bain_avg', 'restaurant_summary',
+                 ('restaurant_type', 'bain_ratings_avg', 'google_maps_id')),
+    )),
+    Migration(7, 'MySQL FULLTEXT index for scope=all searches', (
+        # a table rebuild on large reviews tables: here rather than in the first search request
+        AddFulltextIndex(MysqlFulltextSearchBackend.index_name, 'reviews', SEARCHED_COLUMNS),
+    )),
+    Migration(8, 'longer ingest_jobs.phase for the per-type phases of pop-restaurant-types', (
+        WidenColumn('ingest_jobs', 'phase', 255),
+    )),
+    Migration(9, 'SQLite FTS5 search table, built here instead of by the first search request', (
+        BuildSearchIndex(),
+    )),
+)
+
+
+def applied_versions():
+    SchemaMigration.__table__.create(db.session.connection(), checkfirst=True)
+    return set(db.session.execute(select(SchemaMigration.version)).scalars())
+
+
+def pending_migrations():
+    applied = applied_versions()
+    return [migration for migration in MIGRATIONS if migration.version not in applied]
+
+
+def apply_migrations():
+    """Apply every pending migration in version order, returning [(migration, [changes made])].
+
+    Each migration is committed together with its schema_migrations row. On
+    MySQL the DDL commits implicitly anyway, which is harmless because every
+    step checks the schema before changing it and can simply be re-run.
+    """
+    applied = []
+    for migration in pending_migrations():
+        connection = db.session.connection()
+        changes = [str(step) for step in migration.steps if step.apply(connection)]
+        db.session.execute(insert(SchemaMigration.__table__).values(
+            version=migration.version, description=migration.description))
+        db.session.commit()
+        applied.append((migration, changes))
+    return applied
+
+
+@click.command('migrate')
+@with_appcontext
+def migrate_command():
+    """Apply pending schema migrations"""
+    applied = apply_migrations()
+    for migration, changes in applied:
+        click.echo(f"{migration.version}: {migration.description}")
+        for change in changes or ['(schema already up to date)']:
+            click.echo(f"    {change}")
+    if not applied:
+        click.echo("No pending migrations")
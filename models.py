@@ -1,9 +1,15 @@
+import hashlib
 from extensions import db
 from datetime import datetime, timezone
 
 class Review(db.Model):
     __tablename__ = 'reviews'
-    __table_args__ = {'extend_existing': True}  # Add this
+    __table_args__ = (
+        db.Index('ix_reviews_place_date', 'google_maps_id', 'review_date'),
+        db.Index('ix_reviews_provider_place', 'provider', 'google_maps_id'),
+        db.Index('ux_reviews_review_key', 'review_key', unique=True),
+        {'extend_existing': True}  # Add this
+    )
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     google_maps_id = db.Column(db.String(128))
@@ -22,12 +28,32 @@ class Review(db.Model):
     ignore_for_rating = db.Column(db.Boolean)
     ignore_for_insufficient = db.Column(db.Boolean)
     selected_as_top_rating = db.Column(db.Boolean)
+    review_key = db.Column(db.String(40))  # natural-key hash of scraped reviews, NULL for Bain reviews
 
     def __repr__(self):
         return f'<Review {self.id}: {self.place_name} - {self.review_rating}/5>'
 
     @classmethod
     def from_apify_data(cls, review_data):
+        return cls(**cls.apify_row(review_data))
+
+    @staticmethod
+    def make_review_key(google_maps_id, provider, author_name, review_date):
+        """SHA-1 of (google_maps_id, provider, author_name, review_date), the identity of a scraped review.
+
+        review_date is taken in UTC to the whole second, so a key computed from
+        an Apify item matches the one backfilled from the stored DATETIME.
+        """
+        if isinstance(review_date, datetime):
+            if review_date.tzinfo is not None:
+                review_date = review_date.astimezone(timezone.utc).replace(tzinfo=None)
+            review_date = review_date.replace(microsecond=0).isoformat()
+        parts = (google_maps_id, provider, author_name, review_date)
+        return hashlib.sha1('\x1f'.join('' if part is None else str(part) for part in parts).encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def apify_row(review_data):
+        """Map one Apify dataset item to a plain column dict for bulk inserts"""
         review_date = review_data.get("reviewDate")
         if isinstance(review_date, str):
             try:
@@ -37,7 +63,7 @@ class Review(db.Model):
         elif not isinstance(review_date, datetime):
             review_date = None
 
-        return cls(
+        return dict(
             google_maps_id=review_data.get("googleMapsPlaceId"),
             place_name=review_data.get("placeName", ""),
             place_url=review_data.get("placeUrl", ""),
@@ -51,12 +77,17 @@ class Review(db.Model):
             ignore_for_quality=False,
             ignore_for_rating=False,
             ignore_for_insufficient=False,
-            selected_as_top_rating=False
+            selected_as_top_rating=False,
+            review_key=Review.make_review_key(review_data.get("googleMapsPlaceId"), review_data.get("provider", ""),
+                                              review_data.get("authorName", ""), review_date)
         )
 
 class Restaurant(db.Model):
     __tablename__ = 'restaurants'
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        db.Index('ix_restaurants_type_name', 'restaurant_type', 'place_name', 'google_maps_id'),
+        {'extend_existing': True}
+    )
 
     google_maps_id = db.Column(db.String(128), primary_key=True)
     place_name = db.Column(db.String(255), nullable=False)
@@ -64,4 +95,141 @@ class Restaurant(db.Model):
     restaurant_type = db.Column(db.String(50), primary_key=True)
 
     def __repr__(self):
-        return f'<Restaurant {self.google_maps_id} {self.restaurant_type}:: {self.place_name} ({self.place_address})>'
\ No newline at end of file
+        return f'<Restaurant {self.google_maps_id} {self.restaurant_type}:: {self.place_name} ({self.place_address})>'
+
+class Rating(db.Model):
+    __tablename__ = 'ratings'
+    __table_args__ = {'extend_existing': True}
+
+    google_maps_id = db.Column(db.String(128), primary_key=True)
+    place_name = db.Column(db.String(255))
+    ratings_count = db.Column(db.BigInteger, nullable=False, default=0)
+    ratings_sum = db.Column(db.BigInteger, nullable=False, default=0)
+    ratings_avg = db.Column(db.Numeric(7, 4))
+
+    def __repr__(self):
+        return f'<Rating {self.google_maps_id}: {self.ratings_avg} ({self.ratings_count})>'
+
+class BainRating(db.Model):
+    __tablename__ = 'bain_ratings'
+    __table_args__ = {'extend_existing': True}
+
+    google_maps_id = db.Column(db.String(128), primary_key=True)
+    place_name = db.Column(db.String(255))
+    ratings_count = db.Column(db.BigInteger, nullable=False, default=0)
+    ratings_sum = db.Column(db.BigInteger, nullable=False, default=0)
+    ratings_avg = db.Column(db.Numeric(7, 4))
+
+    def __repr__(self):
+        return f'<BainRating {self.google_maps_id}: {self.ratings_avg} ({self.ratings_count})>'
+
+class RestaurantSummary(db.Model):
+    """Read model of the ratings endpoints, kept in step with restaurants, ratings and bain_ratings.
+
+    One row per restaurants (google_maps_id, restaurant_type) row, plus one
+    'all' row per place standing for all of its restaurants rows, with both
+    ratings folded in, so a listing is a range scan of the type/name index.
+    """
+    __tablename__ = 'restaurant_summary'
+    __table_args__ = (
+        db.Index('ix_restaurant_summary_type_name', 'restaurant_type', 'place_name', 'google_maps_id'),
+        # /reviews/top by average, count and Bain average: the top of a type is the end of its index range
+        db.Index('ix_restaurant_summary_type_avg', 'restaurant_type', 'ratings_avg', 'google_maps_id'),
+        db.Index('ix_restaurant_summary_type_count', 'restaurant_type', 'ratings_count', 'google_maps_id'),
+        db.Index('ix_restaurant_summary_type_bain_avg', 'restaurant_type', 'bain_ratings_avg', 'google_maps_id'),
+        {'extend_existing': True}
+    )
+
+    google_maps_id = db.Column(db.String(128), primary_key=True)
+    restaurant_type = db.Column(db.String(50), primary_key=True)
+    place_name = db.Column(db.String(255))
+    place_address = db.Column(db.String(255))
+    ratings_count = db.Column(db.BigInteger, nullable=False, default=0)
+    ratings_avg = db.Column(db.Numeric(7, 4))
+    bain_ratings_count = db.Column(db.BigInteger, nullable=False, default=0)
+    bain_ratings_avg = db.Column(db.Numeric(7, 4))
+
+    def __repr__(self):
+        return f'<RestaurantSummary {self.google_maps_id} {self.restaurant_type}: {self.ratings_avg} ({self.ratings_count})>'
+
+class RestaurantScore(db.Model):
+    """Ranking score of a restaurant per restaurant_type, recomputed by rankings.refresh_restaurant_scores.
+
+    The score is the restaurant's weighted average rating shrunk towards the
+    average of all ratings: Bain reviews weigh more and older reviews less, so
+    a handful of reviews cannot outrank hundreds. Rows mirror restaurant_summary
+    (one per restaurants row plus an 'all' row per place), so the top of a type
+    is a backward scan of the type/score index.
+    """
+    __tablename__ = 'restaurant_scores'
+    __table_args__ = (
+        db.Index('ix_restaurant_scores_type_score', 'restaurant_type', 'score', 'google_maps_id'),
+        {'extend_existing': True}
+    )
+
+    google_maps_id = db.Column(db.String(128), primary_key=True)
+    restaurant_type = db.Column(db.String(50), primary_key=True)
+    place_name = db.Column(db.String(255))
+    score = db.Column(db.Float, nullable=False)
+    ratings_count = db.Column(db.BigInteger, nullable=False, default=0)
+    weighted_avg = db.Column(db.Float)
+
+    def __repr__(self):
+        return f'<RestaurantScore {self.google_maps_id} {self.restaurant_type}: {self.score}>'
+
+class DataVersion(db.Model):
+    __tablename__ = 'data_versions'
+    __table_args__ = {'extend_existing': True}
+
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<DataVersion {self.name}: {self.version}>'
+
+class IngestJob(db.Model):
+    __tablename__ = 'ingest_jobs'
+    __table_args__ = {'extend_existing': True}
+
+    id = db.Column(db.String(32), primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    params = db.Column(db.Text)  # JSON encoded job arguments
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    phase = db.Column(db.String(255))  # JobProgress.phase truncates to this length
+    items_fetched = db.Column(db.Integer, default=0)
+    rows_written = db.Column(db.Integer, default=0)
+    message = db.Column(db.Text)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<IngestJob {self.id} {self.kind}: {self.status}/{self.phase}>'
+
+class IngestCheckpoint(db.Model):
+    """How far the ingestion of one dataset for one restaurant_type has been committed"""
+    __tablename__ = 'ingest_checkpoints'
+    __table_args__ = {'extend_existing': True}
+
+    dataset_id = db.Column(db.String(64), primary_key=True)
+    restaurant_type = db.Column(db.String(50), primary_key=True)
+    items_committed = db.Column(db.Integer, nullable=False, default=0)  # dataset offset to resume from
+    rows_written = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc),
+                           onupdate=lambda: datetime.now(timezone.utc))
+    completed_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<IngestCheckpoint {self.dataset_id} {self.restaurant_type}: {self.items_committed}>'
+
+class SchemaMigration(db.Model):
+    __tablename__ = 'schema_migrations'
+    __table_args__ = {'extend_existing': True}
+
+    version = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    description = db.Column(db.String(255), nullable=False)
+    applied_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+    def __repr__(self):
+        return f'<SchemaMigration {self.version}: {self.description}>'
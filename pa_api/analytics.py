@@ -0,0 +1,153 @@
+import time
+from threading import Lock
+from flask import current_app
+from pa_api.review_store import get_review_store
+
+try:
+    import numpy as np
+except ImportError:  # the review store then has array columns, grouped with plain loops below
+    np = None
+
+DAY_SECONDS = 86400
+
+
+def _average(count, total):
+    return round(total / count, 4) if count else None
+
+
+def _group_totals(columns, selection, group_of, groups):
+    """(counts, sums) of ratings per group over the selected reviews; group_of(places, providers) -> group ids"""
+    if columns.numpy:
+        keys = group_of(columns.place[selection].astype(np.int64), columns.provider[selection].astype(np.int64))
+        ratings = columns.rating[selection]
+        counts = np.bincount(keys, minlength=groups)
+        sums = np.bincount(keys, weights=ratings, minlength=groups)
+        return counts.tolist(), [int(total) for total in sums]
+    counts = [0] * groups
+    sums = [0] * groups
+    for position in selection:
+        key = group_of(columns.place[position], columns.provider[position])
+        counts[key] += 1
+        sums[key] += columns.rating[position]
+    return counts, sums
+
+
+def _histograms(columns, selection):
+    """Star counts per place, [place][stars - 1], over the selected rated reviews"""
+    places = len(columns.places)
+    if columns.numpy:
+        keys = columns.place[selection].astype(np.int64) * 5 + columns.rating[selection] - 1
+        return np.bincount(keys, minlength=places * 5).reshape(places, 5).tolist()
+    histograms = [[0] * 5 for _ in range(places)]
+    for position in selection:
+        histograms[columns.place[position]][columns.rating[position] - 1] += 1
+    return histograms
+
+
+def compute_place_analytics(columns, today, windows):
+    """Rating analytics of every place at once, as a list indexed by place code.
+
+    Each entry has the star histogram with count and average, the count and
+    average of the reviews dated in each trailing window of `windows` days up
+    to `today` (UTC epoch seconds at the start of the day), and count and
+    average per provider. Every figure is one grouped bincount over all
+    places, not a query per place.
+    """
+    places = len(columns.places)
+    providers = len(columns.providers)
+    histograms = _histograms(columns, columns.select(rated=True))
+    by_window = {
+        days: _group_totals(columns, columns.select(rated=True, since=today - days * DAY_SECONDS),
+                            lambda place, provider: place, places)
+        for days in windows
+    }
+    provider_counts, provider_sums = _group_totals(columns, columns.select(rated=True),
+                                                   lambda place, provider: place * providers + provider,
+                                                   places * providers)
+
+    results = []
+    for code in range(places):
+        histogram = histograms[code]
+        count = sum(histogram)
+        total = sum(stars * number for stars, number in enumerate(histogram, 1))
+        split = {}
+        for provider in range(providers):
+            key = code * providers + provider
+            if provider_counts[key]:
+                split[columns.providers[provider] or 'unknown'] = {
+                    'count': provider_counts[key],
+                    'average': _average(provider_counts[key], provider_sums[key])
+                }
+        results.append({
+            'google_maps_id': columns.places[code],
+            'place_name': columns.place_names[code],
+            'ratings': {'count': count, 'average': _average(count, total), 'histogram': histogram},
+            'windows': {
+                f'{days}d': {'count': by_window[days][0][code],
+                             'average': _average(by_window[days][0][code], by_window[days][1][code])}
+                for days in windows
+            },
+            'providers': split
+        })
+    return results
+
+
+class PlaceAnalytics:
+    """compute_place_analytics results for the review store's data version and the current UTC day"""
+
+    def __init__(self):
+        self.key = None
+        self.columns = None
+        self.results = None
+        self._lock = Lock()
+        self.computations = 0
+        self.compute_seconds = None
+
+    def current(self):
+        """(ReviewColumns, results by place code), recomputed once per data version and day"""
+        store = get_review_store()
+        columns = store.columns()
+        windows = tuple(current_app.config.get('ANALYTICS_WINDOW_DAYS', (90, 365)))
+        today = int(time.time()) // DAY_SECONDS * DAY_SECONDS
+        key = (store.version, today, windows)
+        if self.key != key:
+            with self._lock:
+                if self.key != key:
+                    started = time.perf_counter()
+                    self.results = compute_place_analytics(columns, today, windows)
+                    self.compute_seconds = round(time.perf_counter() - started, 4)
+                    self.computations += 1
+                    self.columns = columns
+                    self.key = key
+        return self.columns, self.results
+
+    def for_place(self, google_maps_id):
+        columns, results = self.current()
+        code = columns.place_code(google_maps_id)
+        return None if code is None else results[code]
+
+    def for_type(self, restaurant_type):
+        """Analytics of the places of a restaurant_type ('all': every place), by place name"""
+        columns, results = self.current()
+        if restaurant_type == 'all':
+            selected = results
+        else:
+            selected = [results[code] for code in columns.type_places.get(restaurant_type, ())]
+        return sorted(selected, key=lambda place: (place['place_name'] or '', place['google_maps_id']))
+
+    def stats(self):
+        return {
+            'version': self.key[0] if self.key else None,
+            'places': len(self.results) if self.results is not None else 0,
+            'computations': self.computations,
+            'compute_seconds': self.compute_seconds
+        }
+
+
+def get_place_analytics(app=None):
+    app = app or current_app
+    analytics = app.extensions.get('place_analytics')
+    if analytics is None:
+        analytics = PlaceAnalytics()
+        app.extensions['place_analytics'] = analytics
+    return analytics
@@ -1,80 +1,97 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, current_app, request, jsonify
+from sqlalchemy import insert
 from sqlalchemy.exc import SQLAlchemyError
 from extensions import db
 from models import Review
+from aggregates import BAIN_PROVIDER, RatingDeltas, refresh_restaurant_summary
+from rankings import refresh_restaurant_scores
+from pa_api.response_cache import invalidate_response_cache
+from data_version import bump_data_version
+from pa_api.search_index import index_new_reviews
 
 capture_review = Blueprint('capture_review', __name__)
 
+SUBMISSION_FIELDS = ('google_maps_id', 'place_name', 'review_title', 'review_text', 'review_rating', 'author_name')
+
+
+def validate_review_submission(values):
+    """Check one submitted review, returning (Bain review row, errors); values maps field names to raw values"""
+    fields = {}
+    for field in SUBMISSION_FIELDS:
+        value = values.get(field)
+        fields[field] = '' if value is None else str(value).strip()
+    google_maps_id = fields['google_maps_id']
+    review_rating = fields['review_rating']
+
+    # Validation
+    errors = []
+
+    # Validate google_maps_id (required)
+    if not google_maps_id:
+        errors.append("google_maps_id is required")
+    elif len(google_maps_id) > 128:
+        errors.append("google_maps_id must be 128 characters or less")
+
+    # Validate review_rating (required for Bain reviews)
+    rating_value = None
+    if not review_rating:
+        errors.append("review_rating is required")
+    else:
+        try:
+            rating_value = int(review_rating)
+            if rating_value < 1 or rating_value > 5:
+                errors.append("review_rating must be between 1 and 5")
+        except ValueError:
+            errors.append("review_rating must be a valid integer")
+
+    if fields['review_title'] and len(fields['review_title']) > 255:
+        errors.append("review_title must be 255 characters or less")
+
+    if fields['author_name'] and len(fields['author_name']) > 128:
+        errors.append("author_name must be 128 characters or less")
+
+    row = {
+        'google_maps_id': google_maps_id,
+        'provider': BAIN_PROVIDER,
+        'place_name': fields['place_name'],
+        'review_title': fields['review_title'] or None,
+        'review_text': fields['review_text'] or None,
+        'review_rating': rating_value,
+        'author_name': fields['author_name'] or None
+    }
+    return row, errors
+
+
+def refresh_after_submission(rows):
+    """Aggregate the submitted rows into ratings, the summary, the scores and the search index, then commit"""
+    rating_deltas = RatingDeltas()
+    for row in rows:
+        rating_deltas.add_row(row)
+    changed = rating_deltas.apply()
+    refresh_restaurant_summary(changed)
+    refresh_restaurant_scores(changed)
+    index_new_reviews()
+    bump_data_version()
+    db.session.commit()
+    invalidate_response_cache()
+
+
 @capture_review.route('/submit-review', methods=['POST'])
 def submit_review():
     try:
-        print("=== SUBMIT REVIEW CALLED ===")
-        print(f"Form data: {request.form}")
-        google_maps_id = request.form.get('google_maps_id', '').strip()
-        print(f"google_maps_id: {google_maps_id}")
-        place_name = request.form.get('place_name', '').strip()
-        print(f"place_name: {place_name}")
-        review_title = request.form.get('review_title', '').strip()
-        print(f"review_title: {review_title}")
-        review_text = request.form.get('review_text', '').strip()
-        print(f"review_text: {review_text}")
-        review_rating = request.form.get('review_rating', '').strip()
-        print(f"review_rating: {review_rating}")
-        author_name = request.form.get('author_name', '').strip()
-        print(f"author_name: {author_name}")
-
-        # Validation
-        errors = []
-
-        # Validate google_maps_id (required)
-        if not google_maps_id:
-            errors.append("google_maps_id is required")
-        elif len(google_maps_id) > 128:
-            errors.append("google_maps_id must be 128 characters or less")
-
-        # Validate review_rating (required for Bain reviews)
-        rating_value = None
-        if not review_rating:
-            errors.append("review_rating is required")
-        else:
-            try:
-                rating_value = int(review_rating)
-                if rating_value < 1 or rating_value > 5:
-                    errors.append("review_rating must be between 1 and 5")
-            except ValueError:
-                errors.append("review_rating must be a valid integer")
-
-        if review_title and len(review_title) > 255:
-            errors.append("review_title must be 255 characters or less")
-
-        if author_name and len(author_name) > 128:
-            errors.append("author_name must be 128 characters or less")
-
+        row, errors = validate_review_submission(request.form)
         if errors:
             return jsonify({
                 'success': False,
                 'errors': errors
             }), 400
 
-        new_review = Review(
-            google_maps_id=google_maps_id,
-            provider='Bain',
-            place_name=place_name,
-            review_title=review_title if review_title else None,
-            review_text=review_text if review_text else None,
-            review_rating=rating_value,
-            author_name=author_name if author_name else None
-        )
+        new_review = Review(**row)
         db.session.add(new_review)
-        db.session.commit()
+        db.session.flush()  # the Core statements below don't autoflush the ORM insert
 
-        try:
-            # run stored procedure to aggregate this new rating with others
-            db.session.execute(db.text(current_app.config['DB_PROCEDURE_BAIN_RATING']))
-            db.session.commit()
-        except Exception as proc_error:
-            # Log the error but don't fail the request since review was saved
-            print(f"Warning: Failed to update bain_ratings: {proc_error}")
+        # aggregate this new rating with the others in the same transaction
+        refresh_after_submission([row])
 
         return jsonify({
             'success': True,
@@ -95,4 +112,80 @@ def submit_review():
         return jsonify({
             'success': False,
             'error': str(e),
-        }), 500
\ No newline at end of file
+        }), 500
+
+
+def insert_submitted_reviews(rows):
+    """Insert the rows in one executemany INSERT, returning their ids where the dialect can report them"""
+    table = Review.__table__
+    dialect = db.session.get_bind().dialect
+    if dialect.insert_executemany_returning_sort_by_parameter_order:
+        statement = insert(table).returning(table.c.id, sort_by_parameter_order=True)
+        return list(db.session.execute(statement, rows).scalars())
+    # MySQL has no RETURNING, and interleaved auto-increment ids need not be consecutive
+    db.session.execute(insert(table), rows)
+    return [None] * len(rows)
+
+
+@capture_review.route('/submit-reviews', methods=['POST'])
+def submit_reviews():
+    """Batch of Bain reviews as JSON, a list or {"reviews": [...]}: all are inserted, or none if any is invalid"""
+    try:
+        payload = request.get_json(silent=True)
+        entries = payload.get('reviews') if isinstance(payload, dict) else payload
+        if not isinstance(entries, list) or not entries:
+            return jsonify({
+                'success': False,
+                'error': 'body must be a non-empty JSON list of reviews, or {"reviews": [...]}'
+            }), 400
+        max_reviews = current_app.config.get('SUBMIT_REVIEWS_MAX_BATCH', 5000)
+        if len(entries) > max_reviews:
+            return jsonify({
+                'success': False,
+                'error': f"at most {max_reviews} reviews per request"
+            }), 400
+
+        rows = []
+        results = []
+        for index, entry in enumerate(entries):
+            if isinstance(entry, dict):
+                row, errors = validate_review_submission(entry)
+            else:
+                row, errors = None, ["review must be a JSON object"]
+            rows.append(row)
+            results.append({'index': index, 'success': not errors, 'errors': errors})
+
+        if any(result['errors'] for result in results):
+            return jsonify({
+                'success': False,
+                'error': 'No reviews were added; fix the reviews with errors and resubmit the batch',
+                'results': [result for result in results if result['errors']]
+            }), 400
+
+        review_ids = insert_submitted_reviews(rows)
+        # one aggregate refresh for the whole batch
+        refresh_after_submission(rows)
+
+        for result, review_id in zip(results, review_ids):
+            del result['errors']
+            result['review_id'] = review_id
+        return jsonify({
+            'success': True,
+            'message': f"{len(rows)} reviews submitted successfully",
+            'results': results
+        }), 201
+
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'error': 'Database error occurred',
+            'details': str(e)
+        }), 500
+
+    except Exception as e:
+        current_app.logger.exception("Batch review submission failed")
+        return jsonify({
+            'success': False,
+            'error': str(e),
+        }), 500
@@ -0,0 +1,45 @@
+import hashlib
+from functools import wraps
+from flask import Response, make_response, request
+from data_version import current_data_version
+from pa_api.response_cache import cache_key
+
+# Content-Encodings a response body may come in (listing snapshots); each gets its own strong ETag
+CONTENT_ENCODINGS = ('gzip', 'br')
+
+
+def response_etag(endpoint, version):
+    """Strong ETag for an endpoint/argument combination at one data version"""
+    digest = hashlib.sha1(repr(cache_key(endpoint)).encode('utf-8')).hexdigest()[:16]
+    return f'{version}-{digest}'
+
+
+def representation_etag(etag, encoding):
+    """Strong ETags must differ per representation, so an encoded body's tag names its encoding"""
+    return etag if encoding in (None, 'identity') else f'{etag}-{encoding}'
+
+
+def conditional_get(f):
+    """ETag support for read endpoints, driven by the review data version.
+
+    A read endpoint's body only depends on its arguments and the data, so the
+    ETag is derived from those without running the query. If-None-Match hits
+    are answered with 304 before the view runs. A compressed body's ETag gets
+    its Content-Encoding appended (representation_etag).
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        etag = response_etag(request.endpoint, current_data_version())
+        for encoding in (None,) + CONTENT_ENCODINGS:
+            if request.if_none_match.contains(representation_etag(etag, encoding)):
+                not_modified = Response(status=304)
+                not_modified.set_etag(representation_etag(etag, encoding))
+                not_modified.headers['Cache-Control'] = 'no-cache'
+                return not_modified
+
+        response = make_response(f(*args, **kwargs))
+        if response.status_code == 200:
+            response.set_etag(representation_etag(etag, response.headers.get('Content-Encoding')))
+            response.headers['Cache-Control'] = 'no-cache'
+        return response
+    return decorated_function
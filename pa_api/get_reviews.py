@@ -1,6 +1,15 @@
-from flask import Blueprint, request, jsonify
-from sqlalchemy import text
+import base64
+import json
+from flask import Blueprint, request, jsonify, current_app
+from sqlalchemy import bindparam, text
 from extensions import db
+from pa_api.response_cache import cached_response, get_response_cache, normalized_restaurant_type
+from pa_api.conditional_get import conditional_get
+from pa_api.listing_snapshots import get_listing_snapshots, listing_snapshot
+from pa_api.review_store import get_review_store
+from pa_api.analytics import get_place_analytics
+from pa_api.streaming import parse_output_format, stream_rows, streamed_response
+from pa_api.search_index import search_review_matches
 
 # Create the blueprint
 review_endpoints= Blueprint('get_reviews', __name__)
@@ -9,76 +18,320 @@ def load_query(filename):
     with open(f'queries/{filename}', 'r') as f:
         return f.read()
 
-# 1. get all restaurants with their reviews
-@review_endpoints.route('/reviews', methods=['GET'])
-@review_endpoints.route('/reviews', methods=['GET'])
-def get_all_reviews():
+# review columns that can be requested with fields=, in response order
+REVIEW_FIELDS = ('id', 'review_title', 'review_text', 'review_date', 'review_rating', 'author_name', 'provider')
+SEARCH_SCOPES = ('name', 'all')
+
+
+def format_review_date(value):
+    """isoformat for DATETIME values; SQLite hands raw-SQL datetimes back as strings"""
+    if value is None or isinstance(value, str):
+        return value
+    return value.isoformat()
+
+
+def review_dict(row, fields=REVIEW_FIELDS):
+    """Build the JSON review object from a result row with the review columns selected by name"""
+    review = {}
+    for field in fields:
+        value = row._mapping[field]
+        review[field] = format_review_date(value) if field == 'review_date' else value
+    return review
+
+
+def parse_fields(value):
+    """fields= projection for review objects; defaults to every review field"""
+    if not value:
+        return REVIEW_FIELDS
+    fields = tuple(field.strip() for field in value.split(',') if field.strip())
+    unknown = [field for field in fields if field not in REVIEW_FIELDS]
+    if unknown:
+        raise ValueError(f"unknown fields: {', '.join(unknown)}; allowed: {', '.join(REVIEW_FIELDS)}")
+    return fields
+
+
+def parse_limit(value, cursor):
+    """Page size for keyset pagination, or None for an unpaginated response"""
+    if value is None:
+        return current_app.config.get('REVIEWS_PAGE_SIZE', 50) if cursor else None
     try:
-        restaurant_type = request.args.get('restaurant_type', 'all')
-        provider = request.args.get('provider', None)
+        limit = int(value)
+    except ValueError:
+        raise ValueError("limit must be a valid integer")
+    max_limit = current_app.config.get('REVIEWS_MAX_PAGE_SIZE', 500)
+    if limit < 1 or limit > max_limit:
+        raise ValueError(f"limit must be between 1 and {max_limit}")
+    return limit
 
-        query = """
-                SELECT r.google_maps_id, 
-                       r.place_name, 
-                       r.place_address, 
-                       rev.id, 
-                       rev.review_title, 
-                       rev.review_text, 
-                       rev.review_date, 
-                       rev.review_rating, 
-                       rev.author_name, 
-                       rev.provider
-                FROM restaurants r
-                         LEFT JOIN reviews rev ON r.google_maps_id = rev.google_maps_id
-                """
 
-        params = {}
-        where_clauses = []
+def encode_cursor(place_name, google_maps_id):
+    return base64.urlsafe_b64encode(json.dumps([place_name, google_maps_id]).encode('utf-8')).decode('ascii')
 
-        # Add restaurant_type filter if not 'all'
-        if restaurant_type != 'all':
-            where_clauses.append("r.restaurant_type = :restaurant_type")
-            params['restaurant_type'] = restaurant_type
 
-        # Add provider filter if specified
+def decode_cursor(cursor):
+    """Opaque next_cursor back to the (place_name, google_maps_id) keyset position"""
+    if not cursor:
+        return None
+    try:
+        place_name, google_maps_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except Exception:
+        raise ValueError("cursor is invalid")
+    return place_name, google_maps_id
+
+
+def review_columns_sql(fields):
+    # rev.id is always read, it tells a real review apart from an empty LEFT JOIN row
+    return ", ".join(f"rev.{field}" for field in ('id',) + tuple(f for f in fields if f != 'id'))
+
+
+def restaurant_reviews_query(restaurant_type, provider, fields):
+    """Every restaurant joined with its reviews, reading only the requested review columns.
+
+    Restaurants come from restaurant_summary, which holds exactly one row per
+    place and type ('all': one per place, whatever its type rows are named),
+    so no place is listed twice.
+    """
+    query = f"""
+            SELECT r.google_maps_id,
+                   r.place_name,
+                   r.place_address,
+                   {review_columns_sql(fields)}
+            FROM restaurant_summary r
+                     LEFT JOIN reviews rev ON r.google_maps_id = rev.google_maps_id
+            WHERE r.restaurant_type = :restaurant_type
+            """
+
+    params = {'restaurant_type': restaurant_type}
+
+    # Add provider filter if specified
+    if provider:
+        query += " AND rev.provider = :provider"
+        params['provider'] = provider
+
+    # google_maps_id keeps each restaurant's rows contiguous for group_restaurant_rows
+    query += " ORDER BY r.place_name, r.google_maps_id, rev.review_date DESC"
+    return text(query), params
+
+
+def group_restaurant_rows(rows, fields=REVIEW_FIELDS):
+    """Fold JOIN rows ordered by restaurant into restaurant objects, yielding each one once it is complete"""
+    restaurant = None
+    for row in rows:
+        if restaurant is None or restaurant['google_maps_id'] != row[0]:
+            if restaurant is not None:
+                yield restaurant
+            restaurant = {
+                'google_maps_id': row[0],
+                'place_name': row[1],
+                'place_address': row[2],
+                'reviews': []
+            }
+
+        if row[3]:  # review id
+            restaurant['reviews'].append(review_dict(row, fields))
+    if restaurant is not None:
+        yield restaurant
+
+
+def fetch_restaurant_review_page(restaurant_type, provider, fields, limit, after):
+    """One keyset page of restaurants ordered by (place_name, google_maps_id), plus their reviews.
+
+    The page of places is selected first with LIMIT, then only those places'
+    reviews are read, so the cost is bounded by the page size. Places come
+    from restaurant_summary, one row per place and type, so the keyset is
+    unique and every place lands on exactly one page.
+    """
+    query = """
+            SELECT r.google_maps_id,
+                   r.place_name,
+                   r.place_address
+            FROM restaurant_summary r
+            WHERE r.restaurant_type = :restaurant_type
+            """
+
+    params = {'restaurant_type': restaurant_type, 'limit': limit + 1}
+    where_clauses = []
+
+    if after:
+        where_clauses.append("(r.place_name > :after_name OR (r.place_name = :after_name AND r.google_maps_id > :after_id))")
+        params['after_name'], params['after_id'] = after
+
+    # same semantics as the unpaginated JOIN: only places that have a review from this provider
+    if provider:
+        where_clauses.append("EXISTS (SELECT 1 FROM reviews rev WHERE rev.google_maps_id = r.google_maps_id AND rev.provider = :provider)")
+        params['provider'] = provider
+
+    if where_clauses:
+        query += " AND " + " AND ".join(where_clauses)
+
+    query += """
+             ORDER BY r.place_name, r.google_maps_id
+             LIMIT :limit
+             """
+
+    places = db.session.execute(text(query), params).fetchall()
+    has_more = len(places) > limit
+    places = places[:limit]
+
+    restaurants = {}
+    for place in places:
+        restaurants[place[0]] = {
+            'google_maps_id': place[0],
+            'place_name': place[1],
+            'place_address': place[2],
+            'reviews': []
+        }
+
+    if restaurants:
+        review_query = f"""
+                SELECT rev.google_maps_id, {review_columns_sql(fields)}
+                FROM reviews rev
+                WHERE rev.google_maps_id IN :google_maps_ids
+                """
+        review_params = {'google_maps_ids': list(restaurants)}
         if provider:
-            where_clauses.append("rev.provider = :provider")
-            params['provider'] = provider
+            review_query += " AND rev.provider = :provider"
+            review_params['provider'] = provider
+        review_query += " ORDER BY rev.google_maps_id, rev.review_date DESC"
+
+        statement = text(review_query).bindparams(bindparam('google_maps_ids', expanding=True))
+        for row in db.session.execute(statement, review_params):
+            restaurants[row[0]]['reviews'].append(review_dict(row, fields))
+
+    next_cursor = encode_cursor(places[-1][1], places[-1][0]) if has_more else None
+    return list(restaurants.values()), next_cursor
+
+
+def parse_search_scope(value):
+    """scope= for the search endpoints: name (LIKE on place_name) or all (ranked full-text search)"""
+    scope = (value or 'name').strip().lower()
+    if scope not in SEARCH_SCOPES:
+        raise ValueError(f"scope must be one of: {', '.join(SEARCH_SCOPES)}")
+    return scope
+
+
+def restaurant_search_scores(matches):
+    """Sum review match scores per restaurant, best restaurant first"""
+    scores = {}
+    for _, google_maps_id, score in matches:
+        scores[google_maps_id] = scores.get(google_maps_id, 0.0) + score
+    return sorted(scores.items(), key=lambda item: -item[1])
+
+
+def ranked_review_search(keyword, restaurant_type, provider):
+    """Full-text matches grouped per restaurant, best restaurant first and its matching reviews best first"""
+    matches = search_review_matches(keyword, restaurant_type, provider)
+    if not matches:
+        return []
+    review_rank = {review_id: position for position, (review_id, _, _) in enumerate(matches)}
+
+    query = """
+            SELECT r.google_maps_id,
+                   r.place_name,
+                   r.place_address,
+                   rev.id,
+                   rev.review_title,
+                   rev.review_text,
+                   rev.review_date,
+                   rev.review_rating,
+                   rev.author_name,
+                   rev.provider
+            FROM restaurants r
+                     JOIN reviews rev ON r.google_maps_id = rev.google_maps_id
+            WHERE r.restaurant_type = :restaurant_type
+              AND rev.id IN :review_ids
+            """
+    statement = text(query).bindparams(bindparam('review_ids', expanding=True))
+    rows = db.session.execute(statement, {'restaurant_type': restaurant_type, 'review_ids': list(review_rank)})
+
+    restaurants = {}
+    for row in sorted(rows, key=lambda row: review_rank[row[3]]):
+        if row[0] not in restaurants:
+            restaurants[row[0]] = {
+                'google_maps_id': row[0],
+                'place_name': row[1],
+                'place_address': row[2],
+                'reviews': []
+            }
+        restaurants[row[0]]['reviews'].append(review_dict(row))
+
+    ranked = []
+    for google_maps_id, score in restaurant_search_scores(matches):
+        if google_maps_id in restaurants:
+            restaurants[google_maps_id]['score'] = round(score, 4)
+            ranked.append(restaurants[google_maps_id])
+    return ranked
+
+
+SUMMARY_COLUMNS_SQL = """google_maps_id, place_name, place_address, ratings_count, ratings_avg,
+                         bain_ratings_count, bain_ratings_avg"""
+
+
+# /reviews/top metric -> restaurant_summary column, each with a (restaurant_type, column, google_maps_id) index
+TOP_SUMMARY_METRICS = {
+    'average': 'ratings_avg',
+    'count': 'ratings_count',
+    'bain_average': 'bain_ratings_avg',
+}
+
+
+def summary_dict(row):
+    """JSON restaurant with both ratings from a restaurant_summary row selected with SUMMARY_COLUMNS_SQL"""
+    return {
+        'google_maps_id': row[0],
+        'place_name': row[1],
+        'place_address': row[2],
+        'all_ratings': {
+            'count': row[3] if row[3] else 0,
+            'average': float(row[4]) if row[4] else None
+        },
+        'bain_ratings': {
+            'count': row[5] if row[5] else 0,
+            'average': float(row[6]) if row[6] else None
+        }
+    }
 
-        # Build WHERE clause if we have any conditions
-        if where_clauses:
-            query += " WHERE " + " AND ".join(where_clauses)
 
-        query += " ORDER BY r.place_name, rev.review_date DESC"
+# 1. get all restaurants with their reviews
+@review_endpoints.route('/reviews', methods=['GET'])
+@review_endpoints.route('/reviews', methods=['GET'])
+@conditional_get
+@listing_snapshot
+@cached_response
+def get_all_reviews():
+    try:
+        restaurant_type = normalized_restaurant_type()
+        provider = request.args.get('provider', None)
 
-        result = db.session.execute(text(query), params)
-        rows = result.fetchall()
+        try:
+            fields = parse_fields(request.args.get('fields'))
+            after = decode_cursor(request.args.get('cursor'))
+            limit = parse_limit(request.args.get('limit'), after)
+            output_format = parse_output_format(request.args.get('format'))
+            if limit is not None and output_format != 'json':
+                raise ValueError("format=ndjson/json-stream returns the full listing and cannot be paginated")
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
 
-        restaurants = {}
-        for row in rows:
-            google_maps_id = row[0]
-            if google_maps_id not in restaurants:
-                restaurants[google_maps_id] = {
-                    'google_maps_id': row[0],
-                    'place_name': row[1],
-                    'place_address': row[2],
-                    'reviews': []
-                }
+        if limit is None:
+            statement, params = restaurant_reviews_query(restaurant_type, provider, fields)
+            if output_format != 'json':
+                return streamed_response(group_restaurant_rows(stream_rows(statement, params), fields), output_format)
 
-            if row[3]:  # review id
-                restaurants[google_maps_id]['reviews'].append({
-                    'id': row[3],
-                    'review_title': row[4],
-                    'review_text': row[5],
-                    'review_date': row[6].isoformat() if row[6] else None,
-                    'review_rating': row[7],
-                    'author_name': row[8],
-                    'provider': row[9]
-                })
+            rows = db.session.execute(statement, params).fetchall()
+            return jsonify({
+                'success': True,
+                'data': list(group_restaurant_rows(rows, fields))
+            }), 200
 
+        restaurants, next_cursor = fetch_restaurant_review_page(restaurant_type, provider, fields, limit, after)
         return jsonify({
             'success': True,
-            'data': list(restaurants.values())
+            'data': restaurants,
+            'next_cursor': next_cursor
         }), 200
 
     except Exception as e:
@@ -89,54 +342,23 @@ def get_all_reviews():
 
 # 2. GET all restaurants with their ratings (including Bain ratings)
 @review_endpoints.route('/ratings', methods=['GET'])
+@conditional_get
+@listing_snapshot
+@cached_response
 def get_all_ratings():
     try:
-        restaurant_type = request.args.get('restaurant_type', 'all')
-
-        query = """
-                SELECT DISTINCT r.google_maps_id,
-                                MAX(r.place_name)    as place_name,
-                                MAX(r.place_address) as place_address,
-                                rat.ratings_count,
-                                rat.ratings_avg,
-                                brat.ratings_count   as bain_ratings_count,
-                                brat.ratings_avg     as bain_ratings_avg
-                FROM restaurants r
-                         LEFT JOIN ratings rat ON r.google_maps_id = rat.google_maps_id
-                         LEFT JOIN bain_ratings brat ON r.google_maps_id = brat.google_maps_id \
+        restaurant_type = normalized_restaurant_type()
+
+        # restaurant_summary has an 'all' row for every place, so 'all' is a range scan like any type
+        query = f"""
+                SELECT {SUMMARY_COLUMNS_SQL}
+                FROM restaurant_summary
+                WHERE restaurant_type = :restaurant_type
+                ORDER BY place_name, google_maps_id
                 """
 
-        params = {}
-
-        # Only add WHERE clause if not 'all'
-        if restaurant_type != 'all':
-            query += " WHERE r.restaurant_type = :restaurant_type"
-            params['restaurant_type'] = restaurant_type
-
-        query += """
-                    GROUP BY r.google_maps_id, rat.ratings_count, rat.ratings_avg, 
-                             brat.ratings_count, brat.ratings_avg
-                    ORDER BY place_name
-                    """
-
-        result = db.session.execute(text(query), params)
-        rows = result.fetchall()
-
-        restaurants = []
-        for row in rows:
-            restaurants.append({
-                'google_maps_id': row[0],
-                'place_name': row[1],
-                'place_address': row[2],
-                'all_ratings': {
-                    'count': row[3] if row[3] else 0,
-                    'average': float(row[4]) if row[4] else None
-                },
-                'bain_ratings': {
-                    'count': row[5] if row[5] else 0,
-                    'average': float(row[6]) if row[6] else None
-                }
-            })
+        rows = db.session.execute(text(query), {'restaurant_type': restaurant_type}).fetchall()
+        restaurants = [summary_dict(row) for row in rows]
 
         return jsonify({
             'success': True,
@@ -152,6 +374,8 @@ def get_all_ratings():
 
 # 3. GET one restaurant with its reviews
 @review_endpoints.route('/reviews/<google_maps_id>', methods=['GET'])
+@conditional_get
+@cached_response
 def get_restaurant_reviews(google_maps_id):
     try:
         provider = request.args.get('provider', None)
@@ -201,15 +425,7 @@ def get_restaurant_reviews(google_maps_id):
 
         for row in rows:
             if row[3]:  # review id exists
-                restaurant['reviews'].append({
-                    'id': row[3],
-                    'review_title': row[4],
-                    'review_text': row[5],
-                    'review_date': row[6].isoformat() if row[6] else None,
-                    'review_rating': row[7],
-                    'author_name': row[8],
-                    'provider': row[9]
-                })
+                restaurant['reviews'].append(review_dict(row))
 
         return jsonify({
             'success': True,
@@ -224,24 +440,18 @@ def get_restaurant_reviews(google_maps_id):
 
 # 4. GET one restaurant with its ratings (including Bain ratings)
 @review_endpoints.route('/ratings/<google_maps_id>', methods=['GET'])
+@conditional_get
+@cached_response
 def get_restaurant_ratings(google_maps_id):
     try:
-        query = """
-                SELECT r.google_maps_id, \
-                       r.place_name, \
-                       r.place_address, \
-                       rat.ratings_count, \
-                       rat.ratings_avg, \
-                       brat.ratings_count as bain_ratings_count, \
-                       brat.ratings_avg   as bain_ratings_avg
-                FROM restaurants r
-                         LEFT JOIN ratings rat ON r.google_maps_id = rat.google_maps_id
-                         LEFT JOIN bain_ratings brat ON r.google_maps_id = brat.google_maps_id
-                WHERE r.google_maps_id = :google_maps_id \
+        query = f"""
+                SELECT {SUMMARY_COLUMNS_SQL}
+                FROM restaurant_summary
+                WHERE google_maps_id = :google_maps_id
+                  AND restaurant_type = 'all'
                 """
 
-        result = db.session.execute(text(query), {'google_maps_id': google_maps_id})
-        row = result.fetchone()
+        row = db.session.execute(text(query), {'google_maps_id': google_maps_id}).fetchone()
 
         if not row:
             return jsonify({
@@ -249,19 +459,7 @@ def get_restaurant_ratings(google_maps_id):
                 'error': 'Restaurant not found'
             }), 404
 
-        restaurant = {
-            'google_maps_id': row[0],
-            'place_name': row[1],
-            'place_address': row[2],
-            'all_ratings': {
-                'count': row[3] if row[3] else 0,
-                'average': float(row[4]) if row[4] else None
-            },
-            'bain_ratings': {
-                'count': row[5] if row[5] else 0,
-                'average': float(row[6]) if row[6] else None
-            }
-        }
+        restaurant = summary_dict(row)
 
         return jsonify({
             'success': True,
@@ -276,10 +474,12 @@ def get_restaurant_ratings(google_maps_id):
 
 # 5. Search restaurants and reviews by place_name keyword
 @review_endpoints.route('/search_reviews', methods=['GET'])
+@conditional_get
+@cached_response
 def search_reviews():
     try:
         keyword = request.args.get('keyword', '').strip()
-        restaurant_type = request.args.get('restaurant_type', 'all')
+        restaurant_type = normalized_restaurant_type()
         provider = request.args.get('provider', None)
 
         if not keyword:
@@ -288,6 +488,25 @@ def search_reviews():
                 'error': 'keyword parameter is required'
             }), 400
 
+        try:
+            output_format = parse_output_format(request.args.get('format'))
+            scope = parse_search_scope(request.args.get('scope'))
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+
+        if scope == 'all':
+            restaurants = ranked_review_search(keyword, restaurant_type, provider)
+            if output_format != 'json':
+                return streamed_response(iter(restaurants), output_format, count_key='count')
+            return jsonify({
+                'success': True,
+                'count': len(restaurants),
+                'data': restaurants
+            }), 200
+
         # Build query with LIKE for partial matching
         query = """
                 SELECT r.google_maps_id, \
@@ -315,39 +534,20 @@ def search_reviews():
             query += " AND rev.provider = :provider"
             params['provider'] = provider
 
-        query += " ORDER BY r.place_name, rev.review_date DESC"
-        print("QUERY REVIEWS: " + query)
-        result = db.session.execute(text(query), params)
-        rows = result.fetchall()
+        query += " ORDER BY r.place_name, r.google_maps_id, rev.review_date DESC"
 
         # Group reviews by restaurant
-        restaurants = {}
-        for row in rows:
-            google_maps_id = row[0]
-            if google_maps_id not in restaurants:
-                restaurants[google_maps_id] = {
-                    'google_maps_id': row[0],
-                    'place_name': row[1],
-                    'place_address': row[2],
-                    'reviews': []
-                }
+        if output_format != 'json':
+            return streamed_response(group_restaurant_rows(stream_rows(text(query), params)), output_format,
+                                     count_key='count')
 
-            # Add review if it exists
-            if row[3]:  # review id
-                restaurants[google_maps_id]['reviews'].append({
-                    'id': row[3],
-                    'review_title': row[4],
-                    'review_text': row[5],
-                    'review_date': row[6].isoformat() if row[6] else None,
-                    'review_rating': row[7],
-                    'author_name': row[8],
-                    'provider': row[9]
-                })
+        result = db.session.execute(text(query), params)
+        restaurants = list(group_restaurant_rows(result.fetchall()))
 
         return jsonify({
             'success': True,
             'count': len(restaurants),
-            'data': list(restaurants.values())
+            'data': restaurants
         }), 200
 
     except Exception as e:
@@ -358,10 +558,12 @@ def search_reviews():
 
 # 6. Search restaurants and ratings by place_name keyword
 @review_endpoints.route('/search_ratings', methods=['GET'])
+@conditional_get
+@cached_response
 def search_ratings():
     try:
         keyword = request.args.get('keyword', '').strip()
-        restaurant_type = request.args.get('restaurant_type', 'all')
+        restaurant_type = normalized_restaurant_type()
 
         if not keyword:
             return jsonify({
@@ -369,46 +571,53 @@ def search_ratings():
                 'error': 'keyword parameter is required'
             }), 400
 
-        query = """
-                SELECT r.google_maps_id, \
-                       r.place_name, \
-                       r.place_address, \
-                       rat.ratings_count, \
-                       rat.ratings_avg, \
-                       brat.ratings_count as bain_ratings_count, \
-                       brat.ratings_avg   as bain_ratings_avg
-                FROM restaurants r
-                         LEFT JOIN ratings rat ON r.google_maps_id = rat.google_maps_id
-                         LEFT JOIN bain_ratings brat ON r.google_maps_id = brat.google_maps_id
-                WHERE r.restaurant_type = :restaurant_type
-                  AND r.place_name LIKE :keyword
-                ORDER BY r.place_name
+        try:
+            scope = parse_search_scope(request.args.get('scope'))
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+
+        if scope == 'all':
+            scores = restaurant_search_scores(search_review_matches(keyword, restaurant_type))
+            query = f"""
+                    SELECT {SUMMARY_COLUMNS_SQL}
+                    FROM restaurant_summary
+                    WHERE restaurant_type = :restaurant_type
+                      AND google_maps_id IN :google_maps_ids
+                    """
+            params = {
+                'restaurant_type': restaurant_type,
+                'google_maps_ids': [google_maps_id for google_maps_id, _ in scores]
+            }
+            statement = text(query).bindparams(bindparam('google_maps_ids', expanding=True))
+            rows_by_id = {row[0]: row for row in db.session.execute(statement, params)} if scores else {}
+            rows = [rows_by_id[google_maps_id] for google_maps_id, _ in scores if google_maps_id in rows_by_id]
+            score_by_id = dict(scores)
+        else:
+            query = f"""
+                SELECT {SUMMARY_COLUMNS_SQL}
+                FROM restaurant_summary
+                WHERE restaurant_type = :restaurant_type
+                  AND place_name LIKE :keyword
+                ORDER BY place_name, google_maps_id
                 """
 
-        params = {
-            'restaurant_type': restaurant_type,
-            'keyword': f'%{keyword}%'  # Add wildcards for partial matching
-        }
+            params = {
+                'restaurant_type': restaurant_type,
+                'keyword': f'%{keyword}%'  # Add wildcards for partial matching
+            }
 
-        print("QUERY RATINGS: " + query)
-        result = db.session.execute(text(query), params)
-        rows = result.fetchall()
+            result = db.session.execute(text(query), params)
+            rows = result.fetchall()
+            score_by_id = None
 
         restaurants = []
         for row in rows:
-            restaurants.append({
-                'google_maps_id': row[0],
-                'place_name': row[1],
-                'place_address': row[2],
-                'all_ratings': {
-                    'count': row[3] if row[3] else 0,
-                    'average': float(row[4]) if row[4] else None
-                },
-                'bain_ratings': {
-                    'count': row[5] if row[5] else 0,
-                    'average': float(row[6]) if row[6] else None
-                }
-            })
+            restaurants.append(summary_dict(row))
+            if score_by_id is not None:
+                restaurants[-1]['score'] = round(score_by_id[row[0]], 4)
 
         return jsonify({
             'success': True,
@@ -421,3 +630,126 @@ def search_ratings():
             'success': False,
             'error': str(e)
         }), 500
+
+# 7. Best restaurants of a type by ranking score (rankings.py) or a restaurant_summary metric, highest first
+@review_endpoints.route('/top', methods=['GET'])
+@conditional_get
+@cached_response
+def get_top_restaurants():
+    try:
+        restaurant_type = normalized_restaurant_type()
+        metric = request.args.get('metric', 'score').strip() or 'score'
+        if metric != 'score' and metric not in TOP_SUMMARY_METRICS:
+            return jsonify({
+                'success': False,
+                'error': f"metric must be one of: {', '.join(('score',) + tuple(TOP_SUMMARY_METRICS))}"
+            }), 400
+
+        max_limit = current_app.config.get('TOP_MAX_LIMIT', 100)
+        try:
+            limit = int(request.args.get('limit', 10))
+        except ValueError:
+            limit = 0
+        if limit < 1 or limit > max_limit:
+            return jsonify({
+                'success': False,
+                'error': f"limit must be an integer between 1 and {max_limit}"
+            }), 400
+
+        params = {'restaurant_type': restaurant_type, 'limit': limit}
+        if metric != 'score':
+            # ix_restaurant_summary_type_<metric> read backwards from the end of the type's range, :limit rows;
+            # > 0 leaves out unrated places (NULL averages, zero counts)
+            column = TOP_SUMMARY_METRICS[metric]
+            query = f"""
+                    SELECT {SUMMARY_COLUMNS_SQL}
+                    FROM restaurant_summary
+                    WHERE restaurant_type = :restaurant_type
+                      AND {column} > 0
+                    ORDER BY {column} DESC, google_maps_id DESC
+                    LIMIT :limit
+                    """
+            rows = db.session.execute(text(query), params).fetchall()
+            return jsonify({
+                'success': True,
+                'data': [summary_dict(row) for row in rows]
+            }), 200
+
+        # ORDER BY matches ix_restaurant_scores_type_score, read backwards and stopped after :limit rows
+        query = """
+                SELECT google_maps_id, place_name, score, ratings_count, weighted_avg
+                FROM restaurant_scores
+                WHERE restaurant_type = :restaurant_type
+                ORDER BY score DESC, google_maps_id DESC
+                LIMIT :limit
+                """
+        rows = db.session.execute(text(query), params).fetchall()
+
+        return jsonify({
+            'success': True,
+            'data': [
+                {
+                    'google_maps_id': row[0],
+                    'place_name': row[1],
+                    'score': round(float(row[2]), 4),
+                    'ratings_count': row[3],
+                    'weighted_average': round(float(row[4]), 4) if row[4] is not None else None
+                }
+                for row in rows
+            ]
+        }), 200
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+# 8. Rating analytics: histogram, trailing window averages and provider split per restaurant
+@review_endpoints.route('/analytics/<google_maps_id>', methods=['GET'])
+def get_restaurant_analytics(google_maps_id):
+    try:
+        analytics = get_place_analytics().for_place(google_maps_id)
+        if analytics is None:
+            return jsonify({
+                'success': False,
+                'error': 'Restaurant not found'
+            }), 404
+
+        return jsonify({
+            'success': True,
+            'data': analytics
+        }), 200
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@review_endpoints.route('/analytics', methods=['GET'])
+def get_all_analytics():
+    try:
+        restaurant_type = normalized_restaurant_type()
+        return jsonify({
+            'success': True,
+            'data': get_place_analytics().for_type(restaurant_type)
+        }), 200
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+# 9. Response cache, listing snapshot, review store and analytics counters
+@review_endpoints.route('/cache-stats', methods=['GET'])
+def cache_stats():
+    stats = get_response_cache().stats()
+    stats['listing_snapshots'] = get_listing_snapshots().stats()
+    stats['review_store'] = get_review_store().stats()
+    stats['analytics'] = get_place_analytics().stats()
+    return jsonify({
+        'success': True,
+        'data': stats
+    }), 200
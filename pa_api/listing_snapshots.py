@@ -0,0 +1,264 @@
+import gzip
+import hashlib
+import inspect
+import mmap
+import os
+import tempfile
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+from threading import Lock
+from flask import Response, current_app, make_response, request, url_for
+from data_version import current_data_version
+from pa_api.response_cache import normalized_restaurant_type
+
+try:
+    import brotli
+except ImportError:  # optional: without it snapshots are offered as gzip and identity only
+    brotli = None
+
+# Content-Encoding -> file suffix, in order of preference
+ENCODINGS = (('br', '.json.br'), ('gzip', '.json.gz'), ('identity', '.json'))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5  # rendered once per data version, but listings can be large
+
+
+def encode_bodies(body):
+    """The identity body plus its precompressed variants, by Content-Encoding"""
+    bodies = {'identity': body, 'gzip': gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)}
+    if brotli is not None:
+        bodies['br'] = brotli.compress(body, quality=BROTLI_QUALITY)
+    return bodies
+
+
+def choose_encoding(bodies):
+    """Best Content-Encoding of the snapshot that the request accepts"""
+    for encoding, _ in ENCODINGS:
+        if encoding in bodies and (encoding == 'identity' or request.accept_encodings[encoding]):
+            return encoding
+    return 'identity'
+
+
+class ListingSnapshots:
+    """Encoded bodies of the full listing endpoints, one snapshot per (endpoint, restaurant_type).
+
+    A snapshot is rendered once per data version by the view itself and kept
+    as JSON bytes plus gzip (and brotli, when installed) variants, so serving
+    it is a dict lookup. At most max_entries snapshots are held, least
+    recently used first out. With a directory, snapshots are also written
+    there as files named after the data version, so the other gunicorn
+    workers load (mmap) the rendered bytes instead of rendering again.
+    """
+
+    def __init__(self, max_entries=64, directory=None):
+        self.max_entries = max_entries
+        self.directory = directory
+        self._entries = OrderedDict()  # (endpoint, restaurant_type) -> (version, bodies)
+        self._lock = Lock()
+        self._render_locks = {}
+        self.hits = 0
+        self.disk_loads = 0
+        self.renders = 0
+        self.evictions = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, version, bodies, rendered=False):
+        with self._lock:
+            if rendered:
+                self.renders += 1
+            self._entries[key] = (version, bodies)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                self._render_locks.pop(evicted, None)
+                self.evictions += 1
+
+    def keys(self):
+        with self._lock:
+            return list(self._entries)
+
+    def render_lock(self, key):
+        """Lock that lets one thread render a snapshot while the others wait for it"""
+        with self._lock:
+            return self._render_locks.setdefault(key, Lock())
+
+    def _file_prefix(self, key):
+        endpoint, restaurant_type = key
+        digest = hashlib.sha1(restaurant_type.encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.directory, f"{endpoint.replace('.', '_')}-{digest}-")
+
+    def load(self, key, version):
+        """Snapshot rendered by any worker for this version, from the snapshot directory"""
+        if not self.directory:
+            return None
+        prefix = self._file_prefix(key)
+        bodies = {}
+        for encoding, suffix in ENCODINGS:
+            try:
+                with open(f"{prefix}{version}{suffix}", 'rb') as f, \
+                        mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    bodies[encoding] = mapped[:]
+            except (FileNotFoundError, ValueError):  # ValueError: empty file, cannot be mapped
+                continue
+        if 'identity' not in bodies:
+            return None
+        with self._lock:
+            self.disk_loads += 1
+        return bodies
+
+    def store(self, key, version, bodies):
+        """Write a rendered snapshot to the snapshot directory and remove older versions of it"""
+        if not self.directory:
+            return
+        prefix = self._file_prefix(key)
+        # identity last: load() treats a snapshot as present once its identity file exists
+        for encoding, suffix in ENCODINGS:
+            if encoding not in bodies:
+                continue
+            fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix='.snapshot-')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(bodies[encoding])
+            os.replace(temp_path, f"{prefix}{version}{suffix}")
+        current = f"{os.path.basename(prefix)}{version}."
+        for name in os.listdir(self.directory):
+            if name.startswith(os.path.basename(prefix)) and not name.startswith(current):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    pass  # another worker cleaned it up first
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'disk_loads': self.disk_loads,
+                'renders': self.renders,
+                'evictions': self.evictions,
+                'directory': self.directory,
+                'encodings': [encoding for encoding, _ in ENCODINGS if encoding != 'br' or brotli is not None]
+            }
+
+
+def get_listing_snapshots(app=None):
+    app = app or current_app
+    snapshots = app.extensions.get('listing_snapshots')
+    if snapshots is None:
+        snapshots = ListingSnapshots(
+            max_entries=app.config.get('LISTING_SNAPSHOT_MAX_ENTRIES', 64),
+            directory=app.config.get('LISTING_SNAPSHOT_DIR')
+        )
+        app.extensions['listing_snapshots'] = snapshots
+    return snapshots
+
+
+def snapshot_response(bodies):
+    encoding = choose_encoding(bodies)
+    response = Response(bodies[encoding], status=200, mimetype='application/json')
+    if encoding != 'identity':
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def current_snapshot(snapshots, key, version, render):
+    """(bodies, None) of the snapshot at version, loaded or rendered once with render();
+    (None, response) when the rendered response cannot be held (an error or a streamed body)"""
+    bodies = snapshots.get(key, version)
+    if bodies is not None:
+        return bodies, None
+    with snapshots.render_lock(key):
+        bodies = snapshots.get(key, version)
+        if bodies is None:
+            bodies = snapshots.load(key, version)
+            if bodies is None:
+                response = make_response(render())
+                if response.status_code != 200 or response.is_streamed:
+                    return None, response
+                bodies = encode_bodies(response.get_data())
+                snapshots.store(key, version, bodies)
+                snapshots.set(key, version, bodies, rendered=True)
+            else:
+                snapshots.set(key, version, bodies)
+    return bodies, None
+
+
+def listing_snapshot(f):
+    """Serve the plain full listing (no query args but restaurant_type) from a pre-encoded snapshot.
+
+    Put it above cached_response: the first request of a data version renders
+    the snapshot through the view, every later one is answered with the stored
+    bytes in the best encoding the client accepts.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not current_app.config.get('LISTING_SNAPSHOTS_ENABLED', True) or set(request.args) - {'restaurant_type'}:
+            return f(*args, **kwargs)
+
+        key = (request.endpoint, normalized_restaurant_type())
+        bodies, response = current_snapshot(get_listing_snapshots(), key, current_data_version(),
+                                            lambda: f(*args, **kwargs))
+        return response if bodies is None else snapshot_response(bodies)
+    return decorated_function
+
+
+_prerender_executor = None
+_prerender_lock = Lock()
+_prerender_pending = set()  # apps with a prerender queued but not started
+
+
+def render_listing_snapshots(app):
+    """Render every held snapshot at the current data version.
+
+    The undecorated view is called in a request context of its own instead of
+    sending a request, so the background renders go through neither the
+    response cache nor the request hooks (metrics, query diagnostics).
+    """
+    with app.app_context():
+        snapshots = get_listing_snapshots(app)
+        for key in snapshots.keys():
+            endpoint, restaurant_type = key
+            view = inspect.unwrap(app.view_functions[endpoint])
+            with app.test_request_context():
+                path = url_for(endpoint, restaurant_type=restaurant_type)
+            with app.test_request_context(path):
+                current_snapshot(snapshots, key, current_data_version(), view)
+
+
+def prerender_listing_snapshots():
+    """Queue a background re-render of the held snapshots after a write; no-op unless LISTING_SNAPSHOT_PRERENDER.
+
+    Call after the commit. Several writes in a row share one re-render, since
+    a queued one has not read the data version yet.
+    """
+    global _prerender_executor
+    app = current_app._get_current_object()
+    if not app.config.get('LISTING_SNAPSHOT_PRERENDER', True) or 'listing_snapshots' not in app.extensions:
+        return
+    with _prerender_lock:
+        if app in _prerender_pending:
+            return
+        _prerender_pending.add(app)
+        if _prerender_executor is None:
+            _prerender_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='listing-snapshot')
+
+    def run():
+        with _prerender_lock:
+            _prerender_pending.discard(app)
+        try:
+            render_listing_snapshots(app)
+        except Exception:
+            app.logger.exception("Listing snapshot prerender failed")
+
+    _prerender_executor.submit(run)
@@ -0,0 +1,148 @@
+import time
+from collections import OrderedDict
+from functools import wraps
+from threading import Lock
+from flask import Response, current_app, make_response, request
+from data_version import current_data_version
+
+# query args that change what the read endpoints return; anything else is ignored
+CACHE_KEY_ARGS = ('restaurant_type', 'provider', 'google_maps_id', 'keyword', 'limit', 'cursor', 'fields', 'format', 'scope',
+                  'metric')
+# how the views read these args; every other arg is keyed on its raw value, exactly as the views use it
+ARG_NORMALIZERS = {
+    'restaurant_type': lambda value: value.strip() or 'all',
+    'metric': lambda value: value.strip() or 'score',
+    'keyword': lambda value: value.strip().lower()  # matching is case-insensitive
+}
+
+
+class ResponseCache:
+    """Size-bounded LRU cache of serialized JSON responses with a TTL.
+
+    Entries are the encoded response bodies, so a hit skips both the query and
+    the serialization. One instance lives on each app (app.extensions) and is
+    emptied by invalidate() from every write path.
+    """
+
+    def __init__(self, max_entries=256, ttl_seconds=300):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires, body, status = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return body, status
+
+    def set(self, key, body, status):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, body, status)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations
+            }
+
+
+def get_response_cache(app=None):
+    app = app or current_app
+    cache = app.extensions.get('response_cache')
+    if cache is None:
+        cache = ResponseCache(
+            max_entries=app.config.get('RESPONSE_CACHE_MAX_ENTRIES', 256),
+            ttl_seconds=app.config.get('RESPONSE_CACHE_TTL_SECONDS', 300)
+        )
+        app.extensions['response_cache'] = cache
+    return cache
+
+
+def invalidate_response_cache():
+    """Drop every cached read response; call after any write to reviews/restaurants/ratings.
+
+    Also queues the re-render of the listing snapshots for the new data version.
+    """
+    get_response_cache().invalidate()
+    from pa_api.listing_snapshots import prerender_listing_snapshots
+    prerender_listing_snapshots()
+
+
+def normalized_restaurant_type():
+    """The restaurant_type query arg as every read view and cache key uses it, blank meaning 'all'"""
+    return ARG_NORMALIZERS['restaurant_type'](request.args.get('restaurant_type', 'all'))
+
+
+def cache_key(endpoint):
+    """Endpoint name plus the query/path args that affect the response.
+
+    Only the args in ARG_NORMALIZERS are normalized, the same way the views
+    normalize them; a key must never merge two requests the views answer
+    differently.
+    """
+    values = dict(request.view_args or {})
+    for name in CACHE_KEY_ARGS:
+        if name in values:
+            continue
+        value = request.args.get(name)
+        if name in ARG_NORMALIZERS:
+            value = ARG_NORMALIZERS[name](value or '')
+        values[name] = value
+    return (endpoint,) + tuple(values.get(name) for name in CACHE_KEY_ARGS)
+
+
+def cached_response(f):
+    """Serve successful JSON responses of a read endpoint from the response cache"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not current_app.config.get('RESPONSE_CACHE_ENABLED', True):
+            return f(*args, **kwargs)
+
+        cache = get_response_cache()
+        # the data version keeps workers whose cache was not invalidated from serving stale bodies
+        key = cache_key(request.endpoint) + (current_data_version(),)
+        cached = cache.get(key)
+        if cached is not None:
+            body, status = cached
+            return Response(body, status=status, mimetype='application/json')
+
+        response = make_response(f(*args, **kwargs))
+        # streamed bodies are never buffered, that would defeat the bounded memory of streaming
+        if response.status_code == 200 and not response.is_streamed:
+            cache.set(key, response.get_data(), response.status_code)
+        return response
+    return decorated_function
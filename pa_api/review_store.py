@@ -0,0 +1,262 @@
+import time
+from array import array
+from threading import Lock
+from flask import current_app
+from sqlalchemy import text
+from extensions import db
+from data_version import current_data_version
+from review_dates import NO_DATE, epoch_seconds
+
+try:
+    import numpy as np
+except ImportError:  # optional: the array module columns answer the same queries, only without vectorization
+    np = None
+
+UNRATED = 0  # rating column value of reviews without a rating
+
+
+class StringTable:
+    """Interned strings: every distinct value is stored once and referenced by its code (position)"""
+
+    def __init__(self):
+        self.values = []
+        self.codes = {}
+
+    def code(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, code):
+        return self.values[code]
+
+
+class ReviewColumns:
+    """Every review with a place as parallel columns, one position per review.
+
+    Numeric columns: review_id, place (code in `places`), rating (1-5, UNRATED
+    for none), date (UTC epoch seconds, NO_DATE for none) and provider (code in
+    `providers`). Place names and restaurant_type memberships are kept per
+    place, not per review. The columns are NumPy arrays when NumPy is
+    installed and use_numpy is set, array module arrays otherwise; the query
+    methods give the same answers either way.
+    """
+
+    def __init__(self, use_numpy=True):
+        self.numpy = use_numpy and np is not None
+        self.places = StringTable()
+        self.place_names = []
+        self.providers = StringTable()
+        self.type_places = {}  # restaurant_type -> set of place codes
+        self.review_id = array('q')
+        self.place = array('l')
+        self.rating = array('b')
+        self.date = array('q')
+        self.provider = array('h')
+        self._type_masks = {}
+
+    def _place_code(self, google_maps_id, place_name):
+        code = self.places.code(google_maps_id)
+        if code == len(self.place_names):
+            self.place_names.append(place_name)
+        return code
+
+    @classmethod
+    def load(cls, use_numpy=True):
+        """Read reviews and restaurants into columns with two streamed queries"""
+        columns = cls(use_numpy)
+        rows = db.session.execute(text("""
+            SELECT id, google_maps_id, place_name, provider, review_rating, review_date
+            FROM reviews
+            WHERE google_maps_id IS NOT NULL
+            ORDER BY google_maps_id, id
+        """).execution_options(yield_per=5000))
+        for row in rows:
+            columns.review_id.append(row[0])
+            columns.place.append(columns._place_code(row[1], row[2]))
+            columns.provider.append(columns.providers.code(row[3] or ''))
+            columns.rating.append(int(row[4]) if row[4] is not None else UNRATED)
+            columns.date.append(epoch_seconds(row[5]))
+
+        for google_maps_id, restaurant_type, place_name in db.session.execute(
+                text("SELECT google_maps_id, restaurant_type, place_name FROM restaurants")):
+            code = columns._place_code(google_maps_id, place_name)
+            columns.type_places.setdefault(restaurant_type, set()).add(code)
+
+        if columns.numpy:
+            for name, dtype in (('review_id', np.int64), ('place', np.int32), ('rating', np.int8),
+                                ('date', np.int64), ('provider', np.int16)):
+                setattr(columns, name, np.array(getattr(columns, name), dtype=dtype))
+        return columns
+
+    def __len__(self):
+        return len(self.review_id)
+
+    def nbytes(self):
+        """Bytes held by the numeric columns"""
+        return sum(column.nbytes if self.numpy else column.itemsize * len(column)
+                   for column in (self.review_id, self.place, self.rating, self.date, self.provider))
+
+    def place_code(self, google_maps_id):
+        return self.places.codes.get(google_maps_id)
+
+    def _type_mask(self, restaurant_type):
+        """Boolean mask over places of one restaurant_type ('all': every place with a restaurants row or review)"""
+        mask = self._type_masks.get(restaurant_type)
+        if mask is None:
+            mask = np.zeros(len(self.places), dtype=bool)
+            if restaurant_type == 'all':
+                mask[:] = True
+            else:
+                mask[list(self.type_places.get(restaurant_type, ()))] = True
+            self._type_masks[restaurant_type] = mask
+        return mask
+
+    def select(self, provider=None, restaurant_type=None, since=None, rated=False, google_maps_id=None):
+        """Positions of the reviews matching every given filter: a boolean mask, or a list without NumPy.
+
+        provider may be one provider name or several; since is UTC epoch
+        seconds (reviews without a date never match it).
+        """
+        providers = None
+        if provider is not None:
+            names = (provider,) if isinstance(provider, str) else provider
+            providers = {self.providers.codes[name] for name in names if name in self.providers.codes}
+        place = None
+        if google_maps_id is not None:
+            place = self.place_code(google_maps_id)
+            if place is None:
+                return np.zeros(len(self), dtype=bool) if self.numpy else []
+
+        if self.numpy:
+            mask = np.ones(len(self), dtype=bool)
+            if providers is not None:
+                mask &= np.isin(self.provider, list(providers))
+            if restaurant_type is not None:
+                mask &= self._type_mask(restaurant_type)[self.place]
+            if since is not None:
+                mask &= self.date >= since
+            if rated:
+                mask &= self.rating != UNRATED
+            if place is not None:
+                mask &= self.place == place
+            return mask
+
+        places = None if restaurant_type is None or restaurant_type == 'all' else \
+            self.type_places.get(restaurant_type, set())
+        return [
+            position for position in range(len(self))
+            if (providers is None or self.provider[position] in providers)
+            and (places is None or self.place[position] in places)
+            and (since is None or self.date[position] >= since)
+            and (not rated or self.rating[position] != UNRATED)
+            and (place is None or self.place[position] == place)
+        ]
+
+    def count(self, **filters):
+        selection = self.select(**filters)
+        return int(selection.sum()) if self.numpy else len(selection)
+
+    def place_totals(self, **filters):
+        """(counts, sums) of ratings per place code, over the rated reviews matching the filters"""
+        selection = self.select(rated=True, **filters)
+        if self.numpy:
+            places = self.place[selection]
+            counts = np.bincount(places, minlength=len(self.places))
+            sums = np.bincount(places, weights=self.rating[selection], minlength=len(self.places))
+            return counts.tolist(), [int(total) for total in sums]
+        counts = [0] * len(self.places)
+        sums = [0] * len(self.places)
+        for position in selection:
+            counts[self.place[position]] += 1
+            sums[self.place[position]] += self.rating[position]
+        return counts, sums
+
+    def place_ratings(self, **filters):
+        """{google_maps_id: {'count', 'average'}} for every place with a matching rated review"""
+        counts, sums = self.place_totals(**filters)
+        return {
+            self.places[code]: {'count': count, 'average': round(sums[code] / count, 4)}
+            for code, count in enumerate(counts) if count
+        }
+
+    def rating_histogram(self, **filters):
+        """Number of matching reviews per star rating, index 0 = 1 star"""
+        selection = self.select(rated=True, **filters)
+        if self.numpy:
+            return np.bincount(self.rating[selection], minlength=6)[1:6].tolist()
+        histogram = [0] * 5
+        for position in selection:
+            histogram[self.rating[position] - 1] += 1
+        return histogram
+
+
+class ReviewStore:
+    """Per-app holder of the ReviewColumns, reloaded when the data version changes.
+
+    Readers call columns() and get the snapshot for the current data version;
+    the first reader after a write reloads it while the others wait, as the
+    in-memory search index does.
+    """
+
+    def __init__(self, use_numpy=True):
+        self.use_numpy = use_numpy
+        self.version = None
+        self._columns = None
+        self._lock = Lock()
+        self.loads = 0
+        self.load_seconds = None
+
+    def columns(self):
+        version = current_data_version()
+        if self.version != version:
+            with self._lock:
+                if self.version != version:
+                    started = time.perf_counter()
+                    self._columns = ReviewColumns.load(self.use_numpy)
+                    self.load_seconds = round(time.perf_counter() - started, 4)
+                    self.loads += 1
+                    self.version = version
+        return self._columns
+
+    def stats(self):
+        columns = self._columns
+        return {
+            'version': self.version,
+            'backend': ('numpy' if columns.numpy else 'array') if columns else None,
+            'reviews': len(columns) if columns else 0,
+            'places': len(columns.places) if columns else 0,
+            'column_bytes': columns.nbytes() if columns else 0,
+            'loads': self.loads,
+            'load_seconds': self.load_seconds
+        }
+
+
+def get_review_store(app=None):
+    app = app or current_app
+    store = app.extensions.get('review_store')
+    if store is None:
+        store = ReviewStore(use_numpy=app.config.get('REVIEW_STORE_BACKEND', 'auto') != 'array')
+        app.extensions['review_store'] = store
+    return store
+
+
+def init_review_store(app):
+    """Load the review store when the app starts if REVIEW_STORE_PRELOAD is set, instead of on first use"""
+    if not app.config.get('REVIEW_STORE_PRELOAD', False):
+        return
+    with app.app_context():
+        try:
+            store = get_review_store(app)
+            store.columns()
+            app.logger.info("Review store loaded: %s", store.stats())
+        except Exception as e:
+            # e.g. a database without its tables yet; the store loads on first use instead
+            app.logger.warning("Review store not preloaded: %s", e)
+        finally:
+            db.session.remove()
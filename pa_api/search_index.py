@@ -0,0 +1,277 @@
+import math
+import re
+from bisect import bisect_left
+from threading import Lock
+from flask import current_app
+from sqlalchemy import bindparam, text
+from extensions import db
+from data_version import current_data_version
+
+TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+SEARCHED_COLUMNS = ('place_name', 'place_address', 'review_title', 'review_text')
+
+
+def tokenize(value):
+    return TOKEN_PATTERN.findall(value.lower()) if value else []
+
+
+def _type_and_provider_filter(restaurant_type, provider, params, review_alias):
+    """SQL conditions restricting matches to a restaurant type (and review provider)"""
+    clauses = [f"EXISTS (SELECT 1 FROM restaurants r WHERE r.google_maps_id = {review_alias}.google_maps_id "
+               f"AND r.restaurant_type = :restaurant_type)"]
+    params['restaurant_type'] = restaurant_type
+    if provider:
+        clauses.append("rev.provider = :provider")
+        params['provider'] = provider
+    return clauses
+
+
+class Fts5SearchBackend:
+    """SQLite FTS5 table review_search, rowid = reviews.id, ranked with bm25"""
+    name = 'sqlite-fts5'
+    ready = False
+
+    def _exists(self):
+        return db.session.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'review_search'")
+        ).first() is not None
+
+    def ensure(self):
+        """Check that the table exists; it is built by `flask --app app migrate` or a write, never in a request"""
+        if not self._exists():
+            raise RuntimeError("FTS5 table review_search is missing, run flask --app app migrate")
+
+    def create(self):
+        """Create and fill review_search unless it exists, in the current transaction; True if it did"""
+        if self._exists():
+            return False
+        db.session.execute(text("""
+            CREATE VIRTUAL TABLE review_search USING fts5(
+                google_maps_id UNINDEXED, place_name, place_address, review_title, review_text,
+                tokenize = 'unicode61 remove_diacritics 2'
+            )
+        """))
+        self._insert_from_reviews()
+        return True
+
+    def _insert_from_reviews(self, where=''):
+        db.session.execute(text(f"""
+            INSERT INTO review_search (rowid, google_maps_id, place_name, place_address, review_title, review_text)
+            SELECT id, google_maps_id, place_name, place_address, review_title, review_text
+            FROM reviews {where}
+        """))
+
+    def rebuild(self):
+        if not self.create():
+            db.session.execute(text("DELETE FROM review_search"))
+            self._insert_from_reviews()
+
+    def index_new(self):
+        if not self.create():
+            self._insert_from_reviews("WHERE id > (SELECT COALESCE(MAX(rowid), 0) FROM review_search)")
+
+    def search(self, terms, restaurant_type, provider, limit):
+        params = {'match': ' '.join(f'"{term}"*' for term in terms), 'limit': limit}
+        clauses = ["review_search MATCH :match"] + _type_and_provider_filter(restaurant_type, provider, params, 's')
+        query = f"""
+            SELECT s.rowid, s.google_maps_id, -bm25(review_search, 0.0, 4.0, 2.0, 1.5, 1.0) AS score
+            FROM review_search s
+                     JOIN reviews rev ON rev.id = s.rowid
+            WHERE {' AND '.join(clauses)}
+            ORDER BY bm25(review_search, 0.0, 4.0, 2.0, 1.5, 1.0)
+            LIMIT :limit
+        """
+        return [(row[0], row[1], float(row[2])) for row in db.session.execute(text(query), params)]
+
+
+class MysqlFulltextSearchBackend:
+    """InnoDB FULLTEXT index over the searched review columns, maintained by MySQL itself"""
+    name = 'mysql-fulltext'
+    index_name = 'ft_reviews_search'
+    ready = False
+
+    def ensure(self):
+        """Check that the index exists; it is created by `flask --app app migrate`, never in a request"""
+        exists = db.session.execute(text("""
+            SELECT 1 FROM information_schema.statistics
+            WHERE table_schema = DATABASE() AND table_name = 'reviews' AND index_name = :index_name
+            LIMIT 1
+        """), {'index_name': self.index_name}).first()
+        if not exists:
+            raise RuntimeError(f"FULLTEXT index {self.index_name} is missing, run flask --app app migrate")
+
+    def create(self):
+        # an ALTER TABLE of its own: migration 7 (AddFulltextIndex)
+        return False
+
+    def rebuild(self):
+        # kept current by InnoDB
+        pass
+
+    def index_new(self):
+        pass
+
+    def search(self, terms, restaurant_type, provider, limit):
+        match = f"MATCH (rev.{', rev.'.join(SEARCHED_COLUMNS)}) AGAINST (:match IN BOOLEAN MODE)"
+        params = {'match': ' '.join(f'+{term}*' for term in terms), 'limit': limit}
+        clauses = [match] + _type_and_provider_filter(restaurant_type, provider, params, 'rev')
+        query = f"""
+            SELECT rev.id, rev.google_maps_id, {match} AS score
+            FROM reviews rev
+            WHERE {' AND '.join(clauses)}
+            ORDER BY score DESC
+            LIMIT :limit
+        """
+        return [(row[0], row[1], float(row[2])) for row in db.session.execute(text(query), params)]
+
+
+class TokenIndexSearchBackend:
+    """In-process inverted index for databases without a native full-text engine.
+
+    Postings map token -> {review_id: weight}, where a hit in the place name
+    weighs more than one in the review text. The index lives on the app and is
+    rebuilt from reviews whenever the data version changes, so every worker
+    keeps its own copy in step with the database.
+    """
+    name = 'memory'
+    ready = True
+    column_weights = {'place_name': 4.0, 'place_address': 2.0, 'review_title': 1.5, 'review_text': 1.0}
+
+    def __init__(self):
+        self.version = None
+        self.postings = {}
+        self.tokens = []
+        self.review_places = {}
+        self._lock = Lock()
+
+    def ensure(self):
+        pass
+
+    def create(self):
+        return False
+
+    def rebuild(self):
+        self.version = None
+
+    def index_new(self):
+        self.version = None
+
+    def _load(self):
+        version = current_data_version()
+        with self._lock:
+            if self.version == version:
+                return
+            postings = {}
+            review_places = {}
+            rows = db.session.execute(text(
+                f"SELECT id, google_maps_id, {', '.join(SEARCHED_COLUMNS)} FROM reviews"
+            ))
+            for row in rows:
+                review_places[row[0]] = row[1]
+                for column, value in zip(SEARCHED_COLUMNS, row[2:]):
+                    weight = self.column_weights[column]
+                    for token in tokenize(value):
+                        entry = postings.setdefault(token, {})
+                        entry[row[0]] = entry.get(row[0], 0.0) + weight
+            self.postings = postings
+            self.tokens = sorted(postings)
+            self.review_places = review_places
+            self.version = version
+
+    def _matches(self, term):
+        """Weights of reviews containing a token that starts with term"""
+        matches = {}
+        position = bisect_left(self.tokens, term)
+        while position < len(self.tokens) and self.tokens[position].startswith(term):
+            for review_id, weight in self.postings[self.tokens[position]].items():
+                matches[review_id] = matches.get(review_id, 0.0) + weight
+            position += 1
+        return matches
+
+    def search(self, terms, restaurant_type, provider, limit):
+        self._load()
+        total = len(self.review_places) or 1
+        scores = None
+        for term in terms:
+            matches = self._matches(term)
+            idf = math.log(1 + total / (1 + len(matches)))
+            term_scores = {review_id: weight * idf for review_id, weight in matches.items()}
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {review_id: score + term_scores[review_id]
+                          for review_id, score in scores.items() if review_id in term_scores}
+        if not scores:
+            return []
+
+        params = {}
+        clauses = ["rev.id IN :review_ids"] + _type_and_provider_filter(restaurant_type, provider, params, 'rev')
+        params['review_ids'] = list(scores)
+        statement = text(f"SELECT rev.id FROM reviews rev WHERE {' AND '.join(clauses)}").bindparams(
+            bindparam('review_ids', expanding=True))
+        allowed = set(db.session.execute(statement, params).scalars())
+
+        ranked = sorted((review_id for review_id in scores if review_id in allowed), key=lambda r: -scores[r])
+        return [(review_id, self.review_places[review_id], scores[review_id]) for review_id in ranked[:limit]]
+
+
+def _fts5_available():
+    try:
+        db.session.execute(text("CREATE VIRTUAL TABLE IF NOT EXISTS temp.fts5_probe USING fts5(x)"))
+        db.session.execute(text("DROP TABLE temp.fts5_probe"))
+        return True
+    except Exception:
+        return False
+
+
+def get_search_backend(app=None):
+    """Search backend for this app: SEARCH_BACKEND, or picked from the database dialect when 'auto'"""
+    app = app or current_app
+    backend = app.extensions.get('search_backend')
+    if backend is not None:
+        return backend
+
+    choice = app.config.get('SEARCH_BACKEND', 'auto')
+    if choice == 'auto':
+        dialect = db.session.get_bind().dialect.name
+        if dialect == 'mysql':
+            choice = 'mysql'
+        elif dialect == 'sqlite' and _fts5_available():
+            choice = 'fts5'
+        else:
+            choice = 'memory'
+
+    backend = {'fts5': Fts5SearchBackend, 'mysql': MysqlFulltextSearchBackend,
+               'memory': TokenIndexSearchBackend}[choice]()
+    app.extensions['search_backend'] = backend
+    return backend
+
+
+def build_search_index():
+    """Create and fill the search index if the backend keeps one of its own and it is missing; True if built"""
+    return get_search_backend().create()
+
+
+def rebuild_search_index():
+    """Re-index every review in the current transaction; used after a reseed"""
+    get_search_backend().rebuild()
+
+
+def index_new_reviews():
+    """Add reviews inserted since the last indexing run, in the current transaction"""
+    get_search_backend().index_new()
+
+
+def search_review_matches(keyword, restaurant_type, provider=None, limit=None):
+    """Ranked (review_id, google_maps_id, score) matches for a keyword, best first"""
+    terms = tokenize(keyword)
+    if not terms:
+        return []
+    limit = limit or current_app.config.get('SEARCH_MAX_RESULTS', 500)
+
+    backend = get_search_backend()
+    if not backend.ready:
+        # first search: check the index exists; it is built by a migration, never by a read request
+        backend.ensure()
+        backend.ready = True
+    return backend.search(terms, restaurant_type, provider, limit)
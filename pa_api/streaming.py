@@ -0,0 +1,61 @@
+import json
+from flask import Response, current_app, stream_with_context
+from extensions import db
+from metrics import timed_dumps
+
+STREAM_FORMATS = ('json', 'ndjson', 'json-stream')
+
+
+def parse_output_format(value):
+    """format= query arg: json (default, one buffered document), ndjson or json-stream"""
+    output_format = (value or 'json').strip().lower()
+    if output_format not in STREAM_FORMATS:
+        raise ValueError(f"format must be one of: {', '.join(STREAM_FORMATS)}")
+    return output_format
+
+
+def stream_rows(statement, params):
+    """Execute a read query on a server-side cursor, fetching STREAM_YIELD_PER rows at a time"""
+    yield_per = current_app.config.get('STREAM_YIELD_PER', 500)
+    return db.session.execute(statement.execution_options(yield_per=yield_per), params)
+
+
+def _ndjson(objects):
+    try:
+        for obj in objects:
+            yield timed_dumps(obj) + '\n'
+    except Exception as e:
+        # headers are already sent, so report the failure as the final line
+        current_app.logger.exception("Streaming error")
+        yield json.dumps({'success': False, 'error': str(e)}) + '\n'
+
+
+def _json_array(objects, count_key):
+    yield '{"success": true, "data": ['
+    count = 0
+    try:
+        for obj in objects:
+            yield (',' if count else '') + timed_dumps(obj)
+            count += 1
+    except Exception as e:
+        # "success": true is already sent; a key may not repeat, so the failure gets keys of its own
+        current_app.logger.exception("Streaming error")
+        yield '], "complete": false, "error": ' + json.dumps(str(e)) + '}'
+        return
+    yield ']' + (f', "{count_key}": {count}' if count_key else '') + '}'
+
+
+def streamed_response(objects, output_format, count_key=None):
+    """Flask generator response writing each object as soon as it is built.
+
+    ndjson writes one object per line. json-stream writes the same document as
+    the buffered endpoint ({"success": true, "data": [...]}) in chunks; a count
+    key, if any, goes after the array since it is only known at the end. A
+    failure after the first chunk ends the document with "complete": false and
+    "error" instead, and an ndjson stream with a {"success": false, "error"} line.
+    """
+    if output_format == 'ndjson':
+        body, mimetype = _ndjson(objects), 'application/x-ndjson'
+    else:
+        body, mimetype = _json_array(objects, count_key), 'application/json'
+    return Response(stream_with_context(body), mimetype=mimetype)
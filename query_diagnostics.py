@@ -0,0 +1,201 @@
+import hashlib
+import re
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from threading import Lock
+from flask import current_app, g, has_app_context, jsonify, request
+from extensions import db
+from metrics import add_statement_observer
+from query_plans import explain
+
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+PLACEHOLDER = re.compile(r'%\(\w+\)s|%s|:\w+|\?')
+VALUE_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)(?:\s*,\s*\(\s*\?(?:\s*,\s*\?)*\s*\))*')
+MAX_SLOW_PER_SCOPE = 20  # slow statements explained per request/job
+
+
+def normalize_statement(statement):
+    """SQL text with literals, bind markers and IN/VALUES lists collapsed, so one query shape maps to one string"""
+    normalized = ' '.join(statement.split()).lower()
+    normalized = STRING_LITERAL.sub('?', normalized)
+    normalized = PLACEHOLDER.sub('?', normalized)
+    normalized = NUMBER_LITERAL.sub('?', normalized)
+    return VALUE_LIST.sub('(...)', normalized)
+
+
+def fingerprint_statement(statement):
+    normalized = normalize_statement(statement)
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:12], normalized
+
+
+class QueryDiagnostics:
+    """Ring buffer of slow-query and repeated-query findings, newest last"""
+
+    def __init__(self, max_events=500):
+        self._events = deque(maxlen=max_events)
+        self._lock = Lock()
+
+    def record(self, kind, scope, fingerprint, statement, **details):
+        finding = dict({
+            'type': kind,
+            'scope': scope,
+            'fingerprint': fingerprint,
+            'statement': statement,
+            'at': datetime.now(timezone.utc).isoformat()
+        }, **details)
+        with self._lock:
+            self._events.append(finding)
+        return finding
+
+    def events(self, kind=None, limit=None):
+        """Findings, newest first, optionally of one type"""
+        with self._lock:
+            events = [finding for finding in reversed(self._events) if kind is None or finding['type'] == kind]
+        return events[:limit] if limit else events
+
+    def clear(self):
+        with self._lock:
+            self._events.clear()
+
+
+def get_query_diagnostics(app=None):
+    app = app or current_app
+    diagnostics = app.extensions.get('query_diagnostics')
+    if diagnostics is None:
+        diagnostics = QueryDiagnostics(app.config.get('QUERY_DIAGNOSTICS_BUFFER_SIZE', 500))
+        app.extensions['query_diagnostics'] = diagnostics
+    return diagnostics
+
+
+class QueryScope:
+    """Statements seen during one request or ingestion job, grouped by fingerprint"""
+
+    def __init__(self, name, slow_seconds):
+        self.name = name
+        self.slow_seconds = slow_seconds
+        self.statements = {}  # fingerprint -> [normalized statement, count, seconds]
+        self.slow = []  # (fingerprint, normalized, statement, parameters, seconds)
+
+    def observe(self, statement, parameters, seconds, executemany):
+        fingerprint, normalized = fingerprint_statement(statement)
+        entry = self.statements.setdefault(fingerprint, [normalized, 0, 0.0])
+        entry[1] += 1
+        entry[2] += seconds
+        if seconds >= self.slow_seconds and len(self.slow) < MAX_SLOW_PER_SCOPE:
+            self.slow.append((fingerprint, normalized, statement, None if executemany else parameters, seconds))
+
+
+def _observe_statement(statement, parameters, seconds, executemany):
+    scope = g.get('query_scope') if has_app_context() else None
+    if scope is not None:
+        scope.observe(statement, parameters, seconds, executemany)
+
+
+def _explain_plan(statement, parameters):
+    """EXPLAIN steps of a slow SELECT, or an error string; read-only, run after the scope ends"""
+    if parameters is None or not statement.lstrip().upper().startswith('SELECT'):
+        return None
+    in_transaction = db.session().in_transaction()
+    try:
+        return explain(statement, parameters)
+    except Exception as e:
+        return f"EXPLAIN failed: {e}"
+    finally:
+        if not in_transaction:
+            db.session.rollback()
+
+
+def begin_query_scope(name):
+    """Start collecting statements for the current request/job, if diagnostics are enabled"""
+    config = current_app.config
+    if config.get('QUERY_DIAGNOSTICS_ENABLED', False):
+        g.query_scope = QueryScope(name, config.get('SLOW_QUERY_SECONDS', 0.5))
+
+
+def end_query_scope():
+    """Record repeated fingerprints (N+1 patterns) and slow statements of the scope that just ended"""
+    scope = g.pop('query_scope', None)
+    if scope is None:
+        return []
+    diagnostics = get_query_diagnostics()
+    limit = current_app.config.get('REPEATED_QUERY_LIMIT', 20)
+    findings = []
+
+    for fingerprint, (normalized, count, seconds) in scope.statements.items():
+        if count > limit:
+            current_app.logger.warning("Repeated query in %s: %dx (%.1f ms total) %s", scope.name, count, seconds * 1000,
+                                       normalized[:200])
+            findings.append(diagnostics.record('repeated_query', scope.name, fingerprint, normalized,
+                                               count=count, seconds=round(seconds, 6)))
+
+    for fingerprint, normalized, statement, parameters, seconds in scope.slow:
+        current_app.logger.warning("Slow query in %s: %.1f ms %s", scope.name, seconds * 1000, normalized[:200])
+        findings.append(diagnostics.record('slow_query', scope.name, fingerprint, normalized,
+                                           seconds=round(seconds, 6), plan=_explain_plan(statement, parameters)))
+    return findings
+
+
+@contextmanager
+def query_scope(name):
+    """Diagnose the statements run inside the block, e.g. one ingestion job"""
+    begin_query_scope(name)
+    try:
+        yield
+    finally:
+        end_query_scope()
+
+
+def init_query_diagnostics(app):
+    """Per-request query scopes plus GET/DELETE /admin/query-diagnostics.
+
+    Collection follows QUERY_DIAGNOSTICS_ENABLED at the start of each request,
+    so it can be switched on in production without a restart of the hooks. The
+    endpoint answers 404 unless QUERY_DIAGNOSTICS_ENDPOINT_ENABLED is set.
+    """
+    add_statement_observer(_observe_statement)
+
+    @app.before_request
+    def start_query_scope():
+        begin_query_scope(f"{request.method} {request.path}")
+
+    @app.teardown_request
+    def finish_query_scope(exc):
+        # teardown runs after a streamed body is exhausted, so its statements are included
+        end_query_scope()
+
+    @app.route('/admin/query-diagnostics', methods=['GET', 'DELETE'])
+    def query_diagnostics():
+        if not current_app.config.get('QUERY_DIAGNOSTICS_ENDPOINT_ENABLED', False):
+            return jsonify({
+                'success': False,
+                'error': "Not found"
+            }), 404
+        diagnostics = get_query_diagnostics()
+        if request.method == 'DELETE':
+            diagnostics.clear()
+            return jsonify({'success': True}), 200
+
+        kind = request.args.get('type')
+        if kind not in (None, 'slow_query', 'repeated_query'):
+            return jsonify({
+                'success': False,
+                'error': "type must be slow_query or repeated_query"
+            }), 400
+        try:
+            limit = int(request.args.get('limit', 100))
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'error': "limit must be a valid integer"
+            }), 400
+
+        config = current_app.config
+        return jsonify({
+            'success': True,
+            'enabled': config.get('QUERY_DIAGNOSTICS_ENABLED', False),
+            'slow_query_seconds': config.get('SLOW_QUERY_SECONDS', 0.5),
+            'repeated_query_limit': config.get('REPEATED_QUERY_LIMIT', 20),
+            'data': diagnostics.events(kind, limit)
+        }), 200
@@ -0,0 +1,146 @@
+import re
+import click
+from contextlib import contextmanager
+from urllib.parse import quote
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import event, text
+from extensions import db
+
+SQLITE_PLAN = re.compile(r'^(SCAN|SEARCH) (\w+)(?: USING (?:COVERING )?INDEX (\w+)| USING (INTEGER PRIMARY KEY))?')
+READ_TABLES = ('restaurants', 'reviews', 'restaurant_summary', 'restaurant_scores')  # the tables the read endpoints must not scan
+POSTGRES_PLAN = re.compile(r'(Seq Scan|Index Scan|Index Only Scan|Bitmap Index Scan) (?:using (\w+) )?on (\w+)')
+
+
+def explain(statement, parameters=()):
+    """Plan of one DBAPI-level statement as [{'table', 'access', 'index', 'full_scan', 'detail'}]"""
+    connection = db.session.connection()
+    dialect = connection.dialect.name
+    prefix = 'EXPLAIN QUERY PLAN ' if dialect == 'sqlite' else 'EXPLAIN '
+    rows = connection.exec_driver_sql(prefix + statement, parameters).mappings().all()
+
+    steps = []
+    if dialect == 'sqlite':
+        for row in rows:
+            match = SQLITE_PLAN.match(row['detail'])
+            if match:
+                access, table, index, rowid = match.groups()
+                steps.append({'table': table, 'access': access, 'index': index or rowid,
+                              'full_scan': access == 'SCAN' and not index, 'detail': row['detail']})
+    elif dialect == 'mysql':
+        for row in rows:
+            steps.append({'table': row['table'], 'access': row['type'], 'index': row['key'],
+                          'full_scan': row['type'] == 'ALL', 'detail': row['Extra']})
+    else:
+        for row in rows:
+            detail = row['QUERY PLAN']
+            match = POSTGRES_PLAN.search(detail)
+            if match:
+                access, index, table = match.groups()
+                steps.append({'table': table, 'access': access, 'index': index,
+                              'full_scan': access == 'Seq Scan', 'detail': detail.strip()})
+    return steps
+
+
+@contextmanager
+def captured_statements():
+    """Record the SELECT statements (with their DBAPI parameters) sent to the database"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+
+
+def sample_endpoint_paths():
+    """Requests that exercise every /reviews read query, built from a restaurant in the database"""
+    row = db.session.execute(text("""
+        SELECT google_maps_id, restaurant_type, place_name, restaurant_type = 'all' AS is_all
+        FROM restaurants
+        ORDER BY is_all, google_maps_id
+        LIMIT 1
+    """)).first()
+    if row is None:
+        return []
+    google_maps_id, restaurant_type, place_name = row[0], quote(row[1]), row[2]
+    keyword = quote((place_name or 'a').split()[0])
+    provider = db.session.execute(text("SELECT provider FROM reviews WHERE google_maps_id = :google_maps_id LIMIT 1"),
+                                  {'google_maps_id': google_maps_id}).scalar()
+    provider = quote(provider or 'Google')
+    return [
+        f'/reviews/reviews?restaurant_type={restaurant_type}',
+        f'/reviews/reviews?restaurant_type={restaurant_type}&provider={provider}',
+        f'/reviews/reviews?restaurant_type={restaurant_type}&provider={provider}&limit=20',
+        f'/reviews/reviews/{quote(google_maps_id)}',
+        f'/reviews/ratings?restaurant_type={restaurant_type}',
+        f'/reviews/ratings/{quote(google_maps_id)}',
+        f'/reviews/search_reviews?keyword={keyword}&restaurant_type={restaurant_type}',
+        f'/reviews/search_ratings?keyword={keyword}&restaurant_type={restaurant_type}',
+        f'/reviews/top?restaurant_type={restaurant_type}&limit=10',
+        f'/reviews/top?restaurant_type={restaurant_type}&metric=average&limit=10',
+        f'/reviews/top?restaurant_type={restaurant_type}&metric=count&limit=10',
+        f'/reviews/top?restaurant_type={restaurant_type}&metric=bain_average&limit=10',
+    ]
+
+
+def endpoint_query_plans(paths=None):
+    """Call each read endpoint and EXPLAIN the queries it runs, as [{'path', 'queries': [{'sql', 'plan'}]}].
+
+    The response cache is switched off for the duration so every request
+    reaches the database.
+    """
+    app = current_app._get_current_object()
+    client = app.test_client()
+    cache_enabled = app.config.get('RESPONSE_CACHE_ENABLED', True)
+    app.config['RESPONSE_CACHE_ENABLED'] = False
+    report = []
+    try:
+        for path in paths or sample_endpoint_paths():
+            with captured_statements() as statements:
+                client.get(path)
+            queries = [
+                {'sql': ' '.join(statement.split()), 'plan': explain(statement, parameters)}
+                for statement, parameters in statements
+                if any(table in statement for table in READ_TABLES)
+            ]
+            report.append({'path': path, 'queries': queries})
+    finally:
+        app.config['RESPONSE_CACHE_ENABLED'] = cache_enabled
+    return report
+
+
+def full_scans(report, tables=READ_TABLES):
+    """(path, sql, table) for every full table scan of the hot tables in an endpoint_query_plans report"""
+    aliases = {'r': 'restaurants', 'rev': 'reviews'}
+    found = []
+    for entry in report:
+        for query in entry['queries']:
+            for step in query['plan']:
+                table = aliases.get(step['table'], step['table'])
+                if step['full_scan'] and table in tables:
+                    found.append((entry['path'], query['sql'], table))
+    return found
+
+
+@click.command('explain-endpoints')
+@with_appcontext
+def explain_endpoints_command():
+    """EXPLAIN the queries behind the /reviews read endpoints and flag full scans"""
+    report = endpoint_query_plans()
+    for entry in report:
+        click.echo(entry['path'])
+        for query in entry['queries']:
+            click.echo(f"  {query['sql'][:120]}")
+            for step in query['plan']:
+                click.echo(f"    {step['table']}: {step['access']} {step['index'] or '-'}")
+    scans = full_scans(report)
+    for path, sql, table in scans:
+        click.echo(f"FULL SCAN of {table} in {path}: {sql[:120]}")
+    if scans:
+        raise SystemExit(1)
@@ -0,0 +1,145 @@
+import time
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import String, delete, func, insert, select, type_coerce
+from extensions import db
+from models import Rating, Restaurant, RestaurantScore, Review
+from aggregates import BAIN_PROVIDER
+from review_dates import NO_DATE, epoch_seconds
+
+SCORE_BATCH_SIZE = 500  # places per DELETE/INSERT of refresh_restaurant_scores
+DAY_SECONDS = 86400
+
+
+class ScoreWeights:
+    """How much each review counts towards a restaurant's score, and how far scores shrink to the prior.
+
+    A review weighs bain_weight if it is a Bain review and 1 otherwise, halved
+    for every half_life_days of age (reviews without a date are not decayed;
+    submitted Bain reviews have none). The score is
+
+        (prior_weight * prior + sum(weight * rating)) / (prior_weight + sum(weight))
+
+    with prior the average of all ratings, so a place needs many recent
+    reviews to move far from the overall average.
+    """
+
+    def __init__(self, bain_weight=2.0, half_life_days=365, prior_weight=10, now=None):
+        self.bain_weight = bain_weight
+        self.half_life = half_life_days * DAY_SECONDS
+        self.prior_weight = prior_weight
+        self.now = int(time.time()) if now is None else now
+
+    @classmethod
+    def from_config(cls):
+        config = current_app.config
+        return cls(config.get('RANKING_BAIN_WEIGHT', 2.0), config.get('RANKING_HALF_LIFE_DAYS', 365),
+                   config.get('RANKING_PRIOR_WEIGHT', 10))
+
+    def weight(self, provider, date):
+        """Weight of one review; date in epoch seconds, NO_DATE for none"""
+        weight = self.bain_weight if provider == BAIN_PROVIDER else 1.0
+        if self.half_life and date != NO_DATE:
+            weight *= 0.5 ** (max(0, self.now - date) / self.half_life)
+        return weight
+
+    def score(self, weighted_count, weighted_sum, prior):
+        if self.prior_weight + weighted_count <= 0:
+            return prior
+        return (self.prior_weight * prior + weighted_sum) / (self.prior_weight + weighted_count)
+
+
+def prior_rating(ratings=None):
+    """Average of every rating, from the per-place totals in ratings"""
+    ratings = Rating.__table__ if ratings is None else ratings
+    count, total = db.session.execute(select(func.sum(ratings.c.ratings_count), func.sum(ratings.c.ratings_sum))).one()
+    return float(total) / float(count) if count else 0.0
+
+
+def _weighted_totals(reviews, weights, google_maps_ids):
+    """{google_maps_id: [ratings, weighted count, weighted sum]} over the rated reviews of the places (None: all)"""
+    # the raw value: SQLite keeps review_date as text that may lack a time part; epoch_seconds reads both
+    query = select(
+        reviews.c.google_maps_id,
+        reviews.c.provider,
+        reviews.c.review_rating,
+        type_coerce(reviews.c.review_date, String)
+    ).where(reviews.c.review_rating.isnot(None), reviews.c.google_maps_id.isnot(None))
+    if google_maps_ids is not None:
+        query = query.where(reviews.c.google_maps_id.in_(google_maps_ids))
+
+    totals = {}
+    for google_maps_id, provider, rating, date in db.session.execute(query.execution_options(yield_per=5000)):
+        weight = weights.weight(provider, epoch_seconds(date))
+        entry = totals.setdefault(google_maps_id, [0, 0.0, 0.0])
+        entry[0] += 1
+        entry[1] += weight
+        entry[2] += weight * int(rating)
+    return totals
+
+
+def _insert_scores(google_maps_ids, reviews, restaurants, scores, weights, prior):
+    totals = _weighted_totals(reviews, weights, google_maps_ids)
+    query = select(restaurants.c.google_maps_id, restaurants.c.restaurant_type, restaurants.c.place_name)
+    if google_maps_ids is not None:
+        query = query.where(restaurants.c.google_maps_id.in_(google_maps_ids))
+
+    rows = {}
+    for google_maps_id, restaurant_type, place_name in db.session.execute(query):
+        count, weighted_count, weighted_sum = totals.get(google_maps_id, (0, 0.0, 0.0))
+        row = {
+            'google_maps_id': google_maps_id,
+            'place_name': place_name,
+            'score': round(weights.score(weighted_count, weighted_sum, prior), 6),
+            'ratings_count': count,
+            'weighted_avg': round(weighted_sum / weighted_count, 4) if weighted_count else None
+        }
+        # like restaurant_summary: the typed row plus one 'all' row per place
+        for key in {restaurant_type, 'all'}:
+            rows.setdefault((google_maps_id, key), dict(row, restaurant_type=key))
+
+    rows = list(rows.values())
+    for start in range(0, len(rows), SCORE_BATCH_SIZE):
+        db.session.execute(insert(scores), rows[start:start + SCORE_BATCH_SIZE])
+
+
+def refresh_restaurant_scores(google_maps_ids=None, reviews=None, restaurants=None, ratings=None, scores=None,
+                              weights=None):
+    """Recompute the restaurant_scores rows of the given places, or of every place, inside the current transaction.
+
+    Call it with the places whose reviews or restaurants rows changed, after
+    ratings is up to date (the prior comes from it). The other places keep the
+    prior and decay of their last refresh until a full one: a reseed, clean-db
+    or `flask --app app refresh-scores` (e.g. nightly). The tables default to
+    the live ones; a reseed passes its shadow copies.
+    """
+    reviews = Review.__table__ if reviews is None else reviews
+    restaurants = Restaurant.__table__ if restaurants is None else restaurants
+    scores = RestaurantScore.__table__ if scores is None else scores
+    weights = weights or ScoreWeights.from_config()
+    prior = prior_rating(ratings)
+
+    if google_maps_ids is None:
+        db.session.execute(delete(scores))
+        _insert_scores(None, reviews, restaurants, scores, weights, prior)
+        return
+
+    google_maps_ids = sorted(google_maps_id for google_maps_id in google_maps_ids if google_maps_id is not None)
+    for start in range(0, len(google_maps_ids), SCORE_BATCH_SIZE):
+        chunk = google_maps_ids[start:start + SCORE_BATCH_SIZE]
+        db.session.execute(delete(scores).where(scores.c.google_maps_id.in_(chunk)))
+        _insert_scores(chunk, reviews, restaurants, scores, weights, prior)
+
+
+@click.command('refresh-scores')
+@with_appcontext
+def refresh_scores_command():
+    """Recompute every restaurant score with the current prior and review ages"""
+    from data_version import bump_data_version
+    from pa_api.response_cache import invalidate_response_cache
+    refresh_restaurant_scores()
+    bump_data_version()
+    db.session.commit()
+    invalidate_response_cache()
+    click.echo("Restaurant scores refreshed")
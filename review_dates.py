@@ -0,0 +1,17 @@
+from datetime import datetime, timezone
+
+NO_DATE = -(2 ** 63)  # epoch seconds of reviews without a date
+
+
+def epoch_seconds(value):
+    """review_date as UTC epoch seconds; SQLite hands raw-SQL datetimes back as strings"""
+    if value is None:
+        return NO_DATE
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return NO_DATE
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp())
@@ -0,0 +1,181 @@
+from sqlalchemy import Index, MetaData, exists, func, insert, inspect, or_, select, text
+from extensions import db
+from models import BainRating, Rating, Restaurant, RestaurantScore, RestaurantSummary, Review
+from aggregates import BAIN_PROVIDER, RatingDeltas, rebuild_all_restaurants, rebuild_ratings, refresh_restaurant_summary
+from rankings import refresh_restaurant_scores
+
+SWAPPED_TABLES = (Review.__table__, Restaurant.__table__, Rating.__table__, BainRating.__table__,
+                  RestaurantSummary.__table__, RestaurantScore.__table__)
+SHADOW_SUFFIX = '_shadow'
+BACKUP_SUFFIX = '_bup'  # the previous generation, as cleardb kept reviews_bup
+
+
+class ShadowReseed:
+    """Builds a new generation of reviews and its derived tables beside the live ones, then swaps it in.
+
+    create() makes empty <table>_shadow copies and carries the Bain reviews and
+    the restaurant_type tags of the type runs over; the caller fills `reviews` (the shadow reviews table); build_derived()
+    computes ratings and the 'all' restaurants from it; catch_up() copies in
+    the reviews and type tags written to the live tables meanwhile; swap()
+    puts the shadows in place of the live tables in one step and keeps the old
+    generation as <table>_bup. Readers see the old dataset until the swap and
+    the new one after it, never a half-built one. Type tags are all kept, also
+    those of places the new seed has no reviews for (cleardb dropped both).
+
+    On MySQL the shadows are CREATE TABLE ... LIKE copies, indexes included,
+    and the swap is a single RENAME TABLE, which is atomic but commits on its
+    own: the new tables are live from then on, whatever the caller does after
+    it, and rows committed to the old ones between the last catch_up() and the
+    RENAME are picked up with catch_up(swapped=True). Elsewhere DDL is
+    transactional, so the renames share one transaction with whatever the
+    caller does before committing; index names are global there, so the
+    shadows carry only a temporary review_key index while loading and the
+    live indexes are recreated under their own names in the swap transaction.
+    """
+
+    def __init__(self):
+        self.mysql = db.session.get_bind().dialect.name == 'mysql'
+        metadata = MetaData()
+        self.shadows = {}
+        for table in SWAPPED_TABLES:
+            shadow = table.to_metadata(metadata, name=table.name + SHADOW_SUFFIX)
+            for index in list(shadow.indexes):
+                shadow.indexes.discard(index)
+            self.shadows[table.name] = shadow
+        self.reviews = self.shadows[Review.__tablename__]
+        # dedup lookups while loading; dropped again at the swap
+        self.review_key_index = Index('ux_reviews_review_key' + SHADOW_SUFFIX, self.reviews.c.review_key, unique=True)
+        self.review_watermark = 0  # highest live review id when create() copied the Bain reviews
+
+    def drop(self):
+        connection = db.session.connection()
+        for shadow in self.shadows.values():
+            connection.execute(text(f"DROP TABLE IF EXISTS {shadow.name}"))
+
+    def create(self):
+        """Empty shadow tables (replacing any left by an aborted reseed), holding the rows a reseed keeps"""
+        self.drop()
+        connection = db.session.connection()
+        live_reviews = Review.__table__
+        self.review_watermark = db.session.execute(select(func.max(live_reviews.c.id))).scalar() or 0
+        for name, shadow in self.shadows.items():
+            if self.mysql:
+                connection.execute(text(f"CREATE TABLE {shadow.name} LIKE {name}"))
+            else:
+                shadow.create(connection)
+
+        kept = ((Review.__table__, Review.__table__.c.provider == BAIN_PROVIDER),
+                (Restaurant.__table__, Restaurant.__table__.c.restaurant_type != 'all'))
+        for live, condition in kept:
+            db.session.execute(insert(self.shadows[live.name]).from_select(
+                [column.name for column in live.columns], select(live).where(condition)))
+
+    def build_derived(self):
+        """ratings, bain_ratings, the 'all' restaurants, restaurant_summary and restaurant_scores of the shadow reviews"""
+        restaurants = self.shadows[Restaurant.__tablename__]
+        ratings = self.shadows[Rating.__tablename__]
+        bain_ratings = self.shadows[BainRating.__tablename__]
+        rebuild_ratings(self.reviews, ratings, bain_ratings)
+        rebuild_all_restaurants(self.reviews, restaurants)
+        refresh_restaurant_summary(None, restaurants, ratings, bain_ratings,
+                                   self.shadows[RestaurantSummary.__tablename__])
+        refresh_restaurant_scores(None, self.reviews, restaurants, ratings,
+                                  self.shadows[RestaurantScore.__tablename__])
+
+    def swap(self):
+        """Replace the live tables with the shadows; the old ones become <table>_bup.
+
+        Cannot be rolled back on MySQL: RENAME TABLE commits the transaction
+        and itself.
+        """
+        connection = db.session.connection()
+        names = [table.name for table in SWAPPED_TABLES]
+        for name in names:
+            connection.execute(text(f"DROP TABLE IF EXISTS {name}{BACKUP_SUFFIX}"))
+
+        if self.mysql:
+            renames = ', '.join(f"{name} TO {name}{BACKUP_SUFFIX}, {name}{SHADOW_SUFFIX} TO {name}" for name in names)
+            connection.execute(text(f"RENAME TABLE {renames}"))
+            return
+
+        for name in names:
+            connection.execute(text(f"ALTER TABLE {name} RENAME TO {name}{BACKUP_SUFFIX}"))
+            for index in inspect(connection).get_indexes(name + BACKUP_SUFFIX):
+                connection.execute(text(f"DROP INDEX {index['name']}"))
+            connection.execute(text(f"ALTER TABLE {name}{SHADOW_SUFFIX} RENAME TO {name}"))
+        connection.execute(text(f"DROP INDEX {self.review_key_index.name}"))
+        for table in SWAPPED_TABLES:
+            for index in table.indexes:
+                index.create(connection)
+
+    def _generation(self, suffix):
+        """{name: Table} of the swapped tables under another name, e.g. the <table>_bup of the old generation"""
+        metadata = MetaData()
+        return {table.name: table.to_metadata(metadata, name=table.name + suffix) for table in SWAPPED_TABLES}
+
+    def catch_up(self, swapped=False):
+        """Copy the reviews and type tags written since create() into the new generation; returns the reviews copied.
+
+        Submissions and pop-restaurant-type runs keep writing to the live
+        tables while the shadows load. Before swap() this copies their rows
+        from the live tables into the shadows. After it (swapped=True) it
+        copies from <table>_bup into the new live tables whatever committed
+        between the last catch-up and the swap, which only happens on MySQL,
+        where RENAME TABLE commits on its own. Every review past the watermark
+        is copied, whatever its provider, unless its review_key is already in
+        the new generation; it gets a new id there. Ratings, summary and scores
+        of the places touched are updated.
+        """
+        live = {table.name: table for table in SWAPPED_TABLES}
+        if swapped:
+            source, target = self._generation(BACKUP_SUFFIX), live
+        else:
+            source, target = live, self.shadows
+        old_reviews, reviews = source[Review.__tablename__], target[Review.__tablename__]
+        old_restaurants, restaurants = source[Restaurant.__tablename__], target[Restaurant.__tablename__]
+        ratings, bain_ratings = target[Rating.__tablename__], target[BainRating.__tablename__]
+
+        columns = [column.name for column in reviews.columns if column.name != 'id']
+        new_reviews = []
+        for row in db.session.execute(
+                select(old_reviews.c.id, *(old_reviews.c[name] for name in columns))
+                .where(old_reviews.c.id > self.review_watermark,
+                       or_(old_reviews.c.review_key.is_(None),
+                           ~exists().where(reviews.c.review_key == old_reviews.c.review_key)))
+                .order_by(old_reviews.c.id)).mappings():
+            self.review_watermark = max(self.review_watermark, row['id'])
+            new_reviews.append({name: row[name] for name in columns})
+
+        new_tags = [dict(row) for row in db.session.execute(select(old_restaurants).where(
+            old_restaurants.c.restaurant_type != 'all',
+            ~exists().where(restaurants.c.google_maps_id == old_restaurants.c.google_maps_id,
+                            restaurants.c.restaurant_type == old_restaurants.c.restaurant_type))).mappings()]
+
+        rating_deltas = RatingDeltas()
+        if new_reviews:
+            db.session.execute(insert(reviews), new_reviews)
+            for row in new_reviews:
+                rating_deltas.add_row(row)
+        if new_tags:
+            db.session.execute(insert(restaurants), new_tags)
+
+        changed = rating_deltas.apply(ratings, bain_ratings) | {row['google_maps_id'] for row in new_tags}
+        if changed:
+            # build_derived() gave every reviewed place an 'all' row; do the same for the places new here
+            has_all = set(db.session.execute(select(restaurants.c.google_maps_id).where(
+                restaurants.c.restaurant_type == 'all', restaurants.c.google_maps_id.in_(sorted(changed)))).scalars())
+            missing = {}
+            for row in new_reviews:
+                if row['google_maps_id'] is not None and row['google_maps_id'] not in has_all:
+                    missing.setdefault(row['google_maps_id'], {
+                        'google_maps_id': row['google_maps_id'],
+                        'place_name': row['place_name'],
+                        'place_address': row['place_address'],
+                        'restaurant_type': 'all'
+                    })
+            if missing:
+                db.session.execute(insert(restaurants), list(missing.values()))
+            refresh_restaurant_summary(changed, restaurants, ratings, bain_ratings,
+                                       target[RestaurantSummary.__tablename__])
+            refresh_restaurant_scores(changed, reviews, restaurants, ratings, target[RestaurantScore.__tablename__])
+        return len(new_reviews)
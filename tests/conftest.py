@@ -24,6 +24,9 @@ def client(app):
 def _insert_test_data():
     """Insert test data into the database."""
     from sqlalchemy import text
+    from aggregates import refresh_restaurant_summary
+    from rankings import refresh_restaurant_scores
+    from pa_api.search_index import build_search_index
 
     # Insert test restaurants
     db.session.execute(text("""
@@ -113,6 +116,7 @@ def _insert_test_data():
                                 255
                             ),
                                 ratings_count BIGINT,
+                                ratings_sum BIGINT,
                                 ratings_avg DECIMAL
                             (
                                 7,
@@ -122,10 +126,10 @@ def _insert_test_data():
                             """))
 
     db.session.execute(text("""
-                            INSERT INTO ratings (google_maps_id, place_name, ratings_count, ratings_avg)
-                            VALUES ('place_1', 'Test Restaurant 1', 2, 4.5000),
-                                   ('place_2', 'Test Restaurant 2', 2, 4.0000),
-                                   ('place_3', 'Test Restaurant 3', 1, 2.0000)
+                            INSERT INTO ratings (google_maps_id, place_name, ratings_count, ratings_sum, ratings_avg)
+                            VALUES ('place_1', 'Test Restaurant 1', 2, 9, 4.5000),
+                                   ('place_2', 'Test Restaurant 2', 2, 8, 4.0000),
+                                   ('place_3', 'Test Restaurant 3', 1, 2, 2.0000)
                             """))
 
     # Insert test bain_ratings
@@ -142,6 +146,7 @@ def _insert_test_data():
                                 255
                             ),
                                 ratings_count BIGINT,
+                                ratings_sum BIGINT,
                                 ratings_avg DECIMAL
                             (
                                 7,
@@ -151,9 +156,14 @@ def _insert_test_data():
                             """))
 
     db.session.execute(text("""
-                            INSERT INTO bain_ratings (google_maps_id, place_name, ratings_count, ratings_avg)
-                            VALUES ('place_1', 'Test Restaurant 1', 1, 4.0000),
-                                   ('place_2', 'Test Restaurant 2', 1, 5.0000)
+                            INSERT INTO bain_ratings (google_maps_id, place_name, ratings_count, ratings_sum, ratings_avg)
+                            VALUES ('place_1', 'Test Restaurant 1', 1, 4, 4.0000),
+                                   ('place_2', 'Test Restaurant 2', 1, 5, 5.0000)
                             """))
 
+    # the ratings endpoints read the restaurant_summary and restaurant_scores built from the rows above
+    refresh_restaurant_summary()
+    refresh_restaurant_scores()
+    build_search_index()  # the FTS5 table `flask --app app migrate` builds
+
     db.session.commit()
\ No newline at end of file
@@ -0,0 +1,84 @@
+import json
+from extensions import db
+from sqlalchemy import select
+from models import Review, Rating, BainRating, Restaurant, RestaurantSummary
+from aggregates import RatingDeltas, rebuild_ratings, refresh_restaurant_summary
+
+
+def test_rating_deltas_update_existing_and_new_places(app):
+    """Deltas add onto existing running totals and create rows for new places."""
+    deltas = RatingDeltas()
+    deltas.add('place_1', 'Test Restaurant 1', 3, 'Google')
+    deltas.add('place_1', 'Test Restaurant 1', 5, 'Bain')
+    deltas.add('place_4', 'Test Restaurant 4', 4, 'Google')
+    deltas.add('place_5', 'Test Restaurant 5', None, 'Google')  # unrated reviews don't count
+
+    assert deltas.apply() == {'place_1', 'place_4'}
+    db.session.commit()
+
+    place_1 = db.session.get(Rating, 'place_1')
+    assert (place_1.ratings_count, place_1.ratings_sum) == (4, 17)
+    assert float(place_1.ratings_avg) == 4.25
+
+    bain_1 = db.session.get(BainRating, 'place_1')
+    assert (bain_1.ratings_count, bain_1.ratings_sum) == (2, 9)
+    assert float(bain_1.ratings_avg) == 4.5
+
+    place_4 = db.session.get(Rating, 'place_4')
+    assert (place_4.ratings_count, float(place_4.ratings_avg)) == (1, 4.0)
+    assert db.session.get(BainRating, 'place_4') is None
+    assert db.session.get(Rating, 'place_5') is None
+
+
+def test_rebuild_ratings_matches_reviews(app):
+    """A full rebuild recomputes both tables from the reviews table."""
+    rebuild_ratings()
+    db.session.commit()
+
+    place_1 = db.session.get(Rating, 'place_1')
+    assert (place_1.ratings_count, place_1.ratings_sum, float(place_1.ratings_avg)) == (2, 9, 4.5)
+    assert BainRating.query.count() == 2
+    assert db.session.get(BainRating, 'place_2').ratings_sum == 5
+
+
+def test_submit_review_updates_ratings_incrementally(client):
+    """A Bain submission is reflected in both rating tables straight away."""
+    response = client.post('/reviews/submit-review', data={
+        'google_maps_id': 'place_3',
+        'place_name': 'Test Restaurant 3',
+        'review_rating': '4',
+        'author_name': 'Test Author'
+    })
+    assert response.status_code == 201
+
+    data = json.loads(client.get('/reviews/ratings/place_3').data)['data']
+    assert data['all_ratings'] == {'count': 2, 'average': 3.0}
+    assert data['bain_ratings'] == {'count': 1, 'average': 4.0}
+
+
+def _summary_rows():
+    table = RestaurantSummary.__table__
+    return db.session.execute(select(table).order_by(table.c.google_maps_id, table.c.restaurant_type)).all()
+
+
+def test_restaurant_summary_refresh_matches_full_rebuild(client):
+    """Refreshing only the changed places leaves the same rows as rebuilding the whole summary."""
+    db.session.add(Restaurant(google_maps_id='place_2', place_name='Test Restaurant 2', restaurant_type='Thai'))
+    db.session.add(Restaurant(google_maps_id='place_4', place_name='Test Restaurant 4', restaurant_type='Thai'))
+    db.session.flush()
+    deltas = RatingDeltas()
+    deltas.add('place_2', 'Test Restaurant 2', 1, 'Bain')
+    refresh_restaurant_summary(deltas.apply() | {'place_4'})
+    db.session.commit()
+    incremental = _summary_rows()
+
+    refresh_restaurant_summary()
+    db.session.commit()
+    assert _summary_rows() == incremental
+
+    thai = json.loads(client.get('/reviews/ratings?restaurant_type=Thai').data)['data']
+    assert [(r['google_maps_id'], r['all_ratings']['count'], r['bain_ratings']['count']) for r in thai] == \
+        [('place_2', 3, 2), ('place_4', 0, 0)]
+    # the 'all' listing has one row per place, whatever types it is tagged with
+    assert [r['google_maps_id'] for r in json.loads(client.get('/reviews/ratings').data)['data']] == \
+        ['place_1', 'place_2', 'place_3', 'place_4']
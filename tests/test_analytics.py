@@ -0,0 +1,51 @@
+import json
+import pytest
+from datetime import datetime
+from pa_api.analytics import compute_place_analytics
+from pa_api.review_store import ReviewColumns
+from review_dates import epoch_seconds
+
+
+@pytest.fixture(params=['numpy', 'array'])
+def columns(request, app):
+    if request.param == 'numpy':
+        pytest.importorskip('numpy')
+    return ReviewColumns.load(use_numpy=request.param == 'numpy')
+
+
+def test_analytics_of_every_place(columns):
+    """Histograms, trailing windows and provider split match the fixture reviews on both backends."""
+    results = compute_place_analytics(columns, epoch_seconds(datetime(2024, 1, 6)), (3, 365))
+    by_place = {place['google_maps_id']: place for place in results}
+
+    assert by_place['place_1']['ratings'] == {'count': 2, 'average': 4.5, 'histogram': [0, 0, 0, 1, 1]}
+    assert by_place['place_1']['providers'] == {'Google': {'count': 1, 'average': 5.0},
+                                                'Bain': {'count': 1, 'average': 4.0}}
+    assert by_place['place_1']['windows'] == {'3d': {'count': 0, 'average': None},
+                                              '365d': {'count': 2, 'average': 4.5}}
+    assert by_place['place_2']['windows']['3d'] == {'count': 2, 'average': 4.0}
+    assert by_place['place_3']['providers'] == {'Google': {'count': 1, 'average': 2.0}}
+
+
+def test_analytics_endpoints(client):
+    place = json.loads(client.get('/reviews/analytics/place_2').data)['data']
+    assert place['ratings']['histogram'] == [0, 0, 1, 0, 1]
+    assert place['windows']['90d'] == {'count': 0, 'average': None}  # fixture reviews are from 2024
+    assert client.get('/reviews/analytics/unknown').status_code == 404
+
+    listing = json.loads(client.get('/reviews/analytics').data)['data']
+    assert [p['google_maps_id'] for p in listing] == ['place_1', 'place_2', 'place_3']
+    assert json.loads(client.get('/reviews/analytics?restaurant_type=Italian').data)['data'] == []
+
+
+def test_analytics_recomputed_once_per_data_version(client):
+    client.get('/reviews/analytics/place_1')
+    client.get('/reviews/analytics')
+    client.post('/reviews/submit-review', data={
+        'google_maps_id': 'place_3',
+        'place_name': 'Test Restaurant 3',
+        'review_rating': '4'
+    })
+    place = json.loads(client.get('/reviews/analytics/place_3').data)['data']
+    assert place['providers']['Bain'] == {'count': 1, 'average': 4.0}
+    assert json.loads(client.get('/reviews/cache-stats').data)['data']['analytics']['computations'] == 2
@@ -0,0 +1,47 @@
+import json
+from pathlib import Path
+from benchmarks.synthetic import synthetic_reviews
+from benchmarks.run import compare, parse_scale, run_scale
+from benchmarks.dataset_fetch import bench_dataset_fetch
+
+SEARCH_JSON = Path(__file__).parent.parent / 'json' / 'search.json'
+
+
+def test_synthetic_reviews_match_apify_shape():
+    """Generated items carry the same keys as a real dataset item and are reproducible."""
+    with open(SEARCH_JSON, 'r') as f:
+        real_keys = set(json.load(f)[0])
+
+    items = list(synthetic_reviews(120, seed=3))
+    assert len(items) == 120
+    assert all(set(item) == real_keys for item in items)
+    assert items == list(synthetic_reviews(120, seed=3))
+    assert len({item['googleMapsPlaceId'] for item in items}) <= 120 // 50
+
+
+def test_parse_scale():
+    assert [parse_scale(value) for value in ('500', '10k', '1M')] == [500, 10_000, 1_000_000]
+
+
+def test_run_scale_times_ingestion_and_every_endpoint():
+    """A small run ingests through both pop endpoints and gets a 200 from every read endpoint."""
+    results = run_scale(300, repeats=1, seed=0)
+
+    ingest = {r['name']: r for r in results if r['benchmark'] == 'ingest'}
+    assert ingest['pop-db']['rows_written'] == 300
+    assert ingest['pop-restaurant-type']['rows_written'] == 30
+
+    endpoints = [r for r in results if r['benchmark'] == 'endpoint']
+    assert len(endpoints) >= 10
+    assert all(r['status'] == 200 and r['bytes'] > 0 for r in endpoints)
+    assert all(r['scale'] == 300 and r['ms'] >= 0 for r in results)
+
+    changes, regressions = compare({'results': results}, results, 0.2)
+    assert len(changes) == len([r for r in results if r['ms'] > 0]) and regressions == []
+
+
+def test_dataset_fetch_reads_through_real_client():
+    """The stand-in server speaks enough of the Apify API for ApifyClient, sequential and prefetched."""
+    results = bench_dataset_fetch(1250, 0, 0, [2], page_size=500)
+    assert [r['name'] for r in results] == ['sequential', 'prefetch-2']
+    assert all(r['scale'] == 1250 and r['items_per_sec'] > 0 for r in results)
@@ -0,0 +1,84 @@
+import json
+from pathlib import Path
+from extensions import db
+from models import Review
+from apify_api.bulk_ingest import bulk_insert_reviews, batched, RestaurantTypeCollector
+
+SEARCH_JSON = Path(__file__).parent.parent / 'json' / 'search.json'
+
+
+def _apify_items():
+    with open(SEARCH_JSON, 'r') as f:
+        return json.load(f)
+
+
+def test_batched_streams_in_chunks():
+    """batched() should chunk a generator without consuming it up front."""
+    chunks = list(batched((i for i in range(7)), 3))
+    assert chunks == [[0, 1, 2], [3, 4, 5], [6]]
+
+
+def test_bulk_insert_reviews_writes_all_rows(app):
+    """Bulk insert writes every dataset item and records one timing per batch."""
+    items = _apify_items()[:25]
+    before = Review.query.count()
+
+    stats = bulk_insert_reviews(iter(items), batch_size=10)
+    db.session.commit()
+
+    assert stats.rows == 25
+    assert [b['rows'] for b in stats.batches] == [10, 10, 5]
+    assert stats.rows_per_sec > 0
+    assert Review.query.count() == before + 25
+
+    first = Review.query.filter_by(author_name=items[0]['authorName']).first()
+    assert first.google_maps_id == items[0]['googleMapsPlaceId']
+    assert first.review_rating == items[0]['reviewRating']
+    assert first.ignore_for_rating is False
+
+
+def test_bulk_insert_reviews_calls_item_hook(app):
+    """The on_item hook sees each raw Apify item as it streams past."""
+    items = _apify_items()[:5]
+    seen = []
+
+    bulk_insert_reviews(items, batch_size=2, on_item=lambda item: seen.append(item['authorName']))
+    db.session.rollback()
+
+    assert seen == [item['authorName'] for item in items]
+
+
+def test_restaurant_type_collector_upserts_missing_places(app):
+    """Only new (google_maps_id, restaurant_type) pairs are inserted, with the old added/skipped counts."""
+    from models import Restaurant
+
+    items = [
+        {'googleMapsPlaceId': 'place_1', 'placeName': 'Test Restaurant 1', 'placeAddress': '123 Main St'},
+        {'googleMapsPlaceId': 'place_9', 'placeName': 'New Place', 'placeAddress': '9 Elm St'},
+        {'googleMapsPlaceId': 'place_9', 'placeName': 'New Place', 'placeAddress': '9 Elm St'},
+        {'googleMapsPlaceId': 'place_1', 'placeName': 'Test Restaurant 1', 'placeAddress': '123 Main St'},
+    ]
+    collector = RestaurantTypeCollector('all')
+    for item in items:
+        collector(item)
+
+    added, skipped = collector.upsert()
+    db.session.commit()
+
+    assert (added, skipped) == (1, 3)
+    assert Restaurant.query.filter_by(google_maps_id='place_9', restaurant_type='all').count() == 1
+
+
+def test_bulk_insert_reviews_skips_stored_and_repeated_reviews(app):
+    """Re-running a dataset inserts nothing; a review repeated within a batch is inserted once."""
+    items = _apify_items()[:12]
+    first = bulk_insert_reviews(iter(items + items[:2]), batch_size=20)
+    db.session.commit()
+    assert (first.items, first.rows, first.duplicates) == (14, 12, 2)
+
+    inserted = []
+    again = bulk_insert_reviews(iter(items), batch_size=5, on_row=inserted.append)
+    db.session.commit()
+    assert (again.rows, again.duplicates) == (0, 12)
+    assert inserted == []
+    assert Review.query.filter(Review.review_key.isnot(None)).count() == 12
@@ -0,0 +1,70 @@
+from data_version import current_data_version
+
+
+def test_read_endpoints_emit_strong_etag(client):
+    """Successful reads carry a strong ETag and must be revalidated."""
+    response = client.get('/reviews/ratings?restaurant_type=all')
+
+    etag, weak = response.get_etag()
+    assert response.status_code == 200
+    assert etag and not weak
+    assert response.headers['Cache-Control'] == 'no-cache'
+
+
+def test_if_none_match_returns_304(client):
+    """A matching If-None-Match is answered with an empty 304."""
+    etag, _ = client.get('/reviews/ratings/place_1').get_etag()
+
+    response = client.get('/reviews/ratings/place_1', headers={'If-None-Match': f'"{etag}"'})
+    assert response.status_code == 304
+    assert response.data == b''
+    assert response.get_etag()[0] == etag
+
+
+def test_etag_differs_per_query(client):
+    """Different arguments produce different ETags."""
+    all_etag, _ = client.get('/reviews/ratings?restaurant_type=all').get_etag()
+    italian_etag, _ = client.get('/reviews/ratings?restaurant_type=Italian').get_etag()
+    assert all_etag != italian_etag
+
+
+def test_write_bumps_version_and_etag(app, client):
+    """A submission bumps the data version, so old ETags stop matching."""
+    etag, _ = client.get('/reviews/ratings/place_3').get_etag()
+    version = current_data_version()
+
+    client.post('/reviews/submit-review', data={
+        'google_maps_id': 'place_3',
+        'place_name': 'Test Restaurant 3',
+        'review_rating': '5'
+    })
+
+    assert current_data_version() == version + 1
+    response = client.get('/reviews/ratings/place_3', headers={'If-None-Match': f'"{etag}"'})
+    assert response.status_code == 200
+    assert response.get_etag()[0] != etag
+
+
+def test_etag_only_shared_by_requests_with_the_same_body(client):
+    """Args the views read raw get their own ETag; blank restaurant_type is the default listing."""
+    default_etag, _ = client.get('/reviews/reviews').get_etag()
+    assert client.get('/reviews/reviews?restaurant_type=').get_etag()[0] == default_etag
+    assert client.get('/reviews/reviews?provider=%20').get_etag()[0] != default_etag
+
+
+def test_rolled_back_bump_leaves_later_commits_alone(app):
+    """A bump that rolls back neither changes the version nor drops the cached one on a later commit."""
+    from data_version import PENDING_BUMP, bump_data_version
+    from extensions import db
+
+    version = current_data_version()
+    bump_data_version()
+    db.session.rollback()
+    assert PENDING_BUMP not in db.session().info
+
+    app.extensions['data_version'] = ('cached', app.extensions['data_version'][1])
+    db.session.commit()
+    assert current_data_version() == 'cached'
+
+    app.extensions.pop('data_version')
+    assert current_data_version() == version
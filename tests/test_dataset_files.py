@@ -0,0 +1,97 @@
+import gzip
+import io
+import json
+from pathlib import Path
+import pytest
+from extensions import db
+from models import Rating, Review
+from apify_api.bulk_ingest import bulk_insert_reviews
+from apify_api.dataset_files import iter_dataset_file, iter_json_array
+
+SEARCH_JSON = Path(__file__).parent.parent / 'json' / 'search.json'
+
+
+def _apify_items(count=40):
+    with open(SEARCH_JSON, 'r') as f:
+        return json.load(f)[:count]
+
+
+def test_json_array_parser_matches_json_load():
+    """Tiny chunks split elements, strings and numbers across reads without changing the result."""
+    document = json.dumps([{"a": 1, "b": "x, ]}"}, 12345, [1, [2]], None, "tail"], indent=2)
+    for chunk_size in (1, 3, 7, 4096):
+        assert list(iter_json_array(io.StringIO(document), chunk_size)) == json.loads(document)
+    assert list(iter_json_array(io.StringIO(' [ ] '))) == []
+
+
+@pytest.mark.parametrize('document', ['{"a": 1}', '[{"a": 1} {"b": 2}]', '[{"a": 1},', '[{"a": 1'])
+def test_json_array_parser_rejects_malformed_input(document):
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.StringIO(document), 4))
+
+
+@pytest.mark.parametrize('compressed', [False, True])
+@pytest.mark.parametrize('layout', ['array', 'ndjson'])
+def test_dataset_file_formats(tmp_path, layout, compressed):
+    """JSON arrays and NDJSON load the same items, plain or gzipped."""
+    items = _apify_items()
+    if layout == 'array':
+        text = json.dumps(items, indent=2)
+    else:
+        text = '\n'.join(json.dumps(item) for item in items) + '\n\n'
+    path = tmp_path / 'export'
+    if compressed:
+        with gzip.open(path, 'wt', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        path.write_text(text, encoding='utf-8')
+
+    assert list(iter_dataset_file(path, chunk_size=256)) == items
+
+
+def test_periodic_commits_sync_derived_data(app):
+    """commit_every commits after each interval, calling before_commit first."""
+    synced = []
+    stats = bulk_insert_reviews(iter(_apify_items(25)), batch_size=5, commit_every=2,
+                                before_commit=lambda stats: synced.append(Review.query.count()))
+    assert stats.rows == 25
+    assert len(synced) == 2
+    assert synced[1] - synced[0] == 10
+    db.session.commit()
+
+
+def test_pop_file_loads_gzipped_ndjson(app, client, tmp_path):
+    """pop-file streams a named export and keeps ratings in step with the new reviews."""
+    items = _apify_items()
+    (tmp_path / 'json').mkdir()
+    with gzip.open(tmp_path / 'json' / 'export.ndjson.gz', 'wt', encoding='utf-8') as f:
+        f.writelines(json.dumps(item) + '\n' for item in items)
+    app.config.update(FILE_BASE=f'{tmp_path}/', INGEST_BATCH_SIZE=7, FILE_LOAD_COMMIT_BATCHES=2)
+    before = Review.query.count()
+
+    response = client.get('/apify/pop-file?file=export.ndjson.gz')
+    assert response.get_data(as_text=True).startswith(f"Successfully added {len(items)} reviews")
+    assert Review.query.count() == before + len(items)
+
+    place = items[0]['googleMapsPlaceId']
+    ratings = [item['reviewRating'] for item in items if item['googleMapsPlaceId'] == place]
+    rating = db.session.get(Rating, place)
+    assert rating.ratings_count == len(ratings)
+    assert rating.ratings_sum == sum(ratings)
+
+
+def test_test_pop_goes_through_the_ingest_pipeline(client):
+    """test-pop writes like pop-file: deduplicated, with a new data version for the caches."""
+    from data_version import current_data_version
+    before, version = Review.query.count(), current_data_version()
+
+    assert client.get('/apify/test-pop').get_data(as_text=True) == "Successfully added 6 reviews to database"
+    assert Review.query.count() == before + 6
+    assert current_data_version() > version
+    assert client.get('/apify/test-pop').get_data(as_text=True) == "Successfully added 0 reviews to database"
+
+
+def test_pop_file_rejects_paths_outside_json_dir(app, client, tmp_path):
+    app.config.update(FILE_BASE=f'{tmp_path}/')
+    assert 'outside the json directory' in client.get('/apify/pop-file?file=../config.py').get_data(as_text=True)
+    assert 'was not found' in client.get('/apify/pop-file?file=missing.json').get_data(as_text=True)
@@ -0,0 +1,67 @@
+import json
+from threading import Lock
+from apify_api.dataset_reader import PrefetchingDatasetReader, iter_dataset_items
+
+
+class FakeDataset:
+    """Dataset client with raw page access, recording the offsets requested"""
+
+    def __init__(self, items):
+        self.items = items
+        self.offsets = []
+        self._lock = Lock()
+
+    def get_items_as_bytes(self, item_format='json', offset=0, limit=None):
+        with self._lock:
+            self.offsets.append(offset)
+        return json.dumps(self.items[offset:offset + limit]).encode('utf-8')
+
+    def iterate_items(self, offset=0):
+        return iter(self.items[offset:])
+
+
+class FakeClient:
+    def __init__(self, dataset):
+        self._dataset = dataset
+
+    def dataset(self, dataset_id):
+        return self._dataset
+
+
+def test_prefetching_reader_yields_items_in_order():
+    """Pages arrive out of order on the pool but items come out in dataset order."""
+    items = [{'n': n} for n in range(2350)]
+    dataset = FakeDataset(items)
+    reader = PrefetchingDatasetReader(dataset, page_size=100, window=4)
+
+    assert list(reader) == items
+    assert reader.pages == 24
+    # nothing is requested more than window pages past the short last page
+    assert max(dataset.offsets) <= 2300 + 4 * 100
+
+
+def test_prefetching_reader_handles_exact_multiple_and_empty():
+    assert list(PrefetchingDatasetReader(FakeDataset([{'n': n} for n in range(300)]), 100, 2)) == \
+        [{'n': n} for n in range(300)]
+    assert list(PrefetchingDatasetReader(FakeDataset([]), 100, 2)) == []
+
+
+def test_prefetching_reader_stops_early():
+    dataset = FakeDataset([{'n': n} for n in range(10_000)])
+    reader = iter(PrefetchingDatasetReader(dataset, page_size=10, window=3))
+    assert [next(reader)['n'] for _ in range(15)] == list(range(15))
+    reader.close()
+    assert len(dataset.offsets) <= 6
+
+
+def test_iter_dataset_items_config(app):
+    items = [{'n': n} for n in range(25)]
+    dataset = FakeDataset(items)
+    app.config.update(APIFY_DATASET_PAGE_SIZE=10, APIFY_DATASET_PREFETCH_PAGES=2)
+    assert list(iter_dataset_items(FakeClient(dataset), 'id')) == items
+    assert sorted(dataset.offsets)[:3] == [0, 10, 20]
+
+    app.config['APIFY_DATASET_PREFETCH_PAGES'] = 0
+    dataset.offsets.clear()
+    assert list(iter_dataset_items(FakeClient(dataset), 'id')) == items
+    assert dataset.offsets == []
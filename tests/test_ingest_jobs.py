@@ -0,0 +1,138 @@
+import json
+from pathlib import Path
+from extensions import db
+from models import Review
+from apify_api.bulk_ingest import bulk_insert_reviews
+from apify_api.jobs import submit_job, job_status
+
+SEARCH_JSON = Path(__file__).parent.parent / 'json' / 'search.json'
+
+
+def _load_file_job(progress, limit):
+    with open(SEARCH_JSON, 'r') as f:
+        items = json.load(f)[:limit]
+    progress.phase('inserting')
+    stats = bulk_insert_reviews(items, batch_size=4, on_batch=progress.ingest_batch)
+    progress.update(force=True, items_fetched=stats.rows, rows_written=stats.rows)
+    db.session.commit()
+    return f"Successfully added {stats.rows} reviews to database"
+
+
+def _failing_job(progress):
+    progress.phase('inserting')
+    raise RuntimeError("dataset went away")
+
+
+def test_job_runs_and_reports_progress(app, client):
+    """A submitted job records its counters and message, readable from /apify/jobs/<id>."""
+    before = Review.query.count()
+    job_id = submit_job('test-load', _load_file_job, limit=10)
+
+    response = client.get(f'/apify/jobs/{job_id}')
+    assert response.status_code == 200
+    data = json.loads(response.data)['data']
+
+    assert data['status'] == 'succeeded'
+    assert data['phase'] == 'done'
+    assert data['rows_written'] == 10
+    assert data['params'] == {'limit': 10}
+    assert data['elapsed_seconds'] is not None
+    assert data['message'] == "Successfully added 10 reviews to database"
+    assert Review.query.count() == before + 10
+
+
+def test_failed_job_records_error(app):
+    """Exceptions in the job body mark the job failed and keep the error text."""
+    job_id = submit_job('test-fail', _failing_job)
+    status = job_status(job_id)
+
+    assert status['status'] == 'failed'
+    assert 'dataset went away' in status['error']
+
+
+def test_long_phase_is_truncated_to_the_column(app):
+    """A phase longer than ingest_jobs.phase is cut, not left to fail the progress write."""
+    def long_phase(progress):
+        progress.phase('x' * 300)
+        raise RuntimeError(f"phase kept: {len(progress.values['phase'])}")
+
+    assert 'phase kept: 255' in job_status(submit_job('test-phase', long_phase))['error']
+
+
+def test_unknown_job_is_404(client):
+    """Unknown job ids return a 404 JSON error."""
+    response = client.get('/apify/jobs/does-not-exist')
+    assert response.status_code == 404
+    assert json.loads(response.data)['success'] is False
+
+
+class _InterruptedDataset:
+    """Dataset client whose first read dies after fail_after items, like a dropped connection"""
+
+    def __init__(self, items, fail_after):
+        self.items = items
+        self.fail_after = fail_after
+        self.offsets = []
+
+    def iterate_items(self, offset=0):
+        self.offsets.append(offset)
+        for position, item in enumerate(self.items[offset:], offset):
+            if self.fail_after is not None and position == self.fail_after:
+                self.fail_after = None
+                raise ConnectionError("connection reset")
+            yield item
+
+
+class _Client:
+    def __init__(self, dataset):
+        self._dataset = dataset
+
+    def dataset(self, dataset_id):
+        return self._dataset
+
+
+class _Progress:
+    def phase(self, phase):
+        pass
+
+    def update(self, force=False, **counters):
+        pass
+
+    def ingest_batch(self, stats):
+        pass
+
+
+def test_interrupted_ingest_resumes_from_checkpoint(app):
+    """A restaurant-type ingest that dies part way resumes at its last checkpoint without double counting."""
+    from apify_api.apify_endpoints import ingest_restaurant_type_dataset
+    from models import IngestCheckpoint, Rating
+
+    with open(SEARCH_JSON, 'r') as f:
+        items = json.load(f)[:30]
+    app.config.update(INGEST_BATCH_SIZE=5, INGEST_CHECKPOINT_BATCHES=2)
+    dataset = _InterruptedDataset(items, fail_after=23)
+    client = _Client(dataset)
+    before = Review.query.count()
+
+    try:
+        ingest_restaurant_type_dataset(_Progress(), client, 'dataset-1', 'Thai')
+    except ConnectionError:
+        db.session.rollback()
+    checkpoint = db.session.get(IngestCheckpoint, ('dataset-1', 'Thai'))
+    assert (checkpoint.items_committed, checkpoint.completed_at) == (20, None)
+    assert Review.query.count() == before + 20
+
+    message = ingest_restaurant_type_dataset(_Progress(), client, 'dataset-1', 'Thai')
+    assert dataset.offsets == [0, 20]
+    assert message.startswith("Successfully added 10 reviews")
+    assert Review.query.count() == before + 30
+    db.session.refresh(checkpoint)
+    assert (checkpoint.items_committed, checkpoint.rows_written) == (30, 30)
+    assert checkpoint.completed_at is not None
+
+    place = items[0]['googleMapsPlaceId']
+    assert db.session.get(Rating, place).ratings_count == Review.query.filter_by(google_maps_id=place).count()
+
+    # the same dataset again: nothing left to read, nothing added
+    assert ingest_restaurant_type_dataset(_Progress(), client, 'dataset-1', 'Thai').startswith(
+        "Successfully added 0 reviews")
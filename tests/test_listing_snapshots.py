@@ -0,0 +1,109 @@
+import gzip
+import json
+import pytest
+from pa_api.listing_snapshots import ListingSnapshots, encode_bodies, render_listing_snapshots
+
+
+@pytest.fixture
+def snapshot_client(app, client):
+    app.config.update(LISTING_SNAPSHOTS_ENABLED=True, RESPONSE_CACHE_ENABLED=False)
+    return client
+
+
+def _snapshot_stats(client):
+    return json.loads(client.get('/reviews/cache-stats').data)['data']['listing_snapshots']
+
+
+def test_listing_is_served_precompressed(snapshot_client):
+    """The first listing request renders the snapshot, later ones get the stored gzip or identity bytes."""
+    plain = snapshot_client.get('/reviews/ratings?restaurant_type=all')
+    compressed = snapshot_client.get('/reviews/ratings', headers={'Accept-Encoding': 'gzip'})
+
+    assert plain.headers.get('Content-Encoding') is None
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in compressed.headers['Vary']
+    assert gzip.decompress(compressed.data) == plain.data
+    assert compressed.get_etag() == (plain.get_etag()[0] + '-gzip', False)
+    revalidated = snapshot_client.get('/reviews/ratings', headers={'Accept-Encoding': 'gzip',
+                                                                   'If-None-Match': compressed.headers['ETag']})
+    assert revalidated.status_code == 304
+    assert len(json.loads(plain.data)['data']) == 3
+
+    stats = _snapshot_stats(snapshot_client)
+    assert (stats['renders'], stats['hits'], stats['entries']) == (1, 1, 1)
+
+
+def test_listing_is_served_with_brotli(snapshot_client):
+    brotli = pytest.importorskip('brotli')
+    plain = snapshot_client.get('/reviews/reviews')
+    compressed = snapshot_client.get('/reviews/reviews', headers={'Accept-Encoding': 'gzip, br'})
+
+    assert compressed.headers['Content-Encoding'] == 'br'
+    assert brotli.decompress(compressed.data) == plain.data
+    assert compressed.get_etag()[0] == plain.get_etag()[0] + '-br'
+
+
+def test_other_query_args_bypass_snapshots(snapshot_client):
+    """Paginated or projected listings go to the view as before."""
+    response = snapshot_client.get('/reviews/reviews?limit=2', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers.get('Content-Encoding') is None
+    assert json.loads(response.data)['next_cursor']
+    assert _snapshot_stats(snapshot_client)['entries'] == 0
+
+
+def test_write_renders_a_new_snapshot(snapshot_client):
+    """A submission bumps the data version, so the next listing shows the new rating."""
+    snapshot_client.get('/reviews/ratings')
+    snapshot_client.post('/reviews/submit-review', data={
+        'google_maps_id': 'place_3',
+        'place_name': 'Test Restaurant 3',
+        'review_rating': '5'
+    })
+    listing = json.loads(snapshot_client.get('/reviews/ratings').data)['data']
+    assert next(r for r in listing if r['google_maps_id'] == 'place_3')['bain_ratings']['count'] == 1
+    assert _snapshot_stats(snapshot_client)['renders'] == 2
+
+
+def test_prerender_refreshes_held_snapshots(app, snapshot_client):
+    snapshot_client.get('/reviews/reviews?restaurant_type=all')
+    snapshot_client.get('/reviews/ratings?restaurant_type=all')
+    render_listing_snapshots(app)
+    stats = _snapshot_stats(snapshot_client)
+    assert (stats['renders'], stats['hits']) == (2, 2)  # same data version: already current
+
+
+def test_prerender_bypasses_cache_and_metrics(app, snapshot_client):
+    """Background renders call the view directly: no response cache entry, no request counted."""
+    app.config.update(RESPONSE_CACHE_ENABLED=True)
+    snapshot_client.get('/reviews/ratings')
+    snapshot_client.post('/reviews/submit-review', data={
+        'google_maps_id': 'place_3',
+        'place_name': 'Test Restaurant 3',
+        'review_rating': '5'
+    })
+    cache_entries = json.loads(snapshot_client.get('/reviews/cache-stats').data)['data']['entries']
+    render_listing_snapshots(app)
+
+    stats = json.loads(snapshot_client.get('/reviews/cache-stats').data)['data']
+    assert stats['listing_snapshots']['renders'] == 2
+    assert stats['entries'] == cache_entries
+    metrics = snapshot_client.get('/metrics').get_data(as_text=True)
+    assert 'endpoint="get_reviews.get_all_ratings",method="GET",status="200"} 1' in metrics
+
+
+def test_snapshot_directory_is_shared(tmp_path):
+    """A snapshot stored by one worker is loaded by another; newer versions replace the old files."""
+    key = ('get_reviews.get_all_ratings', 'Thai')
+    writer = ListingSnapshots(directory=str(tmp_path))
+    writer.store(key, 7, encode_bodies(b'{"data": [1]}'))
+
+    reader = ListingSnapshots(directory=str(tmp_path))
+    bodies = reader.load(key, 7)
+    assert bodies['identity'] == b'{"data": [1]}'
+    assert gzip.decompress(bodies['gzip']) == b'{"data": [1]}'
+    assert reader.load(key, 8) is None
+
+    writer.store(key, 8, encode_bodies(b'{"data": [2]}'))
+    assert reader.load(key, 7) is None
+    assert reader.load(key, 8)['identity'] == b'{"data": [2]}'
+    assert len(list(tmp_path.iterdir())) == len(bodies)
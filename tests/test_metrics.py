@@ -0,0 +1,51 @@
+import re
+from metrics import Histogram
+
+
+def _sample(text, name, **labels):
+    """Value of one series in a Prometheus text exposition"""
+    label_text = ','.join(f'{key}="{value}"' for key, value in labels.items())
+    match = re.search(rf'^{re.escape(name)}\{{{re.escape(label_text)}\}} (\S+)$', text, re.MULTILINE)
+    return float(match.group(1)) if match else None
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram((1, 5, 10))
+    for value in (0.5, 3, 7, 20):
+        histogram.observe(value)
+    assert histogram.counts == [1, 2, 3]
+    assert (histogram.count, histogram.sum) == (4, 30.5)
+
+
+def test_metrics_record_requests_sql_and_bytes(client):
+    """Each request adds to its endpoint's counters, SQL statement counts and response size."""
+    first = client.get('/reviews/ratings')
+    client.get('/reviews/ratings')
+    client.get('/reviews/ratings/unknown')
+
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    text = response.get_data(as_text=True)
+
+    endpoint = 'get_reviews.get_all_ratings'
+    assert _sample(text, 'http_requests_total', endpoint=endpoint, method='GET', status='200') == 2
+    assert _sample(text, 'http_requests_total', endpoint='get_reviews.get_restaurant_ratings', method='GET',
+                   status='404') == 1
+    assert _sample(text, 'http_request_duration_seconds_count', endpoint=endpoint) == 2
+    assert _sample(text, 'http_request_duration_seconds_bucket', endpoint=endpoint, le='+Inf') == 2
+    # the first request runs the query, the second is a response cache hit
+    assert _sample(text, 'http_request_db_statements_sum', endpoint=endpoint) >= 1
+    assert _sample(text, 'http_request_serialization_seconds_count', endpoint=endpoint) == 2
+    assert _sample(text, 'http_response_size_bytes_sum', endpoint=endpoint) == 2 * len(first.data)
+
+
+def test_metrics_count_streamed_bodies(client):
+    """Streamed responses are recorded once their body has been sent."""
+    body = client.get('/reviews/reviews?format=ndjson').data
+
+    text = client.get('/metrics').get_data(as_text=True)
+    endpoint = 'get_reviews.get_all_reviews'
+    assert _sample(text, 'http_requests_total', endpoint=endpoint, method='GET', status='200') == 1
+    assert _sample(text, 'http_response_size_bytes_sum', endpoint=endpoint) == len(body)
+    assert _sample(text, 'http_request_serialization_seconds_sum', endpoint=endpoint) > 0
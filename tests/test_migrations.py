@@ -0,0 +1,139 @@
+from sqlalchemy import inspect, text
+from extensions import db
+from aggregates import refresh_restaurant_summary
+from rankings import refresh_restaurant_scores
+from models import Rating, RestaurantScore, RestaurantSummary, Review
+from migrations import MIGRATIONS, apply_migrations, pending_migrations
+from query_plans import endpoint_query_plans, full_scans
+
+
+def _index_names(table):
+    return {index['name'] for index in inspect(db.session.connection()).get_indexes(table)}
+
+
+def _make_legacy_schema():
+    """Recreate the derived tables the way the old procedures did: CREATE TABLE ... AS SELECT, no keys"""
+    db.session.execute(text("CREATE TABLE legacy_restaurants AS SELECT * FROM restaurants"))
+    db.session.execute(text("DROP TABLE restaurants"))
+    db.session.execute(text("ALTER TABLE legacy_restaurants RENAME TO restaurants"))
+    # the column list of makeratings/makebainratings: no ratings_sum
+    for table, condition in (('ratings', ''), ('bain_ratings', "AND provider = 'Bain'")):
+        db.session.execute(text(f"DROP TABLE {table}"))
+        db.session.execute(text(
+            f"CREATE TABLE {table} AS SELECT google_maps_id, MAX(place_name) AS place_name, "
+            f"COUNT(review_rating) AS ratings_count, AVG(review_rating) AS ratings_avg FROM reviews "
+            f"WHERE review_rating IS NOT NULL {condition} GROUP BY google_maps_id"))
+    db.session.execute(text("DROP INDEX ix_reviews_place_date"))
+    db.session.execute(text("DROP INDEX ix_reviews_provider_place"))
+    db.session.execute(text("DROP INDEX ux_reviews_review_key"))
+    db.session.execute(text("ALTER TABLE reviews DROP COLUMN review_key"))
+    db.session.execute(text("DROP TABLE ingest_checkpoints"))
+    db.session.execute(text("DROP TABLE restaurant_summary"))
+    db.session.execute(text("DROP TABLE restaurant_scores"))
+    db.session.execute(text("DROP TABLE review_search"))
+    db.session.commit()
+
+
+def test_migrations_add_keys_and_indexes_to_legacy_tables(app):
+    """A database built with the old procedures gets its keys and composite indexes."""
+    _make_legacy_schema()
+
+    applied = apply_migrations()
+    assert [migration.version for migration, _ in applied] == [migration.version for migration in MIGRATIONS]
+    # 6 only indexes restaurant_summary, which migration 4 just created from the current model;
+    # 7 and 8 do nothing on SQLite
+    assert all(changes for migration, changes in applied if migration.version not in (6, 7, 8))
+
+    assert {'pk_restaurants', 'ix_restaurants_type_name'} <= _index_names('restaurants')
+    assert 'pk_ratings' in _index_names('ratings')
+    assert db.session.get(Rating, 'place_1').ratings_sum == 9
+    assert db.session.execute(text("SELECT ratings_sum FROM bain_ratings WHERE google_maps_id = 'place_2'")).scalar() == 5
+    assert {'ix_reviews_place_date', 'ix_reviews_provider_place', 'ux_reviews_review_key'} <= _index_names('reviews')
+    assert inspect(db.session.connection()).has_table('ingest_checkpoints')
+    assert db.session.get(RestaurantSummary, ('place_1', 'all')).ratings_count == 2
+    assert db.session.get(RestaurantScore, ('place_1', 'all')).ratings_count == 2
+    assert 'ix_restaurant_summary_type_bain_avg' in _index_names('restaurant_summary')
+    assert db.session.execute(text("SELECT COUNT(*) FROM review_search")).scalar() == 5
+    assert pending_migrations() == []
+    assert apply_migrations() == []
+
+
+def test_primary_key_migration_drops_null_and_repeated_keys(app):
+    """CTAS tables holding NULL or repeated keys are cleaned up instead of failing the primary key."""
+    _make_legacy_schema()
+    db.session.execute(text("""
+        INSERT INTO restaurants (google_maps_id, place_name, place_address, restaurant_type)
+        VALUES (NULL, 'No Place', NULL, 'all'),
+               ('place_1', 'Test Restaurant 1 (again)', '123 Main St', 'all')
+    """))
+    db.session.commit()
+
+    applied = apply_migrations()
+    changes = next(changes for migration, changes in applied if migration.version == 1)
+    assert "rows with a NULL or repeated restaurants(google_maps_id, restaurant_type) removed" in changes
+    assert 'pk_restaurants' in _index_names('restaurants')
+    rows = db.session.execute(text(
+        "SELECT google_maps_id, place_name FROM restaurants WHERE restaurant_type = 'all' ORDER BY google_maps_id"
+    )).all()
+    assert rows == [('place_1', 'Test Restaurant 1 (again)'), ('place_2', 'Test Restaurant 2'),
+                    ('place_3', 'Test Restaurant 3')]
+
+
+def test_migrations_only_record_versions_on_current_schema(app):
+    """Tables created from the models already match, so only the fixture rows get their review keys."""
+    applied = apply_migrations()
+    assert len(applied) == len(MIGRATIONS)
+    assert [change for _, changes in applied for change in changes] == ['review_key backfilled']
+
+
+def test_review_key_migration_removes_duplicates(app):
+    """Reviews stored twice before the natural key existed are collapsed and the ratings recounted."""
+    _make_legacy_schema()
+    columns = "google_maps_id, place_name, provider, review_date, review_rating, author_name"
+    for _ in range(3):
+        db.session.execute(text(f"INSERT INTO reviews ({columns}) VALUES "
+                                "('place_9', 'Twice', 'google-maps', '2025-01-02 03:04:05', 4, 'Sam')"))
+    db.session.execute(text(f"INSERT INTO reviews ({columns}) VALUES "
+                            "('place_9', 'Twice', 'Bain', NULL, 5, 'Sam'), ('place_9', 'Twice', 'Bain', NULL, 5, 'Sam')"))
+    db.session.commit()
+
+    apply_migrations()
+    assert Review.query.filter_by(google_maps_id='place_9', provider='google-maps').count() == 1
+    assert Review.query.filter_by(google_maps_id='place_9', provider='Bain').count() == 2  # Bain reviews have no key
+    assert db.session.get(Rating, 'place_9').ratings_count == 3
+
+    stored = Review.query.filter_by(google_maps_id='place_9', provider='google-maps').one()
+    assert stored.review_key == Review.apify_row({
+        'googleMapsPlaceId': 'place_9', 'provider': 'google-maps', 'authorName': 'Sam',
+        'reviewDate': '2025-01-02T03:04:05.250Z'})['review_key']
+
+
+def test_read_endpoints_use_indexes(app):
+    """EXPLAIN of every /reviews read query: no full scans, and the composite indexes are picked."""
+    db.session.execute(text("""
+        INSERT INTO restaurants (google_maps_id, place_name, place_address, restaurant_type)
+        VALUES ('place_1', 'Test Restaurant 1', '123 Main St', 'Italian')
+    """))
+    refresh_restaurant_summary(['place_1'])
+    refresh_restaurant_scores(['place_1'])
+    db.session.commit()
+
+    report = endpoint_query_plans()
+    assert report and all(entry['queries'] for entry in report)
+    assert full_scans(report) == []
+
+    listing = next(entry for entry in report if entry['path'] == '/reviews/reviews?restaurant_type=Italian')
+    used = {step['index'] for query in listing['queries'] for step in query['plan']}
+    assert {'ix_restaurant_summary_type_name', 'ix_reviews_place_date'} <= used
+    top = next(entry for entry in report if entry['path'].startswith('/reviews/top'))
+    assert [step['index'] for step in top['queries'][0]['plan']] == ['ix_restaurant_scores_type_score']
+    for metric, index in (('average', 'avg'), ('count', 'count'), ('bain_average', 'bain_avg')):
+        top = next(entry for entry in report if f'metric={metric}&' in entry['path'])
+        assert [step['index'] for step in top['queries'][0]['plan']] == [f'ix_restaurant_summary_type_{index}']
+
+    ratings = next(entry for entry in report if entry['path'] == '/reviews/ratings?restaurant_type=Italian')
+    assert [step['index'] for step in ratings['queries'][0]['plan']] == ['ix_restaurant_summary_type_name']
+
+    page = next(entry for entry in report if 'limit=' in entry['path'])
+    used = {step['index'] for query in page['queries'] for step in query['plan']}
+    assert 'ix_reviews_provider_place' in used
@@ -0,0 +1,156 @@
+import json
+from pathlib import Path
+from threading import Lock
+import pytest
+from models import Restaurant, Review
+from apify_api.jobs import job_status
+from apify_api.runs import wait_for_run
+
+SEARCH_JSON = Path(__file__).parent.parent / 'json' / 'search.json'
+
+
+class FakeApifyClient:
+    """Local stand-in for ApifyClient: actor runs finish after a few polls with a canned dataset.
+
+    outcomes maps a restaurant_type to (polls before finishing, final status).
+    """
+
+    def __init__(self, datasets, outcomes=None):
+        self.datasets = datasets
+        self.outcomes = outcomes or {}
+        self.runs = {}
+        self.polls = {}
+        self._lock = Lock()
+
+    def __call__(self, token=None):
+        return self
+
+    def actor(self, actor_id):
+        return _FakeActor(self)
+
+    def run(self, run_id):
+        return _FakeRun(self, run_id)
+
+    def dataset(self, dataset_id):
+        return _FakeDataset(self.datasets[dataset_id])
+
+
+class _FakeActor:
+    def __init__(self, client):
+        self.client = client
+
+    def start(self, run_input):
+        restaurant_type = run_input['restaurant_type']
+        with self.client._lock:
+            run_id = f'run-{len(self.client.runs) + 1}'
+            self.client.runs[run_id] = restaurant_type
+        return {'id': run_id}
+
+
+class _FakeRun:
+    def __init__(self, client, run_id):
+        self.client = client
+        self.run_id = run_id
+
+    def get(self):
+        restaurant_type = self.client.runs[self.run_id]
+        polls_needed, final_status = self.client.outcomes.get(restaurant_type, (2, 'SUCCEEDED'))
+        with self.client._lock:
+            polls = self.client.polls[self.run_id] = self.client.polls.get(self.run_id, 0) + 1
+        status = final_status if polls > polls_needed else 'RUNNING'
+        return {'id': self.run_id, 'status': status, 'defaultDatasetId': restaurant_type}
+
+
+class _FakeDataset:
+    def __init__(self, items):
+        self.items = items
+
+    def iterate_items(self, offset=0):
+        return iter(self.items[offset:])
+
+
+def _datasets(*restaurant_types):
+    with open(SEARCH_JSON, 'r') as f:
+        items = json.load(f)
+    # a disjoint slice of places per type
+    places = sorted({item['googleMapsPlaceId'] for item in items})
+    return {
+        restaurant_type: [item for item in items if item['googleMapsPlaceId'] in places[i::len(restaurant_types)]]
+        for i, restaurant_type in enumerate(restaurant_types)
+    }
+
+
+@pytest.fixture
+def fake_apify(app, tmp_path):
+    (tmp_path / 'json').mkdir()
+    (tmp_path / 'json' / 'apify_run_inputs.json').write_text('{"keywords": []}')
+    app.config.update(APIFY_API_KEY='test', APIFY_RESTAURANT_REVIEW_URI='actor', FILE_BASE=f'{tmp_path}/',
+                      APIFY_POLL_INITIAL_SECONDS=0, APIFY_POLL_MAX_SECONDS=0)
+
+    def install(datasets, outcomes=None):
+        fake = FakeApifyClient(datasets, outcomes)
+        app.config['APIFY_CLIENT_FACTORY'] = fake
+        return fake
+    return install
+
+
+def _job_id(response):
+    return response.get_data(as_text=True).split('queued as job ')[1].split()[0]
+
+
+def test_wait_for_run_backs_off_until_terminal():
+    fake = FakeApifyClient({}, {'Thai': (3, 'SUCCEEDED')})
+    run_id = fake.actor('actor').start({'restaurant_type': 'Thai'})['id']
+    delays = []
+
+    run_info = wait_for_run(fake, run_id, initial_delay=1, max_delay=3, sleep=delays.append)
+    assert run_info['status'] == 'SUCCEEDED'
+    assert delays == [1, 2, 3]
+
+    slow = FakeApifyClient({}, {'Thai': (99, 'SUCCEEDED')})
+    slow_run_id = slow.actor('actor').start({'restaurant_type': 'Thai'})['id']
+    with pytest.raises(TimeoutError):
+        wait_for_run(slow, slow_run_id, initial_delay=10, timeout=1, sleep=delays.append)
+
+
+def test_pop_restaurant_types_ingests_every_run(app, client, fake_apify):
+    """All runs are started, polled and ingested; each type gets its reviews and restaurants."""
+    datasets = _datasets('Italian', 'Thai', 'Sushi')
+    fake = fake_apify(datasets)
+    before = Review.query.count()
+
+    response = client.post('/apify/pop-restaurant-types', json={'restaurant_types': ['Italian', 'Thai', 'Sushi']})
+    assert response.status_code == 202
+    status = job_status(_job_id(response))
+
+    assert status['status'] == 'succeeded', status['error']
+    assert len(fake.runs) == 3
+    assert all(polls == 3 for polls in fake.polls.values())
+    total = sum(len(items) for items in datasets.values())
+    assert Review.query.count() == before + total
+    assert status['rows_written'] == total
+    for restaurant_type, items in datasets.items():
+        tagged = Restaurant.query.filter_by(restaurant_type=restaurant_type).count()
+        assert tagged == len({item['googleMapsPlaceId'] for item in items})
+        assert f"{restaurant_type}: Successfully added {len(items)} reviews" in status['message']
+
+
+def test_failed_run_does_not_block_the_others(app, client, fake_apify):
+    datasets = _datasets('Italian', 'Thai')
+    fake_apify(datasets, outcomes={'Thai': (1, 'FAILED')})
+
+    response = client.get('/apify/pop-restaurant-types?restaurant_types=Italian,Thai,Italian')
+    status = job_status(_job_id(response))
+
+    assert status['status'] == 'failed'
+    assert status['params'] == {'restaurant_types': ['Italian', 'Thai']}
+    assert '1 of 2 restaurant types failed (Thai)' in status['error']
+    assert 'Thai: run finished with status FAILED' in status['error']
+    assert Restaurant.query.filter_by(restaurant_type='Italian').count() > 0
+    assert Restaurant.query.filter_by(restaurant_type='Thai').count() == 0
+
+
+def test_pop_restaurant_types_requires_types(client, fake_apify):
+    fake_apify({})
+    assert client.post('/apify/pop-restaurant-types', json={}).status_code == 400
+    assert client.get('/apify/pop-restaurant-types?restaurant_types=,').status_code == 400
@@ -0,0 +1,66 @@
+import json
+from extensions import db
+from models import Restaurant
+from apify_api.jobs import submit_job
+from query_diagnostics import fingerprint_statement, normalize_statement
+
+
+def _per_row_lookup_job(progress, google_maps_ids):
+    # the old pop_restaurant_type pattern: one query per item
+    for google_maps_id in google_maps_ids:
+        Restaurant.query.filter_by(google_maps_id=google_maps_id, restaurant_type='all').first()
+    return "done"
+
+
+def _findings(client, kind):
+    response = client.get(f'/admin/query-diagnostics?type={kind}')
+    assert response.status_code == 200
+    return json.loads(response.data)['data']
+
+
+def test_normalize_statement_collapses_literals_and_lists():
+    """Statements that differ only in values or IN-list length share a fingerprint."""
+    assert normalize_statement("SELECT * FROM t\n WHERE id = 5 AND name = 'x' AND a IN (?, ?, ?)") == \
+        "select * from t where id = ? and name = ? and a in (...)"
+
+    first = fingerprint_statement("SELECT id FROM reviews WHERE google_maps_id IN (%s, %s) AND provider = %s")
+    second = fingerprint_statement("SELECT id FROM reviews WHERE google_maps_id IN (?) AND provider = ?")
+    assert first == second
+    assert fingerprint_statement("INSERT INTO t (a, b) VALUES (?, ?), (?, ?)")[1] == "insert into t (a, b) values (...)"
+
+
+def test_repeated_query_in_job_is_flagged(app, client):
+    """A job running the same statement shape more than REPEATED_QUERY_LIMIT times is reported."""
+    app.config.update(QUERY_DIAGNOSTICS_ENABLED=True, REPEATED_QUERY_LIMIT=3)
+    submit_job('test-n-plus-one', _per_row_lookup_job, google_maps_ids=['place_1', 'place_2', 'place_3', 'place_4'])
+
+    findings = _findings(client, 'repeated_query')
+    assert len(findings) == 1
+    assert findings[0]['scope'].startswith('job _per_row_lookup_job')
+    assert findings[0]['count'] == 4
+    assert 'from restaurants' in findings[0]['statement']
+
+
+def test_slow_query_is_logged_with_plan(app, client):
+    """Statements above SLOW_QUERY_SECONDS are recorded with their EXPLAIN plan."""
+    app.config.update(QUERY_DIAGNOSTICS_ENABLED=True, SLOW_QUERY_SECONDS=0)
+    client.get('/reviews/ratings/place_1')
+
+    findings = [f for f in _findings(client, 'slow_query') if 'from restaurant_summary' in f['statement']]
+    assert findings and findings[0]['scope'] == 'GET /reviews/ratings/place_1'
+    assert any(step['table'] == 'restaurant_summary' for step in findings[0]['plan'])
+
+    assert client.delete('/admin/query-diagnostics').status_code == 200
+    assert _findings(client, 'slow_query') == []
+
+
+def test_diagnostics_are_off_unless_enabled(client):
+    client.get('/reviews/ratings')
+    assert _findings(client, 'slow_query') == []
+    assert client.get('/admin/query-diagnostics?type=bogus').status_code == 400
+
+
+def test_endpoint_is_hidden_unless_enabled(app, client):
+    app.config.update(QUERY_DIAGNOSTICS_ENDPOINT_ENABLED=False)
+    assert client.get('/admin/query-diagnostics').status_code == 404
+    assert client.delete('/admin/query-diagnostics').status_code == 404
@@ -0,0 +1,74 @@
+import json
+from datetime import datetime
+from extensions import db
+from models import RestaurantScore, Review
+from rankings import ScoreWeights, refresh_restaurant_scores
+from review_dates import epoch_seconds
+
+NOW = epoch_seconds(datetime(2025, 1, 1))
+
+
+def test_shrinkage_needs_many_reviews():
+    """One 5-star review does not outrank 400 at 4.7; Bain reviews count double; a year halves a weight."""
+    weights = ScoreWeights(bain_weight=2.0, half_life_days=365, prior_weight=10, now=NOW)
+    assert weights.score(1, 5, prior=4.0) < weights.score(400, 400 * 4.7, prior=4.0)
+    assert weights.score(0, 0, prior=4.0) == 4.0
+    assert weights.weight('Bain', NOW) == 2.0
+    assert weights.weight('Google', NOW - 365 * 86400) == 0.5
+    assert weights.weight('Google', epoch_seconds(None)) == 1.0
+
+
+def test_scores_follow_weights(app):
+    """Without decay and with no Bain bonus, place_1 (5 and 4) leads; a heavy Bain weight lifts place_2 (Bain 5)."""
+    refresh_restaurant_scores(weights=ScoreWeights(bain_weight=1.0, half_life_days=0, prior_weight=1, now=NOW))
+    place_1 = db.session.get(RestaurantScore, ('place_1', 'all'))
+    assert (place_1.ratings_count, place_1.weighted_avg) == (2, 4.5)
+    assert place_1.score == round((3.8 + 9) / 3, 6)  # prior: 19 stars over 5 ratings
+
+    refresh_restaurant_scores(['place_2'], weights=ScoreWeights(bain_weight=10.0, half_life_days=0, prior_weight=1,
+                                                                now=NOW))
+    assert db.session.get(RestaurantScore, ('place_2', 'all')).score > place_1.score
+
+
+def test_top_endpoint(client):
+    top = json.loads(client.get('/reviews/top?restaurant_type=all&limit=3').data)['data']
+    assert [place['score'] for place in top] == sorted((place['score'] for place in top), reverse=True)
+    assert top[-1]['google_maps_id'] == 'place_3'  # a single 2-star review
+    assert len(json.loads(client.get('/reviews/top?limit=2').data)['data']) == 2
+    assert json.loads(client.get('/reviews/top?restaurant_type=Italian').data)['data'] == []
+    assert client.get('/reviews/top?limit=0').status_code == 400
+    assert client.get('/reviews/top?limit=many').status_code == 400
+
+
+def test_submission_rescores_the_place(client):
+    for _ in range(5):
+        client.post('/reviews/submit-review', data={
+            'google_maps_id': 'place_3',
+            'place_name': 'Test Restaurant 3',
+            'review_rating': '5'
+        })
+    top = json.loads(client.get('/reviews/top?limit=1').data)['data']
+    assert top[0]['google_maps_id'] == 'place_3'
+    assert top[0]['ratings_count'] == 6
+
+
+def _top_ids(client, query):
+    return [place['google_maps_id'] for place in json.loads(client.get(f'/reviews/top?{query}').data)['data']]
+
+
+def test_top_by_summary_metric(client):
+    """Highest first, ties by google_maps_id descending; unrated places are left out."""
+    assert _top_ids(client, 'metric=average') == ['place_1', 'place_2', 'place_3']
+    assert _top_ids(client, 'metric=count&limit=2') == ['place_2', 'place_1']
+    assert _top_ids(client, 'metric=bain_average') == ['place_2', 'place_1']
+    assert client.get('/reviews/top?metric=name').status_code == 400
+
+
+def test_top_metric_follows_submissions(client):
+    client.post('/reviews/submit-review', data={
+        'google_maps_id': 'place_3',
+        'place_name': 'Test Restaurant 3',
+        'review_rating': '5'
+    })
+    assert _top_ids(client, 'metric=bain_average&limit=1') == ['place_3']
+    assert _top_ids(client, 'metric=count&limit=1') == ['place_3']
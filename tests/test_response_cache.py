@@ -0,0 +1,80 @@
+import json
+from pa_api.response_cache import ResponseCache
+
+
+def _stats(client):
+    return json.loads(client.get('/reviews/cache-stats').data)['data']
+
+
+def test_repeated_reads_are_cache_hits(client):
+    """The second identical request is served from the cache."""
+    first = client.get('/reviews/ratings?restaurant_type=all')
+    second = client.get('/reviews/ratings?restaurant_type=all')
+
+    assert first.status_code == second.status_code == 200
+    assert first.data == second.data
+    stats = _stats(client)
+    assert (stats['hits'], stats['misses']) == (1, 1)
+
+
+def test_query_args_are_normalized(client):
+    """Default and explicit restaurant_type share an entry; other args don't."""
+    client.get('/reviews/ratings')
+    client.get('/reviews/ratings?restaurant_type=all&unused=1')
+    client.get('/reviews/ratings?restaurant_type=Italian')
+
+    stats = _stats(client)
+    assert (stats['hits'], stats['misses'], stats['entries']) == (1, 2, 2)
+
+
+def test_blank_or_padded_args_do_not_poison_the_default_listing(client):
+    """Requests the key folds into the default entry are answered like the default request."""
+    for query in ('?restaurant_type=', '?restaurant_type=all%20', '?provider=%20'):
+        client.get('/reviews/reviews' + query)
+
+    listing = json.loads(client.get('/reviews/reviews').data)['data']
+    assert len(listing) == 3
+    padded = json.loads(client.get('/reviews/reviews?restaurant_type=%20all').data)['data']
+    assert padded == listing
+
+
+def test_submit_review_invalidates_cache(client):
+    """A Bain submission drops cached responses so the new rating is visible."""
+    before = json.loads(client.get('/reviews/ratings/place_3').data)['data']
+    assert before['bain_ratings']['count'] == 0
+
+    client.post('/reviews/submit-review', data={
+        'google_maps_id': 'place_3',
+        'place_name': 'Test Restaurant 3',
+        'review_rating': '5'
+    })
+
+    after = json.loads(client.get('/reviews/ratings/place_3').data)['data']
+    assert after['bain_ratings']['count'] == 1
+    assert _stats(client)['invalidations'] == 1
+
+
+def test_errors_are_not_cached(client):
+    """404s are recomputed on every request."""
+    client.get('/reviews/ratings/nonexistent_id')
+    client.get('/reviews/ratings/nonexistent_id')
+
+    assert _stats(client)['entries'] == 0
+
+
+def test_lru_eviction_and_ttl():
+    """The least recently used entry is evicted first and stale entries expire."""
+    cache = ResponseCache(max_entries=2, ttl_seconds=60)
+    cache.set('a', b'1', 200)
+    cache.set('b', b'2', 200)
+    cache.get('a')
+    cache.set('c', b'3', 200)
+
+    assert cache.get('b') is None
+    assert cache.get('a') == (b'1', 200)
+    assert cache.evictions == 1
+
+    expired = ResponseCache(max_entries=2, ttl_seconds=-1)
+    expired.set('a', b'1', 200)
+    assert expired.get('a') is None
+    assert expired.expirations == 1
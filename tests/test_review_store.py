@@ -0,0 +1,58 @@
+import json
+import pytest
+from datetime import datetime, timezone
+from pa_api.review_store import ReviewColumns, get_review_store
+from review_dates import NO_DATE, epoch_seconds
+
+
+@pytest.fixture(params=['numpy', 'array'])
+def columns(request, app):
+    if request.param == 'numpy':
+        pytest.importorskip('numpy')
+    return ReviewColumns.load(use_numpy=request.param == 'numpy')
+
+
+def test_columns_hold_every_review(columns):
+    assert len(columns) == 5
+    assert len(columns.places) == 3
+    assert sorted(columns.providers.values) == ['Bain', 'Google']
+    assert columns.nbytes() > 0
+
+
+def test_filters_and_aggregates(columns):
+    """Provider, type, date and place filters; per-place totals match the ratings fixture rows."""
+    assert columns.count(provider='Bain') == 2
+    assert columns.count(provider=('Bain', 'Google')) == 5
+    assert columns.count(provider='unknown') == 0
+    assert columns.count(restaurant_type='Italian') == 0
+    assert columns.count(since=epoch_seconds(datetime(2024, 1, 3))) == 3
+    assert columns.count(google_maps_id='place_2', provider='Google') == 1
+
+    assert columns.place_ratings() == {
+        'place_1': {'count': 2, 'average': 4.5},
+        'place_2': {'count': 2, 'average': 4.0},
+        'place_3': {'count': 1, 'average': 2.0},
+    }
+    assert columns.place_ratings(provider='Bain') == {
+        'place_1': {'count': 1, 'average': 4.0},
+        'place_2': {'count': 1, 'average': 5.0},
+    }
+    assert columns.rating_histogram() == [0, 1, 1, 1, 2]
+    assert columns.rating_histogram(google_maps_id='place_3') == [0, 1, 0, 0, 0]
+
+
+def test_dates_from_strings_and_datetimes():
+    assert epoch_seconds('2024-01-01 00:00:00') == epoch_seconds(datetime(2024, 1, 1, tzinfo=timezone.utc))
+    assert epoch_seconds(None) == epoch_seconds('not a date') == NO_DATE
+
+
+def test_store_reloads_on_data_version_change(app, client):
+    store = get_review_store()
+    assert store.columns().count() == 5
+    assert store.columns() is store.columns()
+
+    client.post('/reviews/submit-review', data={'google_maps_id': 'place_3', 'place_name': 'Test Restaurant 3',
+                                                'review_rating': '5'})
+    assert store.columns().count(provider='Bain') == 3
+    stats = json.loads(client.get('/reviews/cache-stats').data)['data']['review_store']
+    assert (stats['loads'], stats['reviews']) == (2, 6)
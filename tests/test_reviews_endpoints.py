@@ -118,4 +118,128 @@ def test_restaurant_with_no_bain_ratings(client):
     assert data['success'] is True
     assert data['data']['all_ratings']['count'] == 1
     assert data['data']['bain_ratings']['count'] == 0
-    assert data['data']['bain_ratings']['average'] is None
\ No newline at end of file
+    assert data['data']['bain_ratings']['average'] is None
+
+def test_get_all_reviews_keyset_pagination(client):
+    """limit/cursor walk every restaurant exactly once in place_name order."""
+    seen = []
+    cursor = None
+    for _ in range(5):
+        url = '/reviews/reviews?restaurant_type=all&limit=2'
+        if cursor:
+            url += f'&cursor={cursor}'
+        data = json.loads(client.get(url).data)
+        assert data['success'] is True
+        assert len(data['data']) <= 2
+        seen.extend(restaurant['place_name'] for restaurant in data['data'])
+        cursor = data['next_cursor']
+        if cursor is None:
+            break
+
+    assert seen == ['Test Restaurant 1', 'Test Restaurant 2', 'Test Restaurant 3']
+
+
+def test_get_all_reviews_page_keeps_reviews_and_provider_filter(client):
+    """Paged restaurants carry their reviews, filtered by provider like the full listing."""
+    data = json.loads(client.get('/reviews/reviews?limit=10&provider=Bain').data)
+
+    assert [r['google_maps_id'] for r in data['data']] == ['place_1', 'place_2']
+    assert all(review['provider'] == 'Bain' for r in data['data'] for review in r['reviews'])
+    assert data['next_cursor'] is None
+
+
+def test_get_all_reviews_field_projection(client):
+    """fields= limits the review keys returned."""
+    data = json.loads(client.get('/reviews/reviews?fields=review_rating,provider').data)
+
+    reviews = [review for restaurant in data['data'] for review in restaurant['reviews']]
+    assert reviews
+    assert all(set(review) == {'review_rating', 'provider'} for review in reviews)
+
+
+def test_get_all_reviews_rejects_bad_page_args(client):
+    """Unknown fields, bad limits and garbled cursors are 400s."""
+    for query in ('fields=nope', 'limit=0', 'limit=abc', 'cursor=not-a-cursor'):
+        response = client.get(f'/reviews/reviews?{query}')
+        assert response.status_code == 400
+        assert json.loads(response.data)['success'] is False
+
+
+def test_get_all_reviews_ndjson_stream(client):
+    """format=ndjson streams one restaurant object per line."""
+    response = client.get('/reviews/reviews?restaurant_type=all&format=ndjson')
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    lines = [json.loads(line) for line in response.data.decode().splitlines()]
+    assert [r['google_maps_id'] for r in lines] == ['place_1', 'place_2', 'place_3']
+    assert len(lines[0]['reviews']) == 2
+
+
+def test_get_all_reviews_json_stream_matches_buffered(client):
+    """format=json-stream produces the same document as the buffered response."""
+    buffered = json.loads(client.get('/reviews/reviews?restaurant_type=all').data)
+    streamed = json.loads(client.get('/reviews/reviews?restaurant_type=all&format=json-stream').data)
+
+    assert streamed == buffered
+
+
+def test_search_reviews_json_stream_has_count(client):
+    """Streamed search results still report the restaurant count."""
+    response = client.get('/reviews/search_reviews?keyword=Restaurant&restaurant_type=all&format=json-stream')
+    data = json.loads(response.data)
+
+    assert data['success'] is True
+    assert data['count'] == len(data['data']) == 3
+
+
+def test_stream_failure_part_way_is_reported(app):
+    """A failure after the first chunk ends the stream with an error the client can detect."""
+    from pa_api.streaming import streamed_response
+
+    def failing():
+        yield {'google_maps_id': 'place_1'}
+        raise RuntimeError('connection lost')
+
+    with app.test_request_context():
+        document = json.loads(streamed_response(failing(), 'json-stream', 'count').get_data())
+        lines = streamed_response(failing(), 'ndjson').get_data(as_text=True).splitlines()
+
+    assert document == {'success': True, 'data': [{'google_maps_id': 'place_1'}], 'complete': False,
+                        'error': 'connection lost'}
+    assert json.loads(lines[-1]) == {'success': False, 'error': 'connection lost'}
+
+
+def _tag_place_2_with_other_name():
+    """A type row named differently from the place's 'all' row, as scraped names often are"""
+    from sqlalchemy import text
+    from extensions import db
+    from aggregates import refresh_restaurant_summary
+    db.session.execute(text("INSERT INTO restaurants (google_maps_id, place_name, place_address, restaurant_type) "
+                            "VALUES ('place_2', 'ZZZ Name 2', '456 Oak Ave', 'italian')"))
+    refresh_restaurant_summary(['place_2'])
+    db.session.commit()
+
+
+def test_get_all_reviews_lists_each_place_once(client):
+    """A place with type rows under another name is still one object, buffered and streamed."""
+    _tag_place_2_with_other_name()
+    buffered = json.loads(client.get('/reviews/reviews').data)['data']
+    streamed = [json.loads(line) for line in client.get('/reviews/reviews?format=ndjson').data.decode().splitlines()]
+
+    for listing in (buffered, streamed):
+        assert sorted(r['google_maps_id'] for r in listing) == ['place_1', 'place_2', 'place_3']
+        assert len(next(r for r in listing if r['google_maps_id'] == 'place_2')['reviews']) == 2
+
+
+def test_get_all_reviews_pages_each_place_once(client):
+    """Pages hold `limit` distinct places; a differently named type row neither splits nor renames a place."""
+    _tag_place_2_with_other_name()
+    first = json.loads(client.get('/reviews/reviews?limit=2').data)
+    second = json.loads(client.get(f"/reviews/reviews?limit=2&cursor={first['next_cursor']}").data)
+
+    places = first['data'] + second['data']
+    assert len(first['data']) == 2 and second['next_cursor'] is None
+    assert sorted(r['google_maps_id'] for r in places) == ['place_1', 'place_2', 'place_3']
+    assert json.loads(client.get('/reviews/reviews?limit=10').data)['data'] == \
+        json.loads(client.get('/reviews/reviews').data)['data']
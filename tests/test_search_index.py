@@ -0,0 +1,78 @@
+import json
+import pytest
+from pa_api.search_index import get_search_backend, search_review_matches
+
+
+@pytest.fixture(params=['fts5', 'memory'])
+def search_client(request, app, client):
+    """Run each search test against the SQLite FTS5 and the in-process backend."""
+    app.config['SEARCH_BACKEND'] = request.param
+    app.extensions.pop('search_backend', None)
+    return client
+
+
+def test_backend_picked_from_dialect(app):
+    """SQLite with FTS5 compiled in gets the FTS5 backend."""
+    assert get_search_backend().name == 'sqlite-fts5'
+
+
+def test_search_request_never_builds_the_index(app):
+    """Without the FTS5 table a search fails instead of creating it inside a read request."""
+    from sqlalchemy import text
+    from extensions import db
+    db.session.execute(text("DROP TABLE review_search"))
+    db.session.commit()
+
+    with pytest.raises(RuntimeError, match='migrate'):
+        search_review_matches('food', 'all')
+    assert db.session.execute(text("SELECT name FROM sqlite_master WHERE name = 'review_search'")).first() is None
+
+
+def test_search_matches_review_text_ranked(search_client):
+    """Review content is searchable and the best match comes first."""
+    matches = search_review_matches('amazing', 'all')
+    assert [google_maps_id for _, google_maps_id, _ in matches] == ['place_1']
+
+    matches = search_review_matches('okay', 'all')
+    assert [google_maps_id for _, google_maps_id, _ in matches] == ['place_2']
+
+    assert search_review_matches('nothing matches this', 'all') == []
+
+
+def test_search_reviews_scope_all(search_client):
+    """scope=all returns ranked restaurants with only their matching reviews."""
+    response = search_client.get('/reviews/search_reviews?keyword=meal&restaurant_type=all&scope=all')
+    data = json.loads(response.data)
+
+    assert data['success'] is True
+    assert data['count'] == 1
+    assert data['data'][0]['google_maps_id'] == 'place_2'
+    assert [review['review_text'] for review in data['data'][0]['reviews']] == ['Best meal ever']
+    assert data['data'][0]['score'] > 0
+
+
+def test_search_ratings_scope_all(search_client):
+    """scope=all on search_ratings ranks restaurants by match score."""
+    data = json.loads(search_client.get('/reviews/search_ratings?keyword=recommended&restaurant_type=all&scope=all').data)
+
+    assert [r['google_maps_id'] for r in data['data']] == ['place_3']
+    assert data['data'][0]['all_ratings']['count'] == 1
+
+
+def test_submitted_reviews_are_indexed(search_client):
+    """A Bain submission is searchable straight away."""
+    search_client.post('/reviews/submit-review', data={
+        'google_maps_id': 'place_3',
+        'place_name': 'Test Restaurant 3',
+        'review_text': 'Outstanding tiramisu',
+        'review_rating': '5'
+    })
+
+    data = json.loads(search_client.get('/reviews/search_reviews?keyword=tiramisu&restaurant_type=all&scope=all').data)
+    assert [r['google_maps_id'] for r in data['data']] == ['place_3']
+
+
+def test_search_scope_is_validated(client):
+    """Unknown search scopes are rejected."""
+    response = client.get('/reviews/search_reviews?keyword=x&scope=everything')
+    assert response.status_code == 400
@@ -0,0 +1,170 @@
+import json
+from pathlib import Path
+import pytest
+from sqlalchemy import func, inspect, select
+from extensions import db
+from models import Rating, Restaurant, RestaurantSummary, Review
+from apify_api.apify_endpoints import ingest_seed_run
+
+SEARCH_JSON = Path(__file__).parent.parent / 'json' / 'search.json'
+
+
+def _apify_items(count=20):
+    with open(SEARCH_JSON, 'r') as f:
+        return json.load(f)[:count]
+
+
+class _Dataset:
+    """Dataset client that checks the live tables while the reseed is half way through"""
+
+    def __init__(self, items, during=None):
+        self.items = items
+        self.during = during
+
+    def iterate_items(self, offset=0):
+        for position, item in enumerate(self.items[offset:], offset):
+            if position == len(self.items) // 2 and self.during:
+                self.during()
+            yield item
+
+
+class _Client:
+    def __init__(self, dataset):
+        self._dataset = dataset
+
+    def run(self, run_id):
+        return self
+
+    def get(self):
+        return {'defaultDatasetId': 'seed-dataset'}
+
+    def dataset(self, dataset_id):
+        return self._dataset
+
+
+class _Progress:
+    def phase(self, phase):
+        pass
+
+    def update(self, force=False, **counters):
+        pass
+
+    def ingest_batch(self, stats):
+        pass
+
+
+def _live_reviews():
+    return db.session.execute(select(func.count()).select_from(Review.__table__)).scalar()
+
+
+def _reseed(app, dataset):
+    app.config.update(APIFY_CLIENT_FACTORY=lambda token: _Client(dataset), INGEST_BATCH_SIZE=4,
+                      INGEST_CHECKPOINT_BATCHES=2)
+    return ingest_seed_run(_Progress(), 'seed-run')
+
+
+def test_reseed_swaps_in_new_generation(app):
+    """Readers keep the old reviews until the swap; afterwards the new ones, the Bain reviews and the type tags."""
+    db.session.add(Restaurant(google_maps_id='place_1', place_name='Test Restaurant 1', restaurant_type='Thai'))
+    db.session.commit()
+    items = _apify_items()
+    seen_during = []
+
+    message = _reseed(app, _Dataset(items, during=lambda: seen_during.append(_live_reviews())))
+
+    assert message.startswith(f"Successfully added {len(items)} reviews")
+    assert seen_during == [5]
+    assert Review.query.count() == len(items) + 2
+    assert {r.provider for r in Review.query.filter(Review.google_maps_id.in_(['place_1', 'place_2']))} == {'Bain'}
+    assert Restaurant.query.filter_by(restaurant_type='Thai').count() == 1
+    assert Restaurant.query.filter_by(restaurant_type='all').count() == \
+        len({item['googleMapsPlaceId'] for item in items}) + 2
+
+    place = items[0]['googleMapsPlaceId']
+    ratings = [item['reviewRating'] for item in items if item['googleMapsPlaceId'] == place]
+    assert db.session.get(Rating, place).ratings_sum == sum(ratings)
+    assert db.session.get(Rating, 'place_3') is None
+    assert db.session.get(RestaurantSummary, (place, 'all')).ratings_count == len(ratings)
+    assert db.session.get(RestaurantSummary, ('place_1', 'Thai')).bain_ratings_count == 1
+
+    inspector = inspect(db.engine)
+    assert 'reviews_bup' in inspector.get_table_names()
+    assert not [name for name in inspector.get_table_names() if name.endswith('_shadow')]
+    assert {index.name for index in Review.__table__.indexes} <= {i['name'] for i in inspector.get_indexes('reviews')}
+
+
+def test_reseed_repeats_and_deduplicates(app):
+    """A second reseed replaces the backup generation; the same items are not stored twice."""
+    items = _apify_items()
+    _reseed(app, _Dataset(items))
+    _reseed(app, _Dataset(items + items[:5]))
+    assert Review.query.count() == len(items) + 2
+
+
+def test_failed_reseed_leaves_live_tables(app):
+    """A dataset that dies part way leaves the live data alone and removes the shadow tables."""
+    def fail():
+        raise ConnectionError("connection reset")
+
+    with pytest.raises(ConnectionError):
+        _reseed(app, _Dataset(_apify_items(), during=fail))
+
+    assert _live_reviews() == 5
+    assert db.session.get(Rating, 'place_3').ratings_count == 1
+    assert not [name for name in inspect(db.engine).get_table_names() if name.endswith('_shadow')]
+
+
+def test_writes_during_reseed_are_kept(app):
+    """Reviews of any provider and a type tagged between create() and swap() survive the swap."""
+    from aggregates import RatingDeltas, refresh_restaurant_summary
+    from apify_api.bulk_ingest import bulk_insert_reviews
+    from pa_api.capture_review import insert_submitted_reviews, refresh_after_submission
+
+    items = _apify_items()
+    scraped = _apify_items(21)[20]
+
+    def write_live():
+        insert_submitted_reviews([{'google_maps_id': 'place_new', 'place_name': 'New Place', 'provider': 'Bain',
+                                   'review_rating': 5, 'review_text': 'Submitted mid-reseed'}])
+        refresh_after_submission([{'google_maps_id': 'place_new', 'place_name': 'New Place', 'provider': 'Bain',
+                                   'review_rating': 5}])
+        # a pop-restaurant-type run: one review the seed lacks, one it has as well
+        bulk_insert_reviews([scraped, items[0]], on_row=RatingDeltas())
+        db.session.add(Restaurant(google_maps_id='place_2', place_name='Test Restaurant 2', restaurant_type='Thai'))
+        refresh_restaurant_summary(['place_2'])
+        db.session.commit()
+
+    _reseed(app, _Dataset(items, during=write_live))
+
+    submitted = Review.query.filter_by(google_maps_id='place_new').one()
+    assert submitted.review_text == 'Submitted mid-reseed'
+    assert Review.query.count() == len(items) + 4
+    assert Review.query.filter_by(review_key=Review.apify_row(scraped)['review_key']).count() == 1
+    assert Review.query.filter_by(review_key=Review.apify_row(items[0])['review_key']).count() == 1
+    assert db.session.get(Rating, 'place_new').ratings_count == 1
+    assert db.session.get(RestaurantSummary, ('place_new', 'all')).bain_ratings_count == 1
+    assert db.session.get(Restaurant, ('place_2', 'Thai')) is not None
+    assert db.session.get(RestaurantSummary, ('place_2', 'Thai')).bain_ratings_count == 1
+
+    _reseed(app, _Dataset(items))  # copied once, not again by the next reseed
+    assert Review.query.filter_by(google_maps_id='place_new').count() == 1
+
+
+def test_writes_just_before_the_rename_are_caught_up(app, monkeypatch):
+    """A submission committed between the catch-up and the swap is copied from reviews_bup after it."""
+    from pa_api.capture_review import insert_submitted_reviews, refresh_after_submission
+    from shadow_tables import ShadowReseed
+
+    swap = ShadowReseed.swap
+
+    def write_then_swap(reseed):
+        row = {'google_maps_id': 'place_late', 'place_name': 'Late Place', 'provider': 'Bain', 'review_rating': 4}
+        insert_submitted_reviews([row])
+        refresh_after_submission([row])
+        swap(reseed)
+
+    monkeypatch.setattr(ShadowReseed, 'swap', write_then_swap)
+    _reseed(app, _Dataset(_apify_items()))
+
+    assert Review.query.filter_by(google_maps_id='place_late').count() == 1
+    assert db.session.get(RestaurantSummary, ('place_late', 'all')).bain_ratings_count == 1
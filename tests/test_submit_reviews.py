@@ -0,0 +1,53 @@
+import json
+from extensions import db
+from models import BainRating, RestaurantSummary, Review
+
+
+def _bain_count(google_maps_id):
+    return Review.query.filter_by(google_maps_id=google_maps_id, provider='Bain').count()
+
+
+def test_batch_is_inserted_with_one_aggregate_refresh(client):
+    """Every review of a valid batch is stored and counted once in the ratings and the summary."""
+    reviews = [
+        {'google_maps_id': 'place_3', 'place_name': 'Test Restaurant 3', 'review_rating': 4, 'author_name': 'A'},
+        {'google_maps_id': 'place_3', 'place_name': 'Test Restaurant 3', 'review_rating': '2'},
+        {'google_maps_id': 'place_1', 'place_name': 'Test Restaurant 1', 'review_rating': 5, 'review_title': 'Top'},
+    ]
+    response = client.post('/reviews/submit-reviews', json={'reviews': reviews})
+    assert response.status_code == 201
+    data = json.loads(response.data)
+    assert [result['index'] for result in data['results']] == [0, 1, 2]
+    ids = [result['review_id'] for result in data['results']]
+    assert db.session.get(Review, ids[2]).review_title == 'Top'
+
+    assert _bain_count('place_3') == 2
+    bain_3 = db.session.get(BainRating, 'place_3')
+    assert (bain_3.ratings_count, bain_3.ratings_sum) == (2, 6)
+    assert db.session.get(RestaurantSummary, ('place_1', 'all')).bain_ratings_count == 2
+
+
+def test_invalid_entry_rejects_whole_batch(client):
+    """Entries are checked with the submit-review rules; one bad entry means nothing is stored."""
+    before = Review.query.count()
+    response = client.post('/reviews/submit-reviews', json=[
+        {'google_maps_id': 'place_3', 'review_rating': 4},
+        {'google_maps_id': 'place_3', 'review_rating': 9},
+        {'review_rating': 'five', 'author_name': 'x' * 129},
+        'not a review',
+    ])
+    assert response.status_code == 400
+    results = json.loads(response.data)['results']
+    assert [result['index'] for result in results] == [1, 2, 3]
+    assert results[0]['errors'] == ["review_rating must be between 1 and 5"]
+    assert set(results[1]['errors']) == {"google_maps_id is required", "review_rating must be a valid integer",
+                                         "author_name must be 128 characters or less"}
+    assert Review.query.count() == before
+
+
+def test_batch_body_and_size_are_checked(app, client):
+    assert client.post('/reviews/submit-reviews', json={'reviews': []}).status_code == 400
+    assert client.post('/reviews/submit-reviews', data='not json').status_code == 400
+    app.config['SUBMIT_REVIEWS_MAX_BATCH'] = 1
+    response = client.post('/reviews/submit-reviews', json=[{'google_maps_id': 'p', 'review_rating': 3}] * 2)
+    assert 'at most 1 reviews' in json.loads(response.data)['error']